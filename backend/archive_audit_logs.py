@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""
+FusionFlow Audit Log Archival
+
+Moves audit log months older than the retention window out of the database
+into gzip JSONL files (one per month), which the audit log viewer can still
+search. On PostgreSQL it also creates the upcoming monthly partitions, so
+run it at least once a month (e.g. from cron).
+
+Usage:
+    python backend/archive_audit_logs.py [--retention-months N] [--archive-dir DIR] [--dry-run]
+
+Arguments:
+    --retention-months: Months kept in the database (default: AUDIT_RETENTION_MONTHS)
+    --archive-dir: Directory for archive files (default: AUDIT_ARCHIVE_DIR)
+    --dry-run: Report what would be archived without changing anything
+"""
+
+import os
+import sys
+import argparse
+
+# Add the parent directory to the Python path to import backend modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.database import engine
+from backend.services.audit_archive import (
+    archive_audit_logs, ensure_partitions, AUDIT_RETENTION_MONTHS, AUDIT_ARCHIVE_DIR
+)
+
+def main():
+    parser = argparse.ArgumentParser(description="Archive old audit log months to gzip JSONL")
+    parser.add_argument("--retention-months", type=int, default=AUDIT_RETENTION_MONTHS, help="Months kept in the database")
+    parser.add_argument("--archive-dir", default=AUDIT_ARCHIVE_DIR, help="Directory for archive files")
+    parser.add_argument("--dry-run", action="store_true", help="Report without archiving")
+    args = parser.parse_args()
+
+    if args.retention_months < 1:
+        print("❌ --retention-months must be at least 1")
+        sys.exit(1)
+
+    if not args.dry_run:
+        with engine.begin() as conn:
+            created = ensure_partitions(conn)
+        if created:
+            print(f"✅ Created partitions: {', '.join(created)}")
+
+    results = archive_audit_logs(engine, retention_months=args.retention_months,
+                                 archive_dir=args.archive_dir, dry_run=args.dry_run)
+    verb = "would be archived" if args.dry_run else "archived"
+    for month, count in results:
+        print(f"  ✓ {month:%Y-%m}: {count} rows {verb}")
+    print(f"✅ {sum(count for _, count in results)} audit log rows {verb}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+"""
+FusionFlow Shipment History Compaction
+
+Moves old shipment status history rows into one compressed archive blob
+per shipment, keeping each shipment's newest rows in the table. Archived
+entries are still returned by the tracking endpoint with ?archived=1.
+
+Usage:
+    python backend/compact_shipment_history.py [--older-than-days N] [--keep-latest N] [--dry-run]
+
+Arguments:
+    --older-than-days: Only compact rows older than this (default: HISTORY_COMPACT_AFTER_DAYS)
+    --keep-latest: Rows per shipment always left in the table (default: HISTORY_KEEP_LATEST)
+    --dry-run: Count the shipments that would be compacted without changing anything
+"""
+
+import os
+import sys
+import argparse
+
+# Add the parent directory to the Python path to import backend modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.database import SessionLocal
+from backend.services.shipment_history import compact_history, HISTORY_COMPACT_AFTER_DAYS, HISTORY_KEEP_LATEST
+
+def main():
+    parser = argparse.ArgumentParser(description="Compact old shipment status history into per-shipment archives")
+    parser.add_argument("--older-than-days", type=int, default=HISTORY_COMPACT_AFTER_DAYS, help="Only compact rows older than this")
+    parser.add_argument("--keep-latest", type=int, default=HISTORY_KEEP_LATEST, help="Rows per shipment left in the table")
+    parser.add_argument("--dry-run", action="store_true", help="Report without compacting")
+    args = parser.parse_args()
+
+    if args.older_than_days < 0 or args.keep_latest < 0:
+        print("❌ --older-than-days and --keep-latest cannot be negative")
+        sys.exit(1)
+
+    db = SessionLocal()
+    try:
+        shipments, rows = compact_history(db, older_than_days=args.older_than_days,
+                                          keep_latest=args.keep_latest, dry_run=args.dry_run)
+    finally:
+        db.close()
+    if args.dry_run:
+        print(f"✅ {shipments} shipments have history rows to compact")
+    else:
+        print(f"✅ Compacted {rows} history rows from {shipments} shipments")
+
+if __name__ == "__main__":
+    main()
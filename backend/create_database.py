@@ -27,12 +27,16 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from backend.database import engine, Base, get_db
 from backend.models import (
     User, Project, Supplier, Order, Shipment, Document, 
-    Notification, SupplierPerformance, CustomsEntry, CostBreakdown
+    Notification, SupplierPerformance, CustomsEntry, CostBreakdown,
+    ShipmentStatusHistory
 )
 
 # Import all model classes to ensure they're registered with SQLAlchemy
 from backend.models.audit_log import AuditLog
 from backend.models.system_settings import SystemSettings
+from backend.services.search import ensure_search_indexes
+from backend.services.audit_archive import partition_audit_logs
+from backend.services.numbering import NumberAllocator
 
 # Migration: add_assigned_user_id_to_projects_orders_shipments.py
 import sqlalchemy as sa
@@ -67,6 +71,110 @@ def migrate_add_assigned_by_to_assignables(engine):
                 conn.execute(sa.text(f'ALTER TABLE {table_name} ADD COLUMN assigned_by VARCHAR(100)'))
     print('Migration: assigned_by column added to projects, orders, shipments.')
 
+def migrate_add_hot_path_indexes(engine):
+    """Create the composite indexes declared on the models for existing tables"""
+    inspector = sa.inspect(engine)
+    created = []
+    for model in [Order, Shipment, ShipmentStatusHistory, Project, Notification, AuditLog]:
+        table = model.__table__
+        if not inspector.has_table(table.name):
+            continue
+        existing = {index['name'] for index in inspector.get_indexes(table.name)}
+        for index in sorted(table.indexes, key=lambda ix: ix.name):
+            if index.name not in existing:
+                index.create(bind=engine)
+                created.append(index.name)
+    print(f'Migration: {len(created)} indexes added to orders, shipments, shipment_status_history, projects, notifications, audit_logs.')
+    return created
+
+def migrate_backfill_created_at(engine):
+    """Fill NULL created_at values, which keyset pagination cannot page past, and forbid new ones"""
+    inspector = sa.inspect(engine)
+    filled = 0
+    for table_name in ['orders', 'projects', 'shipments']:
+        if not inspector.has_table(table_name):
+            continue
+        with engine.begin() as conn:
+            filled += conn.execute(sa.text(
+                f'UPDATE {table_name} SET created_at = COALESCE(updated_at, CURRENT_TIMESTAMP) WHERE created_at IS NULL'
+            )).rowcount
+            if engine.dialect.name == 'postgresql':
+                conn.execute(sa.text(f'ALTER TABLE {table_name} ALTER COLUMN created_at SET NOT NULL'))
+    print(f'Migration: {filled} NULL created_at values backfilled in orders, projects, shipments.')
+    return filled
+
+def migrate_audit_json_nulls(engine):
+    """Turn JSON 'null' written by the batched audit writer into SQL NULL"""
+    if not sa.inspect(engine).has_table('audit_logs'):
+        return 0
+    fixed = 0
+    with engine.begin() as conn:
+        for column in ['old_values', 'new_values', 'meta_data']:
+            fixed += conn.execute(sa.text(
+                f"UPDATE audit_logs SET {column} = NULL WHERE CAST({column} AS TEXT) = 'null'"
+            )).rowcount
+    print(f'Migration: {fixed} JSON null values in audit_logs set to NULL.')
+    return fixed
+
+def migrate_add_next_api_sync_at(engine):
+    """Add shipments.next_api_sync_at, which the tracking sync filters on, and fill it from the last poll"""
+    inspector = sa.inspect(engine)
+    if not inspector.has_table('shipments'):
+        return 0
+    if 'next_api_sync_at' in {column['name'] for column in inspector.get_columns('shipments')}:
+        return 0
+    if engine.dialect.name == 'postgresql':
+        due = "last_api_sync + COALESCE(api_sync_frequency_minutes, 0) * INTERVAL '1 minute'"
+    else:
+        due = "datetime(last_api_sync, '+' || COALESCE(api_sync_frequency_minutes, 0) || ' minutes')"
+    with engine.begin() as conn:
+        conn.execute(sa.text(f'ALTER TABLE shipments ADD COLUMN next_api_sync_at {sa.DateTime().compile(dialect=engine.dialect)}'))
+        # Never polled: due now
+        filled = conn.execute(sa.text(
+            f'UPDATE shipments SET next_api_sync_at = COALESCE({due}, CURRENT_TIMESTAMP)'
+        )).rowcount
+    print(f'Migration: next_api_sync_at added to shipments ({filled} filled).')
+    return filled
+
+def migrate_partition_audit_logs(engine):
+    """Range-partition audit_logs by month on PostgreSQL; SQLite keeps a single table"""
+    if engine.dialect.name != 'postgresql':
+        return False
+    converted = partition_audit_logs(engine)
+    print(f'Migration: audit_logs {"converted to" if converted else "already uses"} monthly partitions.')
+    return converted
+
+def migrate_sync_number_sequences(engine):
+    """Move the order, project and supplier number sequences past codes entered outside the app"""
+    if engine.dialect.name != 'postgresql' and not sa.inspect(engine).has_table('number_sequences'):
+        return {}
+    synced = NumberAllocator(engine).sync()
+    print(f'Migration: number sequences synced ({", ".join(f"{name} from {value}" for name, value in synced.items())}).')
+    return synced
+
+def migrate_add_search_indexes(engine, rebuild=False):
+    """Create the full-text search indexes used by the list search boxes"""
+    try:
+        created = ensure_search_indexes(engine, rebuild=rebuild)
+    except sa.exc.OperationalError as e:
+        # e.g. SQLite built without FTS5; searches fall back to LIKE
+        print(f'⚠️  Search indexes not created: {e}')
+        return []
+    print(f'Migration: search indexes ready ({len(created)} new) for orders, shipments, suppliers, projects.')
+    return created
+
+def run_migrations(engine, rebuild_search=False):
+    """Bring existing tables up to date with the models; safe to run repeatedly"""
+    return {
+        'created_at_backfilled': migrate_backfill_created_at(engine),
+        'audit_logs_partitioned': migrate_partition_audit_logs(engine),
+        'audit_json_nulls_fixed': migrate_audit_json_nulls(engine),
+        'next_api_sync_filled': migrate_add_next_api_sync_at(engine),
+        'indexes_created': migrate_add_hot_path_indexes(engine),
+        'search_indexes_created': migrate_add_search_indexes(engine, rebuild=rebuild_search),
+        'number_sequences_synced': migrate_sync_number_sequences(engine),
+    }
+
 def create_database(recreate=False, seed=False):
     """
     Create the database and all tables.
@@ -96,6 +204,9 @@ def create_database(recreate=False, seed=False):
         Base.metadata.create_all(bind=engine)
         print("✅ Database tables created successfully")
         
+        # Add columns and indexes introduced after the tables were first created
+        run_migrations(engine, rebuild_search=recreate)
+        
         # Verify table creation
         print("\nVerifying table creation...")
         tables = Base.metadata.tables.keys()
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+FusionFlow Query Plan Report
+
+Runs EXPLAIN (PostgreSQL) or EXPLAIN QUERY PLAN (SQLite) for the queries
+behind the main list, polling and dashboard endpoints and flags plans that
+fall back to full table scans or temporary sorts.
+
+Usage:
+    python backend/explain_queries.py [--strict]
+
+Arguments:
+    --strict: Exit with status 1 if any query is flagged
+"""
+
+import os
+import sys
+import argparse
+import re
+from datetime import datetime, timedelta
+
+# Add the parent directory to the Python path to import backend modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import desc, func
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import ClauseElement, Executable
+from backend.database import SessionLocal, engine
+from backend.models import Order, Shipment, ShipmentStatusHistory, Notification
+from backend.models.audit_log import AuditLog
+from backend.services.time_buckets import time_bucket, bucket_start
+
+class Explain(Executable, ClauseElement):
+    """EXPLAIN wrapper around a SELECT"""
+    inherit_cache = False
+
+    def __init__(self, statement):
+        self.statement = statement
+
+@compiles(Explain)
+def _compile_explain(element, compiler, **kw):
+    return "EXPLAIN " + compiler.process(element.statement, **kw)
+
+@compiles(Explain, 'sqlite')
+def _compile_explain_sqlite(element, compiler, **kw):
+    return "EXPLAIN QUERY PLAN " + compiler.process(element.statement, **kw)
+
+# Plan lines that indicate a full scan or an unindexed sort
+SQLITE_WARNINGS = [re.compile(r'^SCAN \w+$'), re.compile(r'USE TEMP B-TREE FOR (RIGHT PART OF )?ORDER BY')]
+POSTGRES_WARNINGS = [re.compile(r'Seq Scan on'), re.compile(r'Sort Method: external')]
+
+def endpoint_queries(db):
+    """(endpoint, query) pairs mirroring the route queries"""
+    page = 26  # per_page + 1 look-ahead row used by keyset pagination
+    orders = db.query(Order).order_by(desc(Order.created_at), desc(Order.id))
+    shipments = db.query(Shipment).order_by(desc(Shipment.created_at), desc(Shipment.id))
+    now = datetime.utcnow()
+    return [
+        ('orders.list_orders', orders.limit(page)),
+        ('orders.list_orders?status=', orders.filter(Order.status == 'Approved').limit(page)),
+        ('orders.list_orders?priority=', orders.filter(Order.priority == 'High').limit(page)),
+        ('orders.list_orders?project=', orders.filter(Order.project_id == 1).limit(page)),
+        ('orders.list_orders?supplier=', orders.filter(Order.supplier_id == 1).limit(page)),
+        ('users.assignments (orders)', db.query(Order).filter(Order.assigned_user_id == 1)),
+        ('shipments.list_shipments', shipments.limit(page)),
+        ('shipments.list_shipments?status=', shipments.filter(Shipment.current_status == 'In Transit').limit(page)),
+        ('shipments.list_shipments?carrier=', shipments.filter(Shipment.carrier == 'DHL').limit(page)),
+        ('shipments.track_shipment (history page)', db.query(ShipmentStatusHistory.id, ShipmentStatusHistory.timestamp).filter(
+            ShipmentStatusHistory.shipment_id == 1
+        ).order_by(desc(ShipmentStatusHistory.timestamp), desc(ShipmentStatusHistory.id)).limit(51)),
+        ('api.project_orders_api (version)', db.query(func.count(Order.id), func.max(Order.updated_at)).filter(
+            Order.project_id == 1
+        )),
+        ('users.unread_notifications', db.query(func.count(Notification.id), func.max(Notification.id)).filter(
+            Notification.user_id == 1, Notification.is_read == False
+        )),
+        ('users.unread_notification_items', db.query(Notification).filter(
+            Notification.user_id == 1, Notification.is_read == False, Notification.id > 0
+        ).order_by(Notification.created_at.desc(), Notification.id.desc()).limit(20)),
+        ('notifications.release_scheduled', db.query(Notification.id).filter(
+            Notification.sent_via_app == False, Notification.scheduled_send_time <= now
+        )),
+        ('notifications.archive_expired', db.query(Notification.id).filter(
+            Notification.is_archived == False, Notification.expires_at <= now
+        )),
+        ('users.logs', db.query(AuditLog).order_by(AuditLog.timestamp.desc(), AuditLog.id.desc()).limit(51)),
+        ('users.logs?action=', db.query(AuditLog).filter(AuditLog.action == 'LOGIN_FAILED').order_by(
+            AuditLog.timestamp.desc(), AuditLog.id.desc()).limit(51)),
+        ('users.logs?user_id=&start=', db.query(AuditLog).filter(
+            AuditLog.user_id == 1, AuditLog.timestamp >= now - timedelta(days=7)
+        ).order_by(AuditLog.timestamp.desc(), AuditLog.id.desc()).limit(51)),
+        ('api.dashboard_stats (monthly trend)', db.query(
+            time_bucket('month', Order.created_at), func.count()
+        ).filter(Order.created_at >= bucket_start('month', 12)).group_by(time_bucket('month', Order.created_at))),
+        ('dashboard.index (order deadlines)', db.query(Order.description, Order.requested_delivery_date).filter(
+            Order.requested_delivery_date > now
+        ).order_by(Order.requested_delivery_date).limit(3)),
+    ]
+
+def explain(db, query):
+    """Return the plan of query as a list of text lines"""
+    rows = db.execute(Explain(query.statement)).all()
+    if engine.dialect.name == 'sqlite':
+        # (id, parent, notused, detail)
+        return [row[-1] for row in rows]
+    return [row[0] for row in rows]
+
+def report(strict=False):
+    warnings = SQLITE_WARNINGS if engine.dialect.name == 'sqlite' else POSTGRES_WARNINGS
+    db = SessionLocal()
+    flagged = 0
+    try:
+        print("FusionFlow Query Plan Report")
+        print("=" * 50)
+        print(f"Database Type: {engine.dialect.name}")
+        print()
+        queries = endpoint_queries(db)
+        for name, query in queries:
+            plan = explain(db, query)
+            issues = [line for line in plan if any(p.search(line) for p in warnings)]
+            status = "⚠️ " if issues else "✅"
+            print(f"{status} {name}")
+            for line in plan:
+                marker = "  !" if line in issues else "   "
+                print(f"{marker} {line}")
+            flagged += bool(issues)
+        print(f"\n{flagged} of {len(queries)} queries flagged")
+    finally:
+        db.close()
+    if strict and flagged:
+        sys.exit(1)
+    return flagged
+
+def main():
+    parser = argparse.ArgumentParser(description="Report query plans for the main FusionFlow endpoints")
+    parser.add_argument("--strict", action="store_true", help="Exit with status 1 if any query is flagged")
+    args = parser.parse_args()
+    report(strict=args.strict)
+
+if __name__ == "__main__":
+    main()
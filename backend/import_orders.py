@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+FusionFlow Order Import
+
+Imports orders from a CSV or Excel (.xlsx) file in chunks. The file is read
+row by row, so memory use does not grow with file size.
+
+Usage:
+    python backend/import_orders.py FILE --user USERNAME [--chunk-size N] [--dry-run]
+
+Arguments:
+    FILE: CSV or XLSX file with a header row
+    --user: Username recorded as the creator of the imported orders
+    --chunk-size: Rows inserted per transaction (default: IMPORT_CHUNK_SIZE)
+    --dry-run: Validate every row without inserting anything
+"""
+
+import os
+import sys
+import argparse
+
+# Add the parent directory to the Python path to import backend modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.database import SessionLocal
+from backend.models import User
+from backend.services.order_import import import_orders, ImportFormatError, IMPORT_CHUNK_SIZE
+
+def main():
+    parser = argparse.ArgumentParser(description="Import orders from a CSV or Excel file")
+    parser.add_argument("file", help="CSV or XLSX file with a header row")
+    parser.add_argument("--user", required=True, help="Username recorded as the creator of the orders")
+    parser.add_argument("--chunk-size", type=int, default=IMPORT_CHUNK_SIZE, help="Rows inserted per transaction")
+    parser.add_argument("--dry-run", action="store_true", help="Validate rows without inserting them")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        user = db.query(User).filter(User.username == args.user).first()
+        if not user:
+            print(f"❌ User '{args.user}' not found")
+            sys.exit(1)
+
+        with open(args.file, 'rb') as stream:
+            try:
+                result = import_orders(db, stream, args.file, user.id,
+                                       chunk_size=args.chunk_size, dry_run=args.dry_run)
+            except ImportFormatError as e:
+                print(f"❌ {e}")
+                sys.exit(1)
+
+        verb = "validated" if result.dry_run else "imported"
+        print(f"✅ {result.imported} of {result.total_rows} rows {verb}")
+        if result.error_count:
+            print(f"⚠️  {result.error_count} rows rejected:")
+            for row_number, message in result.errors:
+                print(f"   row {row_number}: {message}")
+            if result.error_count > len(result.errors):
+                print(f"   ... {result.error_count - len(result.errors)} more")
+            sys.exit(2)
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+"""
+FusionFlow Mock Carrier Server
+
+Serves the DHL, FedEx and Aramex tracking endpoints used by the carrier
+adapters, so the tracking sync can be run and load tested without carrier
+accounts. Every tracking number moves through the shipment lifecycle over
+time (one stage per --step seconds, offset by a hash of the number), and
+numbers starting with UNKNOWN are reported as not found.
+
+Usage:
+    python backend/mock_carrier_server.py [--port 8099] [--step 60] [--latency 50] [--rate-limit 0]
+    TRACKING_API_URL=http://localhost:8099 python backend/sync_tracking.py
+
+Arguments:
+    --port: Port to listen on
+    --step: Seconds each tracking number spends in a stage
+    --latency: Milliseconds added to every response
+    --rate-limit: Requests per second allowed per carrier before answering 429 (0 = unlimited)
+"""
+
+import argparse
+import json
+import threading
+import time
+import zlib
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+# (DHL statusCode, FedEx code, Aramex UpdateCode, description, location)
+STAGES = [
+    ('pre-transit', 'OC', 'SH014', 'Shipment information received', 'Hamburg, DE'),
+    ('transit', 'PU', 'SH012', 'Picked up', 'Hamburg, DE'),
+    ('transit', 'DP', 'SH001', 'Departed facility', 'Leipzig, DE'),
+    ('transit', 'AR', 'SH001', 'Arrived at facility', 'Doha, QA'),
+    ('transit', 'OD', 'SH003', 'Out for delivery', 'Doha, QA'),
+    ('delivered', 'DL', 'SH005', 'Delivered', 'Doha, QA'),
+]
+
+class MockCarrier:
+    def __init__(self, step, rate_limit):
+        self.step = step
+        self.rate_limit = rate_limit
+        self.started = time.time()
+        self.requests = {}
+        self.lock = threading.Lock()
+
+    def allow(self, carrier):
+        """Fixed one-second window per carrier"""
+        if not self.rate_limit:
+            return True
+        window = int(time.time())
+        with self.lock:
+            start, count = self.requests.get(carrier, (window, 0))
+            if start != window:
+                start, count = window, 0
+            self.requests[carrier] = (start, count + 1)
+            return count < self.rate_limit
+
+    def history(self, tracking_number):
+        """Stages reached so far as [(stage, timestamp)], oldest first"""
+        offset = zlib.crc32(tracking_number.encode()) % len(STAGES)
+        elapsed = int((time.time() - self.started) / self.step)
+        reached = min(offset + elapsed, len(STAGES) - 1)
+        base = datetime.fromtimestamp(self.started, timezone.utc) - timedelta(seconds=self.step * offset)
+        return [(STAGES[i], base + timedelta(seconds=self.step * i)) for i in range(reached + 1)]
+
+def _dhl_event(stage, at):
+    city, country = stage[4].split(', ')
+    return {
+        'timestamp': at.isoformat(),
+        'location': {'address': {'addressLocality': city, 'countryCode': country}},
+        'statusCode': stage[0],
+        'status': stage[3],
+        'description': stage[3],
+    }
+
+def _fedex_event(stage, at, code_key):
+    city, country = stage[4].split(', ')
+    return {
+        'date': at.isoformat(),
+        code_key: stage[1],
+        'eventDescription': stage[3],
+        'description': stage[3],
+        'scanLocation': {'city': city, 'countryCode': country},
+    }
+
+def _aramex_update(tracking_number, stage, at):
+    return {
+        'WaybillNumber': tracking_number,
+        'UpdateCode': stage[2],
+        'UpdateDescription': stage[3],
+        'UpdateDateTime': f'/Date({int(at.timestamp() * 1000)}+0000)/',
+        'UpdateLocation': stage[4],
+        'Comments': '',
+        'ProblemCode': '',
+    }
+
+class Handler(BaseHTTPRequestHandler):
+    carrier = None
+    latency = 0
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, body=None, headers=None):
+        time.sleep(self.latency)
+        payload = json.dumps(body or {}).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _body(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        return self.rfile.read(length) if length else b''
+
+    def _limited(self, carrier):
+        if self.carrier.allow(carrier):
+            return False
+        self._send(429, {'title': 'Too Many Requests'}, {'Retry-After': '1'})
+        return True
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path != '/track/shipments':
+            return self._send(404, {'title': 'Not Found'})
+        if self._limited('dhl'):
+            return
+        tracking_number = (parse_qs(url.query).get('trackingNumber') or [''])[0]
+        if not tracking_number or tracking_number.startswith('UNKNOWN'):
+            return self._send(404, {'title': 'No shipment with given tracking number found.'})
+        history = self.carrier.history(tracking_number)
+        self._send(200, {'shipments': [{
+            'id': tracking_number,
+            'service': 'express',
+            'status': _dhl_event(*history[-1]),
+            'events': [_dhl_event(stage, at) for stage, at in reversed(history)],
+        }]})
+
+    def do_POST(self):
+        path = urlparse(self.path).path
+        body = self._body()
+        if path == '/oauth/token':
+            return self._send(200, {'access_token': 'mock-token', 'token_type': 'bearer', 'expires_in': 3600})
+        if path == '/track/v1/trackingnumbers':
+            if self._limited('fedex'):
+                return
+            if self.headers.get('Authorization') != 'Bearer mock-token':
+                return self._send(401, {'errors': [{'code': 'NOT.AUTHORIZED.ERROR'}]})
+            numbers = [i['trackingNumberInfo']['trackingNumber'] for i in json.loads(body).get('trackingInfo', [])]
+            return self._send(200, {'output': {'completeTrackResults': [self._fedex(n) for n in numbers]}})
+        if path.endswith('/json/TrackShipments'):
+            if self._limited('aramex'):
+                return
+            numbers = json.loads(body).get('Shipments', [])
+            return self._send(200, {'HasErrors': False, 'Notifications': [], 'TrackingResults': [
+                {'Key': n, 'Value': [_aramex_update(n, stage, at) for stage, at in self.carrier.history(n)]}
+                for n in numbers if not n.startswith('UNKNOWN')
+            ]})
+        self._send(404, {'title': 'Not Found'})
+
+    def _fedex(self, tracking_number):
+        if tracking_number.startswith('UNKNOWN'):
+            return {'trackingNumber': tracking_number, 'trackResults': [
+                {'error': {'code': 'TRACKING.TRACKINGNUMBER.NOTFOUND'}}
+            ]}
+        history = self.carrier.history(tracking_number)
+        stage, at = history[-1]
+        track = {
+            'latestStatusDetail': _fedex_event(stage, at, 'code'),
+            'scanEvents': [_fedex_event(s, a, 'derivedStatusCode') for s, a in reversed(history)],
+            'dateAndTimes': [{'type': 'ACTUAL_DELIVERY', 'dateTime': at.isoformat()}] if stage[1] == 'DL' else [],
+        }
+        return {'trackingNumber': tracking_number, 'trackResults': [track]}
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve mock DHL, FedEx and Aramex tracking APIs")
+    parser.add_argument("--port", type=int, default=8099, help="Port to listen on")
+    parser.add_argument("--step", type=float, default=60, help="Seconds each tracking number spends in a stage")
+    parser.add_argument("--latency", type=float, default=50, help="Milliseconds added to every response")
+    parser.add_argument("--rate-limit", type=int, default=0, help="Requests per second per carrier (0 = unlimited)")
+    args = parser.parse_args()
+
+    Handler.carrier = MockCarrier(args.step, args.rate_limit)
+    Handler.latency = args.latency / 1000
+    server = ThreadingHTTPServer(('127.0.0.1', args.port), Handler)
+    print(f"✅ Mock carrier server listening on http://127.0.0.1:{args.port}")
+    print(f"   Run the sync with TRACKING_API_URL=http://127.0.0.1:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\nStopped.")
+
+if __name__ == "__main__":
+    main()
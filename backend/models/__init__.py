@@ -2,9 +2,13 @@ from .users import User
 from .projects import Project
 from .suppliers import Supplier
 from .orders import Order
-from .shipments import Shipment, ShipmentStatusHistory
+from .shipments import Shipment, ShipmentStatusHistory, ShipmentHistoryArchive
 from .documents import Document
 from .notifications import Notification
 from .supplier_performance import SupplierPerformance
 from .customs import CustomsEntry
-from .costs import CostBreakdown
\ No newline at end of file
+from .costs import CostBreakdown
+from .dashboard_snapshot import DashboardCounter
+from .number_sequences import NumberSequence
+from .background_jobs import BackgroundJob
+from .tracking_webhooks import TrackingWebhookEvent
\ No newline at end of file
@@ -1,9 +1,16 @@
-from sqlalchemy import Column, Integer, String, DateTime, Text, JSON
+from sqlalchemy import Column, Integer, String, DateTime, Text, JSON, Index
 from backend.database import Base
 from datetime import datetime
 
 class AuditLog(Base):
     __tablename__ = "audit_logs"
+    __table_args__ = (
+        Index("ix_audit_logs_timestamp_id", "timestamp", "id"),
+        Index("ix_audit_logs_action_timestamp", "action", "timestamp", "id"),
+        Index("ix_audit_logs_entity_type_timestamp", "entity_type", "timestamp", "id"),
+        Index("ix_audit_logs_user_timestamp", "user_id", "timestamp", "id"),
+        Index("ix_audit_logs_level_timestamp", "level", "timestamp", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
 
@@ -19,8 +26,9 @@ class AuditLog(Base):
 
     # Details
     description = Column(String(500))
-    old_values = Column(JSON)  # Before state
-    new_values = Column(JSON)  # After state
+    # none_as_null: the batched writer passes every column, so None must be SQL NULL, not JSON 'null'
+    old_values = Column(JSON(none_as_null=True))  # Before state
+    new_values = Column(JSON(none_as_null=True))  # After state
 
     # Context
     ip_address = Column(String(45))  # Support IPv6
@@ -35,6 +43,6 @@ class AuditLog(Base):
     timestamp = Column(DateTime, default=datetime.utcnow, nullable=False)
 
     # Additional metadata
-    meta_data = Column(JSON)
+    meta_data = Column(JSON(none_as_null=True))
 
     level = Column(String(20), default="info")  # info, warning, critical, etc.
\ No newline at end of file
@@ -0,0 +1,32 @@
+from sqlalchemy import Column, Integer, String, DateTime, Text, JSON, Index
+from backend.database import Base
+from datetime import datetime
+
+class BackgroundJob(Base):
+    __tablename__ = "background_jobs"
+    __table_args__ = (
+        # Resuming queued and retrying jobs after a restart
+        Index("ix_background_jobs_status_created", "status", "created_at"),
+    )
+
+    id = Column(String(32), primary_key=True)  # uuid4 hex
+
+    # What to run
+    name = Column(String(100), nullable=False)  # Registered job name, e.g. "suppliers.recalculate_metrics"
+    args = Column(JSON)
+
+    # Duplicate submissions with the same key return the existing job
+    idempotency_key = Column(String(100), unique=True)
+
+    # Progress
+    status = Column(String(20), nullable=False, default="queued")  # queued, running, retrying, succeeded, failed
+    attempts = Column(Integer, nullable=False, default=0)
+    max_attempts = Column(Integer, nullable=False, default=3)
+    result = Column(JSON)
+    error = Column(Text)
+
+    # Metadata
+    created_by_id = Column(Integer)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    started_at = Column(DateTime)
+    finished_at = Column(DateTime)
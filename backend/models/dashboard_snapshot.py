@@ -0,0 +1,15 @@
+from sqlalchemy import Column, Integer, String, DateTime, BigInteger
+from backend.database import Base
+from datetime import datetime
+
+class DashboardCounter(Base):
+    __tablename__ = "dashboard_counters"
+
+    id = Column(Integer, primary_key=True, index=True)
+
+    # Counter identification, e.g. "orders.total", "orders.status:Draft"
+    metric_key = Column(String(100), unique=True, nullable=False, index=True)
+    value = Column(BigInteger, nullable=False, default=0)
+
+    # Metadata
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
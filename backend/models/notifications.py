@@ -1,10 +1,17 @@
-from sqlalchemy import Column, Integer, String, DateTime, Text, ForeignKey, Boolean, JSON
+from sqlalchemy import Column, Integer, String, DateTime, Text, ForeignKey, Boolean, JSON, Index
 from sqlalchemy.orm import relationship
 from backend.database import Base
 from datetime import datetime
 
 class Notification(Base):
     __tablename__ = "notifications"
+    __table_args__ = (
+        # Unread polling per user, newest first
+        Index("ix_notifications_user_read_created", "user_id", "is_read", "created_at"),
+        # Scheduler: due scheduled notifications and expired ones to archive
+        Index("ix_notifications_pending_schedule", "sent_via_app", "scheduled_send_time"),
+        Index("ix_notifications_archived_expires", "is_archived", "expires_at"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
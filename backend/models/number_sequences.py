@@ -0,0 +1,15 @@
+from sqlalchemy import Column, Integer, String, DateTime, BigInteger
+from backend.database import Base
+from datetime import datetime
+
+class NumberSequence(Base):
+    __tablename__ = "number_sequences"
+
+    id = Column(Integer, primary_key=True, index=True)
+
+    # Sequence identification, e.g. "orders", "projects"
+    name = Column(String(50), unique=True, nullable=False, index=True)
+    next_value = Column(BigInteger, nullable=False, default=1)
+
+    # Metadata
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -1,10 +1,21 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text, Numeric, Boolean, JSON
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text, Numeric, Boolean, JSON, Index
 from sqlalchemy.orm import relationship
 from backend.database import Base
 from datetime import datetime
 
 class Order(Base):
     __tablename__ = "orders"
+    __table_args__ = (
+        # List filters + keyset sort on (created_at, id)
+        Index("ix_orders_created_at_id", "created_at", "id"),
+        Index("ix_orders_status_created_at", "status", "created_at", "id"),
+        Index("ix_orders_priority_created_at", "priority", "created_at", "id"),
+        Index("ix_orders_project_created_at", "project_id", "created_at", "id"),
+        Index("ix_orders_project_updated_at", "project_id", "updated_at"),
+        Index("ix_orders_supplier_created_at", "supplier_id", "created_at", "id"),
+        Index("ix_orders_assigned_user_id", "assigned_user_id"),
+        Index("ix_orders_requested_delivery_date", "requested_delivery_date"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     order_number = Column(String(50), unique=True, nullable=False, index=True)
@@ -119,7 +130,7 @@ class Order(Base):
     approval_notes = Column(Text)
 
     # Metadata
-    created_at = Column(DateTime, default=datetime.utcnow)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
     # Relationships
@@ -1,10 +1,15 @@
-from sqlalchemy import Column, Integer, String, DateTime, Text, Numeric, Boolean, ForeignKey
+from sqlalchemy import Column, Integer, String, DateTime, Text, Numeric, Boolean, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from backend.database import Base
 from datetime import datetime
 
 class Project(Base):
     __tablename__ = "projects"
+    __table_args__ = (
+        Index("ix_projects_created_at_id", "created_at", "id"),
+        Index("ix_projects_status_created_at", "status", "created_at", "id"),
+        Index("ix_projects_planned_completion_date", "planned_completion_date"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String(200), nullable=False, index=True)
@@ -52,7 +57,7 @@ class Project(Base):
     regulatory_authority = Column(String(100))  # QCAA, EASA, FAA, etc.
 
     # Metadata
-    created_at = Column(DateTime, default=datetime.utcnow)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
     # Relationships
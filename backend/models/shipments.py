@@ -1,10 +1,20 @@
-from sqlalchemy import Column, Integer, String, DateTime, Text, ForeignKey, Numeric, Boolean, JSON
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Integer, String, DateTime, Text, ForeignKey, Numeric, Boolean, JSON, Index, LargeBinary
+from sqlalchemy.orm import relationship, deferred
 from backend.database import Base
 from datetime import datetime
 
 class Shipment(Base):
     __tablename__ = "shipments"
+    __table_args__ = (
+        # List filters + keyset sort on (created_at, id)
+        Index("ix_shipments_created_at_id", "created_at", "id"),
+        Index("ix_shipments_current_status_created_at", "current_status", "created_at", "id"),
+        Index("ix_shipments_carrier_created_at", "carrier", "created_at", "id"),
+        Index("ix_shipments_order_id", "order_id"),
+        Index("ix_shipments_assigned_user_id", "assigned_user_id"),
+        Index("ix_shipments_estimated_delivery_date", "estimated_delivery_date"),
+        Index("ix_shipments_next_api_sync_at", "next_api_sync_at"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     order_id = Column(Integer, ForeignKey("orders.id"), nullable=False)
@@ -80,7 +90,7 @@ class Shipment(Base):
     requires_temperature_control = Column(Boolean, default=False)
     min_temperature_c = Column(Integer)
     max_temperature_c = Column(Integer)
-    temperature_log = Column(JSON)  # Temperature readings during transit
+    temperature_log = deferred(Column(JSON))  # Temperature readings during transit
 
     # Customs and international shipping
     is_international = Column(Boolean, default=False)
@@ -113,15 +123,17 @@ class Shipment(Base):
     # API integration tracking
     last_api_sync = Column(DateTime)
     api_sync_frequency_minutes = Column(Integer, default=30)
-    tracking_api_response = Column(JSON)  # {"status": "success", "message": "Tracking data updated"}
+    next_api_sync_at = Column(DateTime, default=datetime.utcnow)  # last_api_sync + api_sync_frequency_minutes
+    tracking_api_response = deferred(Column(JSON))  # {"status": "success", "message": "Tracking data updated"}
 
     # Metadata
-    created_at = Column(DateTime, default=datetime.utcnow)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
     # Relationships
     order = relationship("Order", back_populates="shipments")
     status_history = relationship("ShipmentStatusHistory", back_populates="shipment", cascade="all, delete-orphan")
+    history_archive = relationship("ShipmentHistoryArchive", back_populates="shipment", uselist=False, cascade="all, delete-orphan")
     customs_entries = relationship("CustomsEntry", back_populates="shipment", cascade="all, delete-orphan")
     assigned_user_id = Column(Integer, ForeignKey("users.id"), nullable=True)
     assigned_user = relationship("User", foreign_keys=[assigned_user_id])
@@ -129,6 +141,10 @@ class Shipment(Base):
 
 class ShipmentStatusHistory(Base):
     __tablename__ = "shipment_status_history"
+    __table_args__ = (
+        # A shipment's timeline, newest first
+        Index("ix_shipment_status_history_shipment_timestamp", "shipment_id", "timestamp", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     shipment_id = Column(Integer, ForeignKey("shipments.id"), nullable=False)
@@ -145,13 +161,30 @@ class ShipmentStatusHistory(Base):
     next_action = Column(String(200))
 
     # Source of update
-    update_source = Column(String(20), default="API")  # API, Manual, System
+    update_source = Column(String(20), default="API")  # API, Webhook, Manual, System
     updated_by = Column(String(100))
 
-    # Raw data from carrier API
-    raw_api_data = Column(JSON)
+    # Raw data from carrier API; only loaded when accessed
+    raw_api_data = deferred(Column(JSON))
 
     created_at = Column(DateTime, default=datetime.utcnow)
 
     # Relationships
-    shipment = relationship("Shipment", back_populates="status_history")
\ No newline at end of file
+    shipment = relationship("Shipment", back_populates="status_history")
+
+class ShipmentHistoryArchive(Base):
+    __tablename__ = "shipment_history_archives"
+
+    id = Column(Integer, primary_key=True, index=True)
+    shipment_id = Column(Integer, ForeignKey("shipments.id"), nullable=False, unique=True)
+
+    # Compacted status history rows, oldest first
+    event_count = Column(Integer, nullable=False, default=0)
+    first_timestamp = Column(DateTime)
+    last_timestamp = Column(DateTime)
+    data = deferred(Column(LargeBinary))  # zlib-compressed JSON list of the rows, including raw_api_data
+
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    # Relationships
+    shipment = relationship("Shipment", back_populates="history_archive")
\ No newline at end of file
@@ -0,0 +1,29 @@
+from sqlalchemy import Column, Integer, String, DateTime, Text, JSON, Index
+from backend.database import Base
+from datetime import datetime
+
+class TrackingWebhookEvent(Base):
+    __tablename__ = "tracking_webhook_events"
+    __table_args__ = (
+        # Processor picks up unprocessed events in arrival order
+        Index("ix_tracking_webhook_events_pending", "processed_at", "id"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+
+    # sha256 of tracking_number|status|timestamp; repeated deliveries are dropped on insert
+    event_hash = Column(String(64), unique=True, nullable=False)
+
+    # Event as sent by the carrier, statuses mapped to ours
+    carrier = Column(String(100))
+    tracking_number = Column(String(100), nullable=False)
+    status = Column(String(30), nullable=False)
+    location = Column(String(200))
+    timestamp = Column(DateTime, nullable=False)
+    description = Column(Text)
+    exception_code = Column(String(20))
+    payload = Column(JSON)
+
+    # Processing
+    received_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    processed_at = Column(DateTime)  # Set when applied to the shipment, or given up after WEBHOOK_UNMATCHED_TTL_DAYS without one
@@ -0,0 +1,45 @@
+"""
+Statement counting for N+1 checks.
+
+    with QueryCounter() as counter:
+        client.get('/api/orders?per_page=100')
+    assert counter.count <= 4, counter.statements
+
+assert_statement_count() wraps the same check for a Flask test client.
+"""
+from sqlalchemy import event
+from backend.database import engine as default_engine
+
+class QueryCounter:
+    """Context manager recording every SQL statement executed on an engine"""
+
+    def __init__(self, engine=None):
+        self.engine = engine or default_engine
+        self.statements = []
+
+    def _record(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(statement)
+
+    def __enter__(self):
+        self.statements = []
+        event.listen(self.engine, 'before_cursor_execute', self._record)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        event.remove(self.engine, 'before_cursor_execute', self._record)
+        return False
+
+    @property
+    def count(self):
+        return len(self.statements)
+
+def assert_statement_count(client, path, max_statements, engine=None, **request_kwargs):
+    """GET path with a Flask test client and fail if it runs more than max_statements"""
+    with QueryCounter(engine) as counter:
+        response = client.get(path, **request_kwargs)
+    if counter.count > max_statements:
+        listing = '\n'.join(f'  {i + 1}. {s}' for i, s in enumerate(counter.statements))
+        raise AssertionError(
+            f"{path} executed {counter.count} statements (max {max_statements}):\n{listing}"
+        )
+    return response
@@ -0,0 +1,185 @@
+import atexit
+import logging
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+from backend.models.audit_log import AuditLog
+
+logger = logging.getLogger(__name__)
+
+# Flush when this many events are queued...
+AUDIT_BATCH_SIZE = int(os.getenv('AUDIT_BATCH_SIZE', 200))
+# ...or when the oldest queued event is this many seconds old
+AUDIT_MAX_LATENCY = float(os.getenv('AUDIT_MAX_LATENCY', 1.0))
+# Events held in memory before record() starts dropping them
+AUDIT_QUEUE_SIZE = int(os.getenv('AUDIT_QUEUE_SIZE', 10000))
+# Levels written synchronously before record() returns
+AUDIT_DURABLE_LEVELS = {
+    level.strip() for level in os.getenv('AUDIT_DURABLE_LEVELS', 'critical').split(',') if level.strip()
+}
+# Set to false to write every event inline (e.g. in scripts and tests)
+AUDIT_ASYNC = os.getenv('AUDIT_ASYNC', 'true').lower() in ('1', 'true', 'yes')
+
+AUDIT_FIELDS = (
+    'user_id', 'username', 'user_role', 'action', 'entity_type', 'entity_id', 'description',
+    'old_values', 'new_values', 'ip_address', 'user_agent', 'session_id', 'system_source',
+    'correlation_id', 'meta_data', 'level', 'timestamp'
+)
+
+_STOP = object()
+
+class AuditWriter:
+    """
+    Background writer that inserts queued audit events in batches.
+
+    A batch is written when AUDIT_BATCH_SIZE events are waiting or the oldest
+    has waited AUDIT_MAX_LATENCY seconds, whichever comes first, so a burst of
+    events costs one INSERT ... executemany and one commit per batch.
+    """
+
+    def __init__(self, session_factory=None, batch_size=AUDIT_BATCH_SIZE,
+                 max_latency=AUDIT_MAX_LATENCY, queue_size=AUDIT_QUEUE_SIZE):
+        self.session_factory = session_factory
+        self.batch_size = max(batch_size, 1)
+        self.max_latency = max_latency
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.dropped = 0
+        self._thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _sessions(self):
+        if self.session_factory is None:
+            from backend.database import SessionLocal
+            self.session_factory = SessionLocal
+        return self.session_factory
+
+    def _ensure_started(self):
+        # Restart in a forked worker, where the parent's thread does not exist
+        if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive() or self._pid != os.getpid():
+                self._pid = os.getpid()
+                self._thread = threading.Thread(target=self._run, name='audit-writer', daemon=True)
+                self._thread.start()
+
+    def submit(self, event):
+        """Queue an event mapping; returns False if the queue is full and it was dropped"""
+        self._ensure_started()
+        try:
+            self.queue.put_nowait(event)
+            return True
+        except queue.Full:
+            self.dropped += 1
+            if self.dropped == 1 or self.dropped % 1000 == 0:
+                logger.warning("Audit queue full; %d events dropped so far", self.dropped)
+            return False
+
+    def write(self, events):
+        """Insert events in one transaction, retrying transient failures"""
+        for attempt in range(3):
+            db = self._sessions()()
+            try:
+                db.bulk_insert_mappings(AuditLog, events)
+                db.commit()
+                return True
+            except Exception:
+                db.rollback()
+                if attempt == 2:
+                    logger.exception("Failed to write %d audit events", len(events))
+                    return False
+                time.sleep(0.2 * (attempt + 1))
+            finally:
+                db.close()
+
+    def flush(self, timeout=10):
+        """Block until everything queued so far has been written"""
+        if self._thread is None or not self._thread.is_alive():
+            return
+        done = threading.Event()
+        self.queue.put(done)
+        done.wait(timeout)
+
+    def shutdown(self, timeout=10):
+        """Write remaining events and stop the thread"""
+        if self._thread is None or not self._thread.is_alive() or self._pid != os.getpid():
+            return
+        self.queue.put(_STOP)
+        self._thread.join(timeout)
+
+    def _run(self):
+        batch = []
+        waiters = []
+        deadline = None
+        while True:
+            timeout = None if deadline is None else max(deadline - time.monotonic(), 0)
+            try:
+                item = self.queue.get(timeout=timeout)
+            except queue.Empty:
+                item = None
+
+            stop = item is _STOP
+            if isinstance(item, threading.Event):
+                waiters.append(item)
+            elif item is not None and not stop:
+                batch.append(item)
+                if deadline is None:
+                    deadline = time.monotonic() + self.max_latency
+
+            due = deadline is not None and time.monotonic() >= deadline
+            if batch and (stop or waiters or due or len(batch) >= self.batch_size):
+                self.write(batch)
+                batch = []
+                deadline = None
+            for waiter in waiters:
+                waiter.set()
+            waiters = []
+            if not batch:
+                deadline = None
+            if stop:
+                return
+
+_writer = AuditWriter()
+atexit.register(_writer.shutdown)
+
+def get_writer():
+    return _writer
+
+def record(action, entity_type, entity_id=None, description=None, level='info', user=None,
+           durable=None, **fields):
+    """
+    Record an audit event.
+
+    Events are queued and written in batches by a background thread. Levels
+    in AUDIT_DURABLE_LEVELS (or durable=True) are committed before this
+    returns. user may be any object with id, username and role; other
+    AuditLog columns can be passed as keyword arguments.
+    """
+    unknown = set(fields) - set(AUDIT_FIELDS)
+    if unknown:
+        raise TypeError(f"Unknown audit fields: {', '.join(sorted(unknown))}")
+    event = {field: None for field in AUDIT_FIELDS}
+    if user is not None:
+        event.update(user_id=user.id, username=user.username, user_role=user.role)
+    event.update(fields)
+    event.update(
+        action=action,
+        entity_type=entity_type,
+        entity_id=entity_id,
+        description=description,
+        level=level,
+        timestamp=fields.get('timestamp') or datetime.utcnow(),
+    )
+
+    if durable is None:
+        durable = level in AUDIT_DURABLE_LEVELS
+    if durable or not AUDIT_ASYNC:
+        return _writer.write([event])
+    return _writer.submit(event)
+
+def flush(timeout=10):
+    """Wait for queued events to be written"""
+    _writer.flush(timeout)
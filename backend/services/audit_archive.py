@@ -0,0 +1,357 @@
+import glob
+import gzip
+import heapq
+import json
+import os
+import re
+from datetime import datetime, date
+from decimal import Decimal
+from types import SimpleNamespace
+import sqlalchemy as sa
+from backend.models.audit_log import AuditLog
+
+# Months of audit history kept in the database; older months are archived
+AUDIT_RETENTION_MONTHS = int(os.getenv('AUDIT_RETENTION_MONTHS', 12))
+# Where archived months are written as gzip JSONL, one file per month
+AUDIT_ARCHIVE_DIR = os.getenv('AUDIT_ARCHIVE_DIR', './archive/audit_logs')
+# Future monthly partitions kept ready on PostgreSQL
+AUDIT_PARTITIONS_AHEAD = int(os.getenv('AUDIT_PARTITIONS_AHEAD', 3))
+# Rows deleted per transaction when archiving without partitions
+ARCHIVE_DELETE_BATCH = int(os.getenv('ARCHIVE_DELETE_BATCH', 5000))
+
+TABLE = AuditLog.__table__
+ARCHIVE_FILE = re.compile(r'audit_logs_(\d{4})_(\d{2})\.jsonl\.gz$')
+
+def month_start(value):
+    return datetime(value.year, value.month, 1)
+
+def add_months(start, months):
+    year, month = divmod(start.month - 1 + months, 12)
+    return datetime(start.year + year, month + 1, 1)
+
+def partition_name(start):
+    return f'{TABLE.name}_{start:%Y_%m}'
+
+def archive_path(start, archive_dir=AUDIT_ARCHIVE_DIR):
+    return os.path.join(archive_dir, f'{TABLE.name}_{start:%Y_%m}.jsonl.gz')
+
+def _is_postgres(bind):
+    return bind.dialect.name == 'postgresql'
+
+# -- PostgreSQL partitions ---------------------------------------------------
+
+def is_partitioned(conn):
+    if not _is_postgres(conn):
+        return False
+    return conn.execute(sa.text(
+        "SELECT 1 FROM pg_partitioned_table p JOIN pg_class c ON c.oid = p.partrelid "
+        "WHERE c.relname = :name AND pg_table_is_visible(c.oid)"
+    ), {'name': TABLE.name}).first() is not None
+
+def _partitions(conn):
+    """Monthly partitions of audit_logs by month start"""
+    names = conn.execute(sa.text(
+        "SELECT c.relname FROM pg_inherits i "
+        "JOIN pg_class c ON c.oid = i.inhrelid JOIN pg_class p ON p.oid = i.inhparent "
+        "WHERE p.relname = :name AND pg_table_is_visible(p.oid)"
+    ), {'name': TABLE.name}).scalars()
+    partitions = {}
+    for name in names:
+        match = re.fullmatch(rf'{TABLE.name}_(\d{{4}})_(\d{{2}})', name)
+        if match:
+            partitions[datetime(int(match.group(1)), int(match.group(2)), 1)] = name
+    return partitions
+
+def _create_partition(conn, start):
+    """Create the partition for one month, moving any rows the default partition holds for it"""
+    end = add_months(start, 1)
+    bounds = {'start': start, 'end': end}
+    default = f'{TABLE.name}_default'
+    stranded = conn.execute(sa.text(
+        f'SELECT 1 FROM {default} WHERE timestamp >= :start AND timestamp < :end LIMIT 1'
+    ), bounds).first()
+    if stranded:
+        conn.execute(sa.text(f'CREATE TEMP TABLE audit_logs_moving (LIKE {TABLE.name}) ON COMMIT DROP'))
+        conn.execute(sa.text(
+            f'WITH moved AS (DELETE FROM {default} WHERE timestamp >= :start AND timestamp < :end RETURNING *) '
+            'INSERT INTO audit_logs_moving SELECT * FROM moved'
+        ), bounds)
+    conn.execute(sa.text(
+        f"CREATE TABLE {partition_name(start)} PARTITION OF {TABLE.name} "
+        f"FOR VALUES FROM ('{start:%Y-%m-%d}') TO ('{end:%Y-%m-%d}')"
+    ))
+    if stranded:
+        conn.execute(sa.text(f'INSERT INTO {TABLE.name} SELECT * FROM audit_logs_moving'))
+        conn.execute(sa.text('DROP TABLE audit_logs_moving'))
+
+def ensure_partitions(conn, ahead=AUDIT_PARTITIONS_AHEAD, since=None, now=None):
+    """Create missing monthly partitions from since (default: this month) to ahead months out"""
+    if not is_partitioned(conn):
+        return []
+    existing = _partitions(conn)
+    current = month_start(since or now or datetime.utcnow())
+    last = add_months(month_start(now or datetime.utcnow()), ahead)
+    created = []
+    while current <= last:
+        if current not in existing:
+            _create_partition(conn, current)
+            created.append(partition_name(current))
+        current = add_months(current, 1)
+    return created
+
+def partition_audit_logs(engine, ahead=AUDIT_PARTITIONS_AHEAD):
+    """
+    Convert audit_logs into a table range-partitioned by month (PostgreSQL only).
+
+    Existing rows are copied into monthly partitions and the old table is
+    dropped. Rows outside the prepared months land in a default partition
+    until their month is created. The primary key becomes (id, timestamp)
+    because PostgreSQL requires the partition key in unique constraints.
+    """
+    if not _is_postgres(engine):
+        return False
+    with engine.begin() as conn:
+        if is_partitioned(conn):
+            ensure_partitions(conn, ahead)
+            return False
+        oldest = conn.execute(sa.select(sa.func.min(TABLE.c.timestamp))).scalar()
+        old = f'{TABLE.name}_unpartitioned'
+        conn.execute(sa.text(f'ALTER TABLE {TABLE.name} RENAME TO {old}'))
+        # Index names are schema-wide; the old table is dropped at the end anyway
+        for index in sa.inspect(conn).get_indexes(old):
+            conn.execute(sa.text(f'DROP INDEX {index["name"]}'))
+        conn.execute(sa.text(f'ALTER TABLE {old} DROP CONSTRAINT IF EXISTS {TABLE.name}_pkey'))
+        conn.execute(sa.text(f'ALTER SEQUENCE {TABLE.name}_id_seq OWNED BY NONE'))
+
+        conn.execute(sa.text(
+            f'CREATE TABLE {TABLE.name} (LIKE {old} INCLUDING DEFAULTS) PARTITION BY RANGE (timestamp)'
+        ))
+        conn.execute(sa.text(f'ALTER TABLE {TABLE.name} ADD PRIMARY KEY (id, timestamp)'))
+        conn.execute(sa.text(f'ALTER SEQUENCE {TABLE.name}_id_seq OWNED BY {TABLE.name}.id'))
+        for index in TABLE.indexes:
+            index.create(bind=conn)
+        conn.execute(sa.text(f'CREATE TABLE {TABLE.name}_default PARTITION OF {TABLE.name} DEFAULT'))
+        ensure_partitions(conn, ahead, since=oldest)
+
+        conn.execute(sa.text(f'INSERT INTO {TABLE.name} SELECT * FROM {old}'))
+        conn.execute(sa.text(f'DROP TABLE {old}'))
+    return True
+
+# -- Archival ----------------------------------------------------------------
+
+def _json_default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    raise TypeError(f"Cannot serialise {type(value).__name__}")
+
+def _archived_ids(path):
+    if not os.path.exists(path):
+        return set()
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        return {json.loads(line)['id'] for line in f}
+
+def _write_archive(conn, table, start, end, max_id, path):
+    """
+    Write the month's rows to path as gzip JSONL and return how many were written.
+
+    Rows already in an existing archive for the month (from an interrupted
+    run or an earlier late-arriving batch) are skipped; new rows are added as
+    another gzip member, which readers see as one continuous file.
+    """
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    seen = _archived_ids(path)
+    query = sa.select(table).where(table.c.timestamp >= start, table.c.timestamp < end)
+    if max_id is not None:
+        query = query.where(table.c.id <= max_id)
+    query = query.order_by(table.c.timestamp, table.c.id)
+
+    tmp = path + '.tmp'
+    written = 0
+    with open(tmp, 'wb') as out:
+        if seen:
+            with open(path, 'rb') as existing:
+                for chunk in iter(lambda: existing.read(1024 * 1024), b''):
+                    out.write(chunk)
+        with gzip.GzipFile(fileobj=out, mode='wb') as gz:
+            rows = conn.execution_options(stream_results=True, yield_per=ARCHIVE_DELETE_BATCH).execute(query)
+            for row in rows.mappings():
+                if row['id'] in seen:
+                    continue
+                gz.write(json.dumps(dict(row), default=_json_default, separators=(',', ':')).encode('utf-8'))
+                gz.write(b'\n')
+                written += 1
+        out.flush()
+        os.fsync(out.fileno())
+    if written:
+        os.replace(tmp, path)
+    else:
+        os.remove(tmp)
+    return written
+
+def _delete_month(engine, start, end, max_id):
+    """Delete archived rows in batches so each transaction holds the write lock briefly"""
+    deleted = 0
+    while True:
+        with engine.begin() as conn:
+            ids = sa.select(TABLE.c.id).where(
+                TABLE.c.timestamp >= start, TABLE.c.timestamp < end, TABLE.c.id <= max_id
+            ).limit(ARCHIVE_DELETE_BATCH)
+            count = conn.execute(TABLE.delete().where(TABLE.c.id.in_(ids))).rowcount
+        deleted += count
+        if count < ARCHIVE_DELETE_BATCH:
+            return deleted
+
+def _detached_partitions(conn):
+    """Month partitions left detached by an archive run that failed before dropping them"""
+    if not _is_postgres(conn):
+        return {}
+    names = conn.execute(sa.text(
+        "SELECT c.relname FROM pg_class c WHERE c.relkind = 'r' AND c.relname ~ :pattern "
+        "AND pg_table_is_visible(c.oid) AND NOT EXISTS (SELECT 1 FROM pg_inherits i WHERE i.inhrelid = c.oid)"
+    ), {'pattern': rf'^{TABLE.name}_[0-9]{{4}}_[0-9]{{2}}$'}).scalars()
+    return {datetime(int(name[-7:-3]), int(name[-2:]), 1): name for name in names}
+
+def _archive_partition(engine, partition, start, end, path, attached=True):
+    """
+    Archive a month partition and drop it; returns the rows dropped.
+
+    The rows are written while the partition is still attached, so audit
+    writes are not blocked for the length of the export. Detaching and
+    dropping then happen in one transaction, together with writing any rows
+    that arrived in between; if anything fails the partition stays attached
+    and a re-run picks it up, skipping rows already in the archive.
+    """
+    table = TABLE.to_metadata(sa.MetaData(), name=partition)
+    with engine.connect() as conn:
+        max_id = conn.execute(sa.select(sa.func.max(table.c.id))).scalar()
+        if max_id is not None:
+            _write_archive(conn, table, start, end, max_id, path)
+    with engine.begin() as conn:
+        if attached:
+            conn.execute(sa.text(f'ALTER TABLE {TABLE.name} DETACH PARTITION {partition}'))
+        late = sa.select(table.c.id)
+        if max_id is not None:
+            late = late.where(table.c.id > max_id)
+        if conn.execute(late.limit(1)).first() is not None:
+            _write_archive(conn, table, start, end, None, path)
+        dropped = conn.execute(sa.select(sa.func.count()).select_from(table)).scalar()
+        conn.execute(sa.text(f'DROP TABLE {partition}'))
+    return dropped
+
+def archive_month(engine, start, archive_dir=AUDIT_ARCHIVE_DIR):
+    """
+    Move one month of audit logs from the database to its archive file.
+
+    With partitions the month's partition is archived and then detached and
+    dropped. Otherwise the rows present when archiving starts (bounded by
+    the highest id) are written out and then deleted. Returns the rows
+    removed from the database, including any a resumed run had already
+    written to the archive.
+    """
+    end = add_months(start, 1)
+    path = archive_path(start, archive_dir)
+    archived = 0
+    with engine.connect() as conn:
+        partition = _partitions(conn).get(start) if is_partitioned(conn) else None
+        detached = _detached_partitions(conn).get(start)
+    if detached:
+        archived += _archive_partition(engine, detached, start, end, path, attached=False)
+    if partition:
+        archived += _archive_partition(engine, partition, start, end, path)
+
+    # Rows outside a partition: the default partition, or every row on SQLite
+    with engine.connect() as conn:
+        max_id = conn.execute(sa.select(sa.func.max(TABLE.c.id)).where(
+            TABLE.c.timestamp >= start, TABLE.c.timestamp < end
+        )).scalar()
+        if max_id is not None:
+            _write_archive(conn, TABLE, start, end, max_id, path)
+    if max_id is not None:
+        archived += _delete_month(engine, start, end, max_id)
+    return archived
+
+def archive_audit_logs(engine, retention_months=AUDIT_RETENTION_MONTHS, archive_dir=AUDIT_ARCHIVE_DIR,
+                       now=None, dry_run=False):
+    """
+    Archive every month older than the retention window.
+
+    Returns (month start, rows archived) per month. With dry_run the rows
+    that would be archived are counted and nothing is changed.
+    """
+    cutoff = add_months(month_start(now or datetime.utcnow()), -retention_months)
+    with engine.connect() as conn:
+        oldest = conn.execute(sa.select(sa.func.min(TABLE.c.timestamp)).where(TABLE.c.timestamp < cutoff)).scalar()
+        # Detached partitions are invisible to the query above; resume them too
+        detached = [month for month in _detached_partitions(conn) if month < cutoff]
+    results = []
+    if oldest is None and not detached:
+        return results
+    start = min(([month_start(oldest)] if oldest else []) + detached)
+    while start < cutoff:
+        end = add_months(start, 1)
+        if dry_run:
+            with engine.connect() as conn:
+                count = conn.execute(sa.select(sa.func.count()).select_from(TABLE).where(
+                    TABLE.c.timestamp >= start, TABLE.c.timestamp < end
+                )).scalar()
+        else:
+            count = archive_month(engine, start, archive_dir)
+        if count:
+            results.append((start, count))
+        start = end
+    return results
+
+# -- Reading archives --------------------------------------------------------
+
+def archived_months(archive_dir=AUDIT_ARCHIVE_DIR):
+    """Month starts that have an archive file, newest first"""
+    months = []
+    for path in glob.glob(os.path.join(archive_dir, f'{TABLE.name}_*.jsonl.gz')):
+        match = ARCHIVE_FILE.search(path)
+        if match:
+            months.append(datetime(int(match.group(1)), int(match.group(2)), 1))
+    return sorted(months, reverse=True)
+
+def archive_end(archive_dir=AUDIT_ARCHIVE_DIR):
+    """Exclusive upper bound of archived timestamps, or None when nothing is archived"""
+    months = archived_months(archive_dir)
+    return add_months(months[0], 1) if months else None
+
+def _archived_row(data):
+    data['timestamp'] = datetime.fromisoformat(data['timestamp'])
+    return SimpleNamespace(**data)
+
+def iter_archive(start, archive_dir=AUDIT_ARCHIVE_DIR):
+    """Rows of one archived month as objects with the AuditLog attributes"""
+    with gzip.open(archive_path(start, archive_dir), 'rt', encoding='utf-8') as f:
+        for line in f:
+            yield _archived_row(json.loads(line))
+
+def query_archive(criteria=None, start=None, end=None, before=None, limit=50, archive_dir=AUDIT_ARCHIVE_DIR):
+    """
+    Newest-first archived rows matching criteria.
+
+    criteria maps column names to required values; start/end bound the
+    timestamp ([start, end)); before is a (timestamp, id) keyset position and
+    only rows strictly older are returned. Month files outside the range are
+    not opened and at most limit rows are held in memory per month.
+    """
+    criteria = criteria or {}
+    results = []
+    for month in archived_months(archive_dir):
+        month_end = add_months(month, 1)
+        if (start and month_end <= start) or (end and month >= end) or (before and month > before[0]):
+            continue
+        matches = (
+            row for row in iter_archive(month, archive_dir)
+            if all(getattr(row, key, None) == value for key, value in criteria.items())
+            and (start is None or row.timestamp >= start)
+            and (end is None or row.timestamp < end)
+            and (before is None or (row.timestamp, row.id) < before)
+        )
+        results.extend(heapq.nlargest(limit - len(results), matches, key=lambda row: (row.timestamp, row.id)))
+        if len(results) >= limit:
+            break
+    return results
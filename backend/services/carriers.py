@@ -0,0 +1,339 @@
+import asyncio
+import os
+import re
+import time
+from collections import namedtuple
+from datetime import datetime, timezone
+
+# Point every adapter at one server, e.g. backend/mock_carrier_server.py
+TRACKING_API_URL = os.getenv('TRACKING_API_URL')
+
+TrackingEvent = namedtuple('TrackingEvent', ['status', 'location', 'timestamp', 'description', 'exception_code', 'raw'])
+
+# events are oldest first; status, location and timestamp describe the latest one
+TrackingResult = namedtuple('TrackingResult', ['tracking_number', 'status', 'location', 'timestamp', 'description', 'events', 'raw'])
+
+class CarrierError(Exception):
+    """A failed carrier API call; retryable errors are worth trying again later"""
+
+    def __init__(self, message, retryable=False, retry_after=None, status_code=None):
+        super().__init__(message)
+        self.retryable = retryable
+        self.retry_after = retry_after
+        self.status_code = status_code
+
+def parse_utc(value):
+    """Naive UTC datetime from an ISO 8601 string, as stored in the database"""
+    if not value:
+        return None
+    parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+def _retry_after(response):
+    value = response.headers.get('Retry-After')
+    try:
+        return float(value) if value else None
+    except ValueError:
+        return None
+
+def check_response(response):
+    """Raise CarrierError for a failed response"""
+    if response.status_code < 400:
+        return
+    retryable = response.status_code == 429 or response.status_code >= 500
+    raise CarrierError(f'HTTP {response.status_code}: {response.text[:200]}', retryable=retryable,
+                       retry_after=_retry_after(response), status_code=response.status_code)
+
+def _refine(status, description):
+    """Sharpen a coarse carrier status using the event description"""
+    text = (description or '').lower()
+    if 'out for delivery' in text or 'with delivery courier' in text:
+        return 'Out for Delivery'
+    if 'customs' in text and ('delay' in text or 'held' in text or 'hold' in text):
+        return 'Customs Delay'
+    if 'returned to shipper' in text or 'return to sender' in text:
+        return 'Returned'
+    return status
+
+class CarrierAdapter:
+    """
+    Tracking lookups for one carrier.
+
+    Subclasses set name, aliases and base_url and implement fetch().
+    Rate limit (requests per second) and concurrency can be overridden with
+    <ENV_PREFIX>_RATE_LIMIT and <ENV_PREFIX>_MAX_CONCURRENCY.
+    """
+    name = None
+    env_prefix = None
+    aliases = ()
+    base_url = None
+    rate_limit = 5.0
+    max_concurrency = 5
+    # Tracking numbers per API request
+    batch_size = 1
+
+    def __init__(self):
+        prefix = self.env_prefix
+        self.base_url = (TRACKING_API_URL or os.getenv(f'{prefix}_API_URL', self.base_url)).rstrip('/')
+        self.rate_limit = float(os.getenv(f'{prefix}_RATE_LIMIT', self.rate_limit))
+        self.max_concurrency = int(os.getenv(f'{prefix}_MAX_CONCURRENCY', self.max_concurrency))
+
+    def matches(self, carrier):
+        carrier = (carrier or '').strip().lower()
+        return any(carrier == alias or carrier.startswith(alias + ' ') for alias in self.aliases)
+
+    async def fetch(self, client, tracking_numbers):
+        """
+        Look up tracking numbers with an httpx.AsyncClient.
+
+        Returns {tracking_number: TrackingResult or None}, None meaning the
+        carrier does not know the number (yet). Raises CarrierError.
+        """
+        raise NotImplementedError
+
+class DHLAdapter(CarrierAdapter):
+    """DHL Shipment Tracking - Unified API"""
+    name = 'DHL'
+    env_prefix = 'DHL'
+    aliases = ('dhl',)
+    base_url = 'https://api-eu.dhl.com'
+    rate_limit = 3.0
+
+    STATUS_CODES = {
+        'pre-transit': 'Label Created',
+        'transit': 'In Transit',
+        'delivered': 'Delivered',
+        'failure': 'Exception',
+    }
+
+    def __init__(self):
+        super().__init__()
+        self.api_key = os.getenv('DHL_API_KEY', '')
+
+    def _event(self, data):
+        address = (data.get('location') or {}).get('address') or {}
+        status = self.STATUS_CODES.get(data.get('statusCode'))
+        description = data.get('description') or data.get('status')
+        return TrackingEvent(
+            status=_refine(status, description) if status else None,
+            location=', '.join(filter(None, [address.get('addressLocality'), address.get('countryCode')])) or None,
+            timestamp=parse_utc(data.get('timestamp')),
+            description=description,
+            exception_code=data.get('statusCode') if status == 'Exception' else None,
+            raw=data,
+        )
+
+    async def fetch(self, client, tracking_numbers):
+        results = {}
+        for tracking_number in tracking_numbers:
+            response = await client.get(f'{self.base_url}/track/shipments',
+                                        params={'trackingNumber': tracking_number},
+                                        headers={'DHL-API-Key': self.api_key})
+            if response.status_code == 404:
+                results[tracking_number] = None
+                continue
+            check_response(response)
+            shipments = response.json().get('shipments') or []
+            if not shipments:
+                results[tracking_number] = None
+                continue
+            data = shipments[0]
+            latest = self._event(data.get('status') or {})
+            events = sorted((self._event(e) for e in data.get('events') or []),
+                            key=lambda e: e.timestamp or datetime.min)
+            results[tracking_number] = TrackingResult(tracking_number, latest.status, latest.location,
+                                                      latest.timestamp, latest.description, events, data)
+        return results
+
+class FedExAdapter(CarrierAdapter):
+    """FedEx Track API (OAuth client credentials)"""
+    name = 'FedEx'
+    env_prefix = 'FEDEX'
+    aliases = ('fedex', 'federal express')
+    base_url = 'https://apis.fedex.com'
+    batch_size = 30  # API maximum per request
+
+    # derivedStatusCode / latestStatusDetail.code
+    STATUS_CODES = {
+        'OC': 'Label Created', 'IN': 'Label Created',
+        'PU': 'Picked Up',
+        'IT': 'In Transit', 'AR': 'In Transit', 'DP': 'In Transit', 'AF': 'In Transit',
+        'PL': 'In Transit', 'CC': 'In Transit', 'HL': 'In Transit',
+        'OD': 'Out for Delivery',
+        'DL': 'Delivered',
+        'DE': 'Exception', 'SE': 'Exception', 'DY': 'Exception', 'DD': 'Exception', 'CA': 'Exception',
+        'CD': 'Customs Delay',
+        'RS': 'Returned', 'RP': 'Returned',
+    }
+
+    def __init__(self):
+        super().__init__()
+        self.client_id = os.getenv('FEDEX_CLIENT_ID', '')
+        self.client_secret = os.getenv('FEDEX_CLIENT_SECRET', '')
+        self._token = None
+        self._token_expires = 0
+        self._token_lock = None
+
+    async def _access_token(self, client):
+        # Created lazily so the lock belongs to the running event loop
+        if self._token_lock is None:
+            self._token_lock = asyncio.Lock()
+        async with self._token_lock:
+            if self._token and time.monotonic() < self._token_expires:
+                return self._token
+            response = await client.post(f'{self.base_url}/oauth/token', data={
+                'grant_type': 'client_credentials',
+                'client_id': self.client_id,
+                'client_secret': self.client_secret,
+            })
+            check_response(response)
+            data = response.json()
+            self._token = data['access_token']
+            # Renew a minute early
+            self._token_expires = time.monotonic() + int(data.get('expires_in', 3600)) - 60
+            return self._token
+
+    def _event(self, data, code_key):
+        location = data.get('scanLocation') or {}
+        code = data.get(code_key)
+        status = self.STATUS_CODES.get(code)
+        description = data.get('eventDescription') or data.get('description')
+        return TrackingEvent(
+            status=_refine(status, description) if status else None,
+            location=', '.join(filter(None, [location.get('city'), location.get('countryCode')])) or None,
+            timestamp=parse_utc(data.get('date')),
+            description=description,
+            exception_code=data.get('exceptionCode') or (code if status == 'Exception' else None),
+            raw=data,
+        )
+
+    async def fetch(self, client, tracking_numbers):
+        token = await self._access_token(client)
+        response = await client.post(f'{self.base_url}/track/v1/trackingnumbers', json={
+            'includeDetailedScans': True,
+            'trackingInfo': [{'trackingNumberInfo': {'trackingNumber': n}} for n in tracking_numbers],
+        }, headers={'Authorization': f'Bearer {token}'})
+        if response.status_code == 401:
+            # Token revoked early; fetch a new one on the retry
+            self._token = None
+            raise CarrierError('FedEx access token rejected', retryable=True, status_code=401)
+        check_response(response)
+
+        results = dict.fromkeys(tracking_numbers)
+        for complete in (response.json().get('output') or {}).get('completeTrackResults') or []:
+            tracking_number = complete.get('trackingNumber')
+            track = (complete.get('trackResults') or [{}])[0]
+            if tracking_number not in results or track.get('error'):
+                continue
+            events = sorted((self._event(e, 'derivedStatusCode') for e in track.get('scanEvents') or []),
+                            key=lambda e: e.timestamp or datetime.min)
+            latest = self._event(track.get('latestStatusDetail') or {}, 'code')
+            timestamp = events[-1].timestamp if events else None
+            for entry in track.get('dateAndTimes') or []:
+                if entry.get('type') == 'ACTUAL_DELIVERY':
+                    timestamp = parse_utc(entry.get('dateTime'))
+            results[tracking_number] = TrackingResult(tracking_number, latest.status, latest.location,
+                                                      timestamp, latest.description, events, track)
+        return results
+
+class AramexAdapter(CarrierAdapter):
+    """Aramex Shipment Tracking (JSON endpoint of the SOAP service)"""
+    name = 'Aramex'
+    env_prefix = 'ARAMEX'
+    aliases = ('aramex',)
+    base_url = 'https://ws.aramex.net'
+    rate_limit = 2.0
+    max_concurrency = 3
+    batch_size = 50
+
+    # Common UpdateCode values; other codes are classified from the description
+    STATUS_CODES = {
+        'SH014': 'Label Created',
+        'SH012': 'Picked Up',
+        'SH003': 'Out for Delivery',
+        'SH005': 'Delivered',
+    }
+
+    DATE_PATTERN = re.compile(r'/Date\((-?\d+)([+-]\d{4})?\)/')
+
+    def __init__(self):
+        super().__init__()
+        self.client_info = {
+            'UserName': os.getenv('ARAMEX_USERNAME', ''),
+            'Password': os.getenv('ARAMEX_PASSWORD', ''),
+            'Version': 'v1.0',
+            'AccountNumber': os.getenv('ARAMEX_ACCOUNT_NUMBER', ''),
+            'AccountPin': os.getenv('ARAMEX_ACCOUNT_PIN', ''),
+            'AccountEntity': os.getenv('ARAMEX_ACCOUNT_ENTITY', ''),
+            'AccountCountryCode': os.getenv('ARAMEX_ACCOUNT_COUNTRY', ''),
+        }
+
+    @classmethod
+    def _date(cls, value):
+        # WCF dates: milliseconds since the epoch (UTC) plus the sender's offset
+        match = cls.DATE_PATTERN.match(value or '')
+        if not match:
+            return parse_utc(value)
+        return datetime.fromtimestamp(int(match.group(1)) / 1000, timezone.utc).replace(tzinfo=None)
+
+    def _status(self, code, description):
+        status = self.STATUS_CODES.get(code)
+        if status is None:
+            text = (description or '').lower()
+            if 'delivered' in text:
+                status = 'Delivered'
+            elif 'picked up' in text or 'collected' in text:
+                status = 'Picked Up'
+            elif 'exception' in text or 'unable' in text or 'refused' in text:
+                status = 'Exception'
+            elif text:
+                status = 'In Transit'
+        return _refine(status, description) if status else None
+
+    async def fetch(self, client, tracking_numbers):
+        response = await client.post(
+            f'{self.base_url}/ShippingAPI.V2/Tracking/Service_1_0.svc/json/TrackShipments',
+            json={
+                'ClientInfo': self.client_info,
+                'Shipments': list(tracking_numbers),
+                'GetLastTrackingUpdateOnly': False,
+            }
+        )
+        check_response(response)
+        data = response.json()
+        if data.get('HasErrors') and not data.get('TrackingResults'):
+            messages = '; '.join(n.get('Message', '') for n in data.get('Notifications') or [])
+            raise CarrierError(f'Aramex: {messages or "request failed"}')
+
+        results = dict.fromkeys(tracking_numbers)
+        for entry in data.get('TrackingResults') or []:
+            tracking_number = entry.get('Key')
+            if tracking_number not in results or not entry.get('Value'):
+                continue
+            events = sorted((TrackingEvent(
+                status=self._status(update.get('UpdateCode'), update.get('UpdateDescription')),
+                location=update.get('UpdateLocation'),
+                timestamp=self._date(update.get('UpdateDateTime')),
+                description=update.get('UpdateDescription'),
+                exception_code=update.get('ProblemCode') or None,
+                raw=update,
+            ) for update in entry['Value']), key=lambda e: e.timestamp or datetime.min)
+            latest = events[-1]
+            results[tracking_number] = TrackingResult(tracking_number, latest.status, latest.location,
+                                                      latest.timestamp, latest.description, events, entry)
+        return results
+
+ADAPTERS = [DHLAdapter, FedExAdapter, AramexAdapter]
+
+def get_adapters():
+    """One instance of each adapter, keyed by carrier name"""
+    return {cls.name: cls() for cls in ADAPTERS}
+
+def match_adapter(adapters, carrier):
+    """The adapter handling a Shipment.carrier value, or None"""
+    for adapter in adapters.values():
+        if adapter.matches(carrier):
+            return adapter
+    return None
@@ -0,0 +1,134 @@
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Optional
+from sqlalchemy import func, desc, case, select, union_all, literal, true
+from backend.models import Order, Project, Supplier, Shipment
+from backend.services.loader_profiles import with_profile
+
+PENDING_ORDER_STATUSES = ['Draft', 'Pending Approval']
+IN_TRANSIT_STATUSES = ['In Transit', 'Out for Delivery']
+CUSTOMS_DELAY_STATUS = 'Customs Delay'
+
+@dataclass
+class DashboardMetrics:
+    """Counters and lists shown on the dashboard and returned by the stats API"""
+    total_orders: int = 0
+    total_projects: int = 0
+    total_suppliers: int = 0
+    total_shipments: int = 0
+    active_projects: int = 0
+    pending_orders: int = 0
+    attention_orders: int = 0
+    in_transit_shipments: int = 0  # In Transit, Out for Delivery
+    customs_delay_shipments: int = 0
+    recent_deliveries: int = 0  # Delivered in the last 30 days
+    project_completion: float = 0.0  # Average completion percentage
+    order_statuses: dict = field(default_factory=dict)
+    priority_counts: dict = field(default_factory=dict)
+    upcoming_deadlines: list = field(default_factory=list)
+    recent_orders: list = field(default_factory=list)
+
+def get_dashboard_metrics(db, include_details=True, now: Optional[datetime] = None):
+    """
+    Compute dashboard metrics in a fixed number of round trips.
+
+    Order counters come from one grouped pass over orders using conditional
+    aggregation; project, supplier and shipment counters come from one
+    single-row query of scalar subqueries. With include_details the upcoming
+    deadlines (one UNION query) and recent orders (one eager-loaded query)
+    are fetched as well.
+    """
+    now = now or datetime.utcnow()
+    metrics = DashboardMetrics()
+
+    # Orders: one grouped pass feeds totals, breakdowns and attention counts
+    attention = case(
+        ((Order.priority == 'Critical') |
+         (Order.status == 'On Hold') |
+         (Order.requested_delivery_date < now), 1),
+        else_=0
+    )
+    order_groups = db.query(
+        Order.status,
+        Order.priority,
+        func.count(Order.id),
+        func.sum(attention)
+    ).group_by(Order.status, Order.priority).all()
+
+    for status, priority, count, attention_count in order_groups:
+        status_key = status or 'Unknown'
+        priority_key = priority or 'Unknown'
+        metrics.order_statuses[status_key] = metrics.order_statuses.get(status_key, 0) + count
+        metrics.priority_counts[priority_key] = metrics.priority_counts.get(priority_key, 0) + count
+        metrics.total_orders += count
+        metrics.attention_orders += attention_count or 0
+        if status in PENDING_ORDER_STATUSES:
+            metrics.pending_orders += count
+
+    # Projects, suppliers and shipments: one row of scalar subqueries
+    thirty_days_ago = now - timedelta(days=30)
+    shipment_counts = select(
+        func.count(Shipment.id),
+        func.sum(case((Shipment.current_status.in_(IN_TRANSIT_STATUSES), 1), else_=0)),
+        func.sum(case((Shipment.current_status == CUSTOMS_DELAY_STATUS, 1), else_=0)),
+        func.sum(case(((Shipment.current_status == 'Delivered') &
+                       (Shipment.actual_delivery_date >= thirty_days_ago), 1), else_=0))
+    ).subquery()
+    project_counts = select(
+        func.count(Project.id),
+        func.sum(case((Project.status == 'Active', 1), else_=0)),
+        func.avg(Project.completion_percentage)
+    ).subquery()
+    row = db.execute(select(
+        *project_counts.c,
+        select(func.count(Supplier.id)).scalar_subquery(),
+        *shipment_counts.c
+    ).select_from(project_counts.join(shipment_counts, true()))).one()
+    (total_projects, active_projects, project_completion, total_suppliers,
+     total_shipments, in_transit, customs_delay, recent_deliveries) = row
+    metrics.total_projects = total_projects
+    metrics.total_suppliers = total_suppliers
+    metrics.total_shipments = total_shipments
+    metrics.active_projects = active_projects or 0
+    metrics.project_completion = round(float(project_completion or 0), 1)
+    metrics.in_transit_shipments = in_transit or 0
+    metrics.customs_delay_shipments = customs_delay or 0
+    metrics.recent_deliveries = recent_deliveries or 0
+
+    if include_details:
+        metrics.upcoming_deadlines = get_upcoming_deadlines(db, now=now)
+        metrics.recent_orders = get_recent_orders(db)
+
+    return metrics
+
+def get_recent_orders(db, limit=10):
+    """Latest orders with project and supplier loaded for display"""
+    return with_profile(db.query(Order), Order, 'list').order_by(desc(Order.created_at)).limit(limit).all()
+
+def get_upcoming_deadlines(db, limit=3, now: Optional[datetime] = None):
+    """Next project, order and shipment deadlines, merged in a single UNION query"""
+    now = now or datetime.utcnow()
+    branches = [
+        select(
+            Project.name.label('name'),
+            Project.planned_completion_date.label('date'),
+            literal('Project').label('type')
+        ).where(Project.planned_completion_date > now)
+         .order_by(Project.planned_completion_date).limit(limit).subquery(),
+        select(
+            Order.description.label('name'),
+            Order.requested_delivery_date.label('date'),
+            literal('Order').label('type')
+        ).where(Order.requested_delivery_date > now)
+         .order_by(Order.requested_delivery_date).limit(limit).subquery(),
+        select(
+            Shipment.tracking_number.label('name'),
+            Shipment.estimated_delivery_date.label('date'),
+            literal('Shipment').label('type')
+        ).where(Shipment.estimated_delivery_date > now)
+         .order_by(Shipment.estimated_delivery_date).limit(limit).subquery(),
+    ]
+    deadlines = union_all(*[select(branch) for branch in branches]).subquery()
+    return db.execute(
+        select(deadlines).order_by(deadlines.c.date).limit(limit)
+    ).all()
@@ -0,0 +1,180 @@
+import os
+import time
+from datetime import datetime, timedelta
+from typing import Optional
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+from backend.models import Project, DashboardCounter
+from backend.services.dashboard import (
+    DashboardMetrics, get_dashboard_metrics,
+    PENDING_ORDER_STATUSES, IN_TRANSIT_STATUSES, CUSTOMS_DELAY_STATUS
+)
+
+# Seconds between full reconciles of the snapshot against the live tables
+DASHBOARD_RECONCILE_SECONDS = int(os.getenv('DASHBOARD_RECONCILE_SECONDS', 300))
+
+RECONCILED_AT_KEY = 'snapshot.reconciled_at'
+
+# Contributions of a single row to the snapshot counters. Routes capture the
+# contribution before and after a change and apply the difference.
+
+def order_contribution(order, now: Optional[datetime] = None):
+    """Counters a single order contributes to"""
+    now = now or datetime.utcnow()
+    attention = (
+        order.priority == 'Critical' or
+        order.status == 'On Hold' or
+        (order.requested_delivery_date is not None and order.requested_delivery_date < now)
+    )
+    return {
+        'orders.total': 1,
+        f'orders.status:{order.status or "Unknown"}': 1,
+        f'orders.priority:{order.priority or "Unknown"}': 1,
+        'orders.pending': int(order.status in PENDING_ORDER_STATUSES),
+        'orders.attention': int(attention),
+    }
+
+def shipment_contribution(shipment, now: Optional[datetime] = None):
+    """Counters a single shipment contributes to"""
+    now = now or datetime.utcnow()
+    recently_delivered = (
+        shipment.current_status == 'Delivered' and
+        shipment.actual_delivery_date is not None and
+        shipment.actual_delivery_date >= now - timedelta(days=30)
+    )
+    return {
+        'shipments.total': 1,
+        'shipments.in_transit': int(shipment.current_status in IN_TRANSIT_STATUSES),
+        'shipments.customs_delay': int(shipment.current_status == CUSTOMS_DELAY_STATUS),
+        'shipments.recent_deliveries': int(recently_delivered),
+    }
+
+def project_contribution(project):
+    """Counters a single project contributes to"""
+    return {
+        'projects.total': 1,
+        'projects.active': int(project.status == 'Active'),
+        'projects.completion_sum': project.completion_percentage or 0,
+    }
+
+def supplier_contribution(supplier):
+    """Counters a single supplier contributes to"""
+    return {'suppliers.total': 1}
+
+def apply_snapshot_delta(db, before=None, after=None):
+    """
+    Apply the difference between two contributions to the snapshot.
+
+    Pass before=None for a new row and after=None for a deleted row. The
+    updates join the caller's transaction and are committed with it.
+    """
+    before = before or {}
+    after = after or {}
+    for key in set(before) | set(after):
+        delta = after.get(key, 0) - before.get(key, 0)
+        if delta:
+            _increment(db, key, delta)
+
+def _increment(db, key, delta):
+    updated = db.query(DashboardCounter).filter(
+        DashboardCounter.metric_key == key
+    ).update({DashboardCounter.value: DashboardCounter.value + delta}, synchronize_session=False)
+    if updated:
+        return
+    # First time this key is seen (e.g. a new status label)
+    try:
+        with db.begin_nested():
+            db.add(DashboardCounter(metric_key=key, value=delta))
+    except IntegrityError:
+        # Another worker created it first
+        db.query(DashboardCounter).filter(
+            DashboardCounter.metric_key == key
+        ).update({DashboardCounter.value: DashboardCounter.value + delta}, synchronize_session=False)
+
+def invalidate_snapshot(db):
+    """Force a full reconcile on the next read (used after cascading deletes)"""
+    db.query(DashboardCounter).filter(
+        DashboardCounter.metric_key == RECONCILED_AT_KEY
+    ).update({DashboardCounter.value: 0}, synchronize_session=False)
+
+def reconcile_snapshot(db, now: Optional[datetime] = None):
+    """Rebuild every counter from the live tables and commit"""
+    now = now or datetime.utcnow()
+    metrics = get_dashboard_metrics(db, include_details=False, now=now)
+    completion_sum = db.query(func.sum(Project.completion_percentage)).scalar() or 0
+
+    counters = {
+        'orders.total': metrics.total_orders,
+        'orders.pending': metrics.pending_orders,
+        'orders.attention': metrics.attention_orders,
+        'projects.total': metrics.total_projects,
+        'projects.active': metrics.active_projects,
+        'projects.completion_sum': int(completion_sum),
+        'suppliers.total': metrics.total_suppliers,
+        'shipments.total': metrics.total_shipments,
+        'shipments.in_transit': metrics.in_transit_shipments,
+        'shipments.customs_delay': metrics.customs_delay_shipments,
+        'shipments.recent_deliveries': metrics.recent_deliveries,
+        RECONCILED_AT_KEY: int(time.time()),
+    }
+    for status, count in metrics.order_statuses.items():
+        counters[f'orders.status:{status}'] = count
+    for priority, count in metrics.priority_counts.items():
+        counters[f'orders.priority:{priority}'] = count
+
+    try:
+        db.query(DashboardCounter).delete(synchronize_session=False)
+        db.bulk_insert_mappings(DashboardCounter, [
+            {'metric_key': key, 'value': value, 'updated_at': now}
+            for key, value in counters.items()
+        ])
+        db.commit()
+    except IntegrityError:
+        # A concurrent reconcile won the race; its result is just as fresh
+        db.rollback()
+    return counters
+
+def get_dashboard_snapshot(db, max_age: Optional[int] = None):
+    """
+    Read the dashboard counters from the snapshot table.
+
+    This is a single read of a small, fixed-size table regardless of how many
+    orders or shipments exist. The snapshot is reconciled first if it is
+    missing or older than max_age seconds (DASHBOARD_RECONCILE_SECONDS).
+    """
+    max_age = DASHBOARD_RECONCILE_SECONDS if max_age is None else max_age
+    counters = dict(db.query(DashboardCounter.metric_key, DashboardCounter.value).all())
+    if time.time() - counters.get(RECONCILED_AT_KEY, 0) > max_age:
+        counters = reconcile_snapshot(db)
+    return _metrics_from_counters(counters)
+
+def _metrics_from_counters(counters):
+    metrics = DashboardMetrics(
+        total_orders=counters.get('orders.total', 0),
+        total_projects=counters.get('projects.total', 0),
+        total_suppliers=counters.get('suppliers.total', 0),
+        total_shipments=counters.get('shipments.total', 0),
+        active_projects=counters.get('projects.active', 0),
+        pending_orders=counters.get('orders.pending', 0),
+        attention_orders=counters.get('orders.attention', 0),
+        in_transit_shipments=counters.get('shipments.in_transit', 0),
+        customs_delay_shipments=counters.get('shipments.customs_delay', 0),
+        recent_deliveries=counters.get('shipments.recent_deliveries', 0),
+    )
+    if metrics.total_projects:
+        metrics.project_completion = round(counters.get('projects.completion_sum', 0) / metrics.total_projects, 1)
+    for key, value in counters.items():
+        if value and key.startswith('orders.status:'):
+            metrics.order_statuses[key.split(':', 1)[1]] = value
+        elif value and key.startswith('orders.priority:'):
+            metrics.priority_counts[key.split(':', 1)[1]] = value
+    return metrics
+
+if __name__ == '__main__':
+    from backend.database import SessionLocal
+    db = SessionLocal()
+    try:
+        counters = reconcile_snapshot(db)
+        print(f"Dashboard snapshot reconciled ({len(counters)} counters)")
+    finally:
+        db.close()
@@ -0,0 +1,259 @@
+import json
+import os
+import queue
+import threading
+import time
+from collections import namedtuple
+from datetime import datetime, date
+from itertools import count
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from backend.models.notifications import Notification
+from backend.models.shipments import ShipmentStatusHistory
+
+# 'local' delivers within this process; 'redis' fans events out to every worker
+EVENT_BROKER = os.getenv('EVENT_BROKER', 'local')
+REDIS_URL = os.getenv('REDIS_URL', 'redis://localhost:6379/0')
+EVENT_CHANNEL_PREFIX = os.getenv('EVENT_CHANNEL_PREFIX', 'fusionflow:events')
+# Seconds a publish may wait on Redis; publishing runs inside the request's commit
+EVENT_REDIS_TIMEOUT = float(os.getenv('EVENT_REDIS_TIMEOUT', 0.5))
+# Events buffered per subscriber before it is told to resync
+EVENT_QUEUE_SIZE = int(os.getenv('EVENT_QUEUE_SIZE', 100))
+
+Event = namedtuple('Event', ['id', 'channel', 'name', 'data'])
+
+def user_channel(user_id):
+    return f'user:{user_id}'
+
+def shipment_channel(shipment_id):
+    """Status changes of one shipment; streams subscribe only to the shipments their page shows"""
+    return f'shipment:{shipment_id}'
+
+def _json_default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return str(value)
+
+class Subscription:
+    """Events for a set of channels, buffered in a bounded queue"""
+
+    def __init__(self, broker, channels, maxsize=EVENT_QUEUE_SIZE):
+        self.broker = broker
+        self.channels = frozenset(channels)
+        self.queue = queue.Queue(maxsize=maxsize)
+        # Channels that had events dropped; the client should refetch their state
+        self.overflowed = set()
+
+    def put(self, event):
+        try:
+            self.queue.put_nowait(event)
+        except queue.Full:
+            self.overflowed.add(event.channel)
+
+    def take_overflowed(self):
+        """Channels that dropped events since the last call"""
+        dropped, self.overflowed = self.overflowed, set()
+        return dropped
+
+    def get(self, timeout=None):
+        """Next event, or None if none arrives within timeout"""
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+class LocalBroker:
+    """In-process pub/sub; also the delivery side of RedisBroker"""
+
+    def __init__(self):
+        self._subscribers = {}
+        self._lock = threading.Lock()
+        self._ids = count(1)
+
+    def subscribe(self, channels):
+        subscription = Subscription(self, channels)
+        with self._lock:
+            for channel in subscription.channels:
+                self._subscribers.setdefault(channel, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            for channel in subscription.channels:
+                subscribers = self._subscribers.get(channel)
+                if subscribers is not None:
+                    subscribers.discard(subscription)
+                    if not subscribers:
+                        del self._subscribers[channel]
+
+    def deliver(self, channel, name, data):
+        with self._lock:
+            subscribers = list(self._subscribers.get(channel, ()))
+            event = Event(next(self._ids), channel, name, data)
+        for subscription in subscribers:
+            subscription.put(event)
+        return len(subscribers)
+
+    def publish(self, channel, name, data):
+        return self.deliver(channel, name, data)
+
+    def subscriber_count(self):
+        with self._lock:
+            return len({s for subscribers in self._subscribers.values() for s in subscribers})
+
+class RedisBroker(LocalBroker):
+    """
+    Publishes through Redis so subscribers in every worker process see events.
+
+    Each process keeps one pattern subscription on a background thread and
+    hands incoming messages to its local subscribers, so open streams do not
+    each hold a Redis connection. Publishing uses its own client with short
+    timeouts, so an unreachable Redis delays a commit by EVENT_REDIS_TIMEOUT
+    at most; the subscription blocks between messages and only bounds connect.
+    """
+
+    def __init__(self, url=REDIS_URL, prefix=EVENT_CHANNEL_PREFIX, timeout=EVENT_REDIS_TIMEOUT):
+        super().__init__()
+        import redis
+        self.redis = redis.Redis.from_url(url, socket_timeout=timeout, socket_connect_timeout=timeout)
+        self._listen_redis = redis.Redis.from_url(url, socket_connect_timeout=timeout, socket_keepalive=True)
+        self.prefix = prefix
+        self._listener = None
+        self._pid = None
+
+    def _ensure_listening(self):
+        if self._listener is not None and self._listener.is_alive() and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._listener is None or not self._listener.is_alive() or self._pid != os.getpid():
+                self._pid = os.getpid()
+                self._listener = threading.Thread(target=self._listen, name='event-listener', daemon=True)
+                self._listener.start()
+
+    def subscribe(self, channels):
+        self._ensure_listening()
+        return super().subscribe(channels)
+
+    def publish(self, channel, name, data):
+        message = json.dumps({'name': name, 'data': data}, default=_json_default)
+        return self.redis.publish(f'{self.prefix}:{channel}', message)
+
+    def _listen(self):
+        delay = 1
+        while True:
+            try:
+                pubsub = self._listen_redis.pubsub(ignore_subscribe_messages=True)
+                pubsub.psubscribe(f'{self.prefix}:*')
+                delay = 1
+                for message in pubsub.listen():
+                    if message['type'] != 'pmessage':
+                        continue
+                    channel = message['channel'].decode()[len(self.prefix) + 1:]
+                    payload = json.loads(message['data'])
+                    self.deliver(channel, payload['name'], payload['data'])
+            except Exception:
+                # Redis restarted or unreachable: resubscribe with backoff
+                time.sleep(delay)
+                delay = min(delay * 2, 30)
+
+_broker = None
+_broker_lock = threading.Lock()
+
+def get_broker():
+    global _broker
+    if _broker is None:
+        with _broker_lock:
+            if _broker is None:
+                _broker = RedisBroker() if EVENT_BROKER == 'redis' else LocalBroker()
+    return _broker
+
+def publish(channel, name, data):
+    """Send an event to everyone subscribed to channel"""
+    return get_broker().publish(channel, name, data)
+
+def subscribe(channels):
+    return get_broker().subscribe(channels)
+
+def format_sse(event):
+    """Encode an event in the text/event-stream wire format"""
+    data = json.dumps(event.data, default=_json_default, separators=(',', ':'))
+    return f'id: {event.id}\nevent: {event.name}\ndata: {data}\n\n'
+
+# -- Events raised by committed rows -----------------------------------------
+
+def _notification_event(notification):
+    return user_channel(notification.user_id), 'notification', {
+        'id': notification.id,
+        'title': notification.title,
+        'message': notification.message,
+        'action_url': notification.action_url,
+        'created_at': notification.created_at,
+    }
+
+def _shipment_status_event(entry):
+    return shipment_channel(entry.shipment_id), 'shipment_status', {
+        'shipment_id': entry.shipment_id,
+        'status': entry.status,
+        'location': entry.location,
+        'description': entry.description,
+        'timestamp': entry.timestamp,
+    }
+
+EVENT_SOURCES = {
+    Notification: _notification_event,
+    ShipmentStatusHistory: _shipment_status_event,
+}
+
+def publish_after_commit(session, channel, name, data):
+    """Queue an event to publish once session commits; a rollback drops it"""
+    session.info.setdefault('pending_events', []).append((channel, name, data))
+
+def notification_events(session, rows):
+    """Queue 'notification' events for rows written outside the unit of work, e.g. bulk inserts"""
+    for row in rows:
+        publish_after_commit(session, *_notification_event(row))
+
+def shipment_status_events(session, rows):
+    """Queue 'shipment_status' events for history rows written outside the unit of work"""
+    for row in rows:
+        publish_after_commit(session, *_shipment_status_event(row))
+
+@event.listens_for(Session, 'after_flush')
+def _collect_events(session, flush_context):
+    pending = [
+        EVENT_SOURCES[type(obj)](obj) for obj in session.new
+        # Scheduled notifications are announced when the scheduler releases them
+        if type(obj) in EVENT_SOURCES and getattr(obj, 'sent_via_app', True) is not False
+    ]
+    if pending:
+        session.info.setdefault('pending_events', []).extend(pending)
+
+def _latest_status_only(pending):
+    """Drop all but the newest shipment_status event per shipment, so a bulk sync sends one each"""
+    latest = {}
+    for index, (channel, name, data) in enumerate(pending):
+        if name == 'shipment_status':
+            kept = latest.get(channel)
+            if kept is None or (data['timestamp'] or datetime.min) >= (pending[kept][2]['timestamp'] or datetime.min):
+                latest[channel] = index
+    return [
+        item for index, item in enumerate(pending)
+        if item[1] != 'shipment_status' or latest[item[0]] == index
+    ]
+
+@event.listens_for(Session, 'after_commit')
+def _publish_on_commit(session):
+    for channel, name, data in _latest_status_only(session.info.pop('pending_events', [])):
+        try:
+            publish(channel, name, data)
+        except Exception:
+            # Clients fall back to polling; a broker outage must not fail the request,
+            # nor hold it for a timeout per remaining event
+            break
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_on_rollback(session):
+    session.info.pop('pending_events', None)
@@ -0,0 +1,155 @@
+import csv
+import io
+import os
+import tempfile
+from datetime import datetime, date
+from operator import attrgetter
+
+# Rows fetched per round trip and rows written per streamed CSV chunk
+EXPORT_BATCH_SIZE = int(os.getenv('EXPORT_BATCH_SIZE', 1000))
+
+EXPORT_FORMATS = {
+    'csv': 'text/csv; charset=utf-8',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+}
+
+def _related(relationship, field):
+    def get(row):
+        related = getattr(row, relationship)
+        return getattr(related, field) if related is not None else None
+    return get
+
+# (header, attribute name or accessor) per export
+ORDER_EXPORT_COLUMNS = [
+    ('Order #', 'order_number'),
+    ('PO #', 'po_number'),
+    ('Project Code', _related('project', 'project_code')),
+    ('Project', _related('project', 'name')),
+    ('Supplier Code', _related('supplier', 'supplier_code')),
+    ('Supplier', _related('supplier', 'name')),
+    ('Description', 'description'),
+    ('Part #', 'part_number'),
+    ('Quantity', 'quantity'),
+    ('Unit', 'unit_of_measure'),
+    ('Unit Price', 'unit_price'),
+    ('Total Amount', 'total_amount'),
+    ('Currency', 'currency'),
+    ('Status', 'status'),
+    ('Priority', 'priority'),
+    ('Order Date', 'order_date'),
+    ('Requested Delivery', 'requested_delivery_date'),
+    ('Actual Delivery', 'actual_delivery_date'),
+    ('Created At', 'created_at'),
+]
+
+SHIPMENT_EXPORT_COLUMNS = [
+    ('Tracking #', 'tracking_number'),
+    ('Carrier', 'carrier'),
+    ('Order #', _related('order', 'order_number')),
+    ('Status', 'current_status'),
+    ('Current Location', 'current_location'),
+    ('Origin Country', 'origin_country'),
+    ('Destination Country', 'destination_country'),
+    ('Ship Date', 'ship_date'),
+    ('Estimated Delivery', 'estimated_delivery_date'),
+    ('Actual Delivery', 'actual_delivery_date'),
+    ('Last Update', 'last_status_update'),
+    ('Created At', 'created_at'),
+]
+
+SUPPLIER_EXPORT_COLUMNS = [
+    ('Supplier Code', 'supplier_code'),
+    ('Name', 'name'),
+    ('Country', 'country'),
+    ('City', 'city'),
+    ('Local', 'is_local_company'),
+    ('Approval Status', 'approval_status'),
+    ('Payment Terms', 'payment_terms'),
+    ('Currency', 'currency_preference'),
+    ('On-Time Rate (%)', 'on_time_delivery_rate'),
+    ('Performance Score', 'overall_performance_score'),
+    ('Total Orders', 'total_orders_count'),
+    ('Total Order Value', 'total_order_value'),
+]
+
+AUDIT_LOG_EXPORT_COLUMNS = [
+    ('Timestamp', 'timestamp'),
+    ('Username', 'username'),
+    ('Role', 'user_role'),
+    ('Action', 'action'),
+    ('Entity Type', 'entity_type'),
+    ('Entity ID', 'entity_id'),
+    ('Description', 'description'),
+    ('Level', 'level'),
+    ('IP Address', 'ip_address'),
+    ('Source', 'system_source'),
+]
+
+def _accessors(columns):
+    return [attrgetter(spec) if isinstance(spec, str) else spec for _, spec in columns]
+
+def _csv_value(value):
+    if value is None:
+        return ''
+    if isinstance(value, (datetime, date)):
+        return value.isoformat(sep=' ') if isinstance(value, datetime) else value.isoformat()
+    if isinstance(value, str) and value[:1] in ('=', '+', '-', '@'):
+        # Keep spreadsheet apps from evaluating user text as a formula
+        return "'" + value
+    return value
+
+def _xlsx_value(value):
+    if isinstance(value, str) and value[:1] in ('=', '+', '-', '@'):
+        return "'" + value
+    return value
+
+def stream_rows(query, batch_size=EXPORT_BATCH_SIZE):
+    """Iterate a query in batches over a server-side cursor where supported"""
+    return query.yield_per(batch_size)
+
+def iter_csv(rows, columns, batch_size=EXPORT_BATCH_SIZE):
+    """Yield UTF-8 CSV chunks of batch_size rows; memory does not grow with the row count"""
+    getters = _accessors(columns)
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    # BOM so Excel detects UTF-8
+    buffer.write('\ufeff')
+    writer.writerow([header for header, _ in columns])
+    for count, row in enumerate(rows, start=1):
+        writer.writerow([_csv_value(get(row)) for get in getters])
+        if count % batch_size == 0:
+            yield buffer.getvalue().encode('utf-8')
+            buffer.seek(0)
+            buffer.truncate(0)
+    yield buffer.getvalue().encode('utf-8')
+
+def iter_xlsx(rows, columns, title='Export', chunk_size=64 * 1024):
+    """
+    Yield an XLSX file in chunks.
+
+    The workbook is written in openpyxl write-only mode, which spools rows to
+    disk instead of keeping cells in memory. The zip container can only be
+    assembled once every row is written, so the file is streamed from a
+    temporary file at the end.
+    """
+    from openpyxl import Workbook
+    getters = _accessors(columns)
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet(title=title[:31])
+    sheet.append([header for header, _ in columns])
+    for row in rows:
+        sheet.append([_xlsx_value(get(row)) for get in getters])
+    with tempfile.TemporaryFile() as output:
+        workbook.save(output)
+        output.seek(0)
+        for chunk in iter(lambda: output.read(chunk_size), b''):
+            yield chunk
+
+def iter_export(query, columns, export_format, title='Export'):
+    """Stream query as CSV or XLSX bytes"""
+    rows = stream_rows(query)
+    if export_format == 'xlsx':
+        return iter_xlsx(rows, columns, title=title)
+    if export_format == 'csv':
+        return iter_csv(rows, columns)
+    raise ValueError(f"Unsupported export format: {export_format}")
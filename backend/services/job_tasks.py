@@ -0,0 +1,61 @@
+from backend.services import audit_archive, notifications, shipment_history, tracking_sync, tracking_webhooks
+from backend.services.jobs import register
+from backend.services.supplier_metrics import refresh_supplier_totals
+
+@register('suppliers.recalculate_metrics', api_roles=('admin', 'manager'))
+def recalculate_supplier_metrics(db, supplier_ids=None):
+    """Refresh stored order totals and on-time rates for suppliers"""
+    return {'suppliers_updated': refresh_supplier_totals(db, supplier_ids)}
+
+@register('notifications.notify')
+def send_notifications(db, user_ids, title, message, **fields):
+    """Fan a notification out to many users outside the request"""
+    batch_id = notifications.notify(db, user_ids, title, message, **fields)
+    db.commit()
+    return {'batch_id': batch_id, 'recipients': len(user_ids)}
+
+@register('audit.archive', max_attempts=1, api_roles=('admin',), in_process=False)
+def archive_audit_logs(db, retention_months=None, dry_run=False):
+    """Create upcoming audit log partitions and move months past retention into the archive"""
+    engine = db.get_bind()
+    created = []
+    if not dry_run:
+        with engine.begin() as conn:
+            created = audit_archive.ensure_partitions(conn)
+    results = audit_archive.archive_audit_logs(
+        engine,
+        retention_months=retention_months or audit_archive.AUDIT_RETENTION_MONTHS,
+        dry_run=dry_run
+    )
+    return {
+        'archived': {start.strftime('%Y-%m'): count for start, count in results},
+        'partitions_created': created,
+        'dry_run': dry_run,
+    }
+
+@register('shipments.sync_tracking', max_attempts=1, api_roles=('admin', 'manager'))
+def sync_shipment_tracking(db, carriers=None, limit=None):
+    """Poll carrier APIs for shipments that are due a tracking check"""
+    return tracking_sync.sync_tracking(db, carriers=carriers, limit=limit or tracking_sync.TRACKING_SYNC_LIMIT)
+
+@register('shipments.process_webhooks', api_roles=('admin',))
+def process_tracking_webhooks(db, max_batches=None):
+    """Apply pending carrier webhook events, e.g. when the processor thread is disabled"""
+    return {'processed': tracking_webhooks.process_pending(db, max_batches=max_batches)}
+
+@register('shipments.compact_history', max_attempts=1, api_roles=('admin',))
+def compact_shipment_history(db, older_than_days=None, keep_latest=None):
+    """Move old status history rows into per-shipment archive blobs"""
+    shipments, rows = shipment_history.compact_history(
+        db,
+        older_than_days=shipment_history.HISTORY_COMPACT_AFTER_DAYS if older_than_days is None else older_than_days,
+        keep_latest=shipment_history.HISTORY_KEEP_LATEST if keep_latest is None else keep_latest
+    )
+    return {'shipments': shipments, 'rows': rows}
+
+@register('database.migrate', max_attempts=1, api_roles=('admin',), in_process=False)
+def migrate_database(db, rebuild_search=False):
+    """Run the create_database.py migrations without holding a web worker"""
+    # Imported here: the script module pulls in every model and the seed data helpers
+    from backend.create_database import run_migrations
+    return run_migrations(db.get_bind(), rebuild_search=rebuild_search)
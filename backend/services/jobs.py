@@ -0,0 +1,262 @@
+import importlib
+import logging
+import os
+import threading
+import traceback
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from uuid import uuid4
+from sqlalchemy import case, update
+from sqlalchemy.exc import IntegrityError
+from backend.models.background_jobs import BackgroundJob
+
+logger = logging.getLogger(__name__)
+
+# 'thread' runs jobs on a pool in this process (no broker needed), 'celery'
+# hands them to Celery workers, 'inline' runs them before enqueue() returns
+JOB_BACKEND = os.getenv('JOB_BACKEND', 'thread')
+JOB_WORKERS = int(os.getenv('JOB_WORKERS', 4))
+JOB_MAX_ATTEMPTS = int(os.getenv('JOB_MAX_ATTEMPTS', 3))
+JOB_RETRY_DELAY = int(os.getenv('JOB_RETRY_DELAY', 10))  # Seconds, doubled after each failure
+# A job still 'running' this long after it started is assumed lost with its worker
+JOB_STALE_AFTER = int(os.getenv('JOB_STALE_AFTER', 3600))
+CELERY_BROKER_URL = os.getenv('CELERY_BROKER_URL', os.getenv('REDIS_URL', 'redis://localhost:6379/0'))
+
+# Modules whose @register decorators define the available jobs
+JOB_MODULES = ['backend.services.job_tasks']
+
+JobSpec = namedtuple('JobSpec', ['func', 'max_attempts', 'retry_delay', 'api_roles', 'in_process'])
+
+FINISHED = ('succeeded', 'failed')
+
+JOBS = {}
+
+class JobBackendError(Exception):
+    """The configured backend may not run this job"""
+
+def register(name, max_attempts=None, retry_delay=None, api_roles=(), in_process=True):
+    """
+    Register func(db, **args) as a job.
+
+    The return value must be JSON-serialisable and is stored as the result.
+    api_roles lists the roles that may start the job through the API: None
+    allows any signed-in user, and an empty tuple keeps it internal.
+    in_process=False marks long jobs (DDL, archiving) that would tie up a
+    web worker on the thread backend; enqueue() refuses them there.
+    """
+    def decorator(func):
+        JOBS[name] = JobSpec(func, max_attempts or JOB_MAX_ATTEMPTS, retry_delay or JOB_RETRY_DELAY, api_roles,
+                             in_process)
+        return func
+    return decorator
+
+_loaded = False
+
+def load_jobs():
+    global _loaded
+    if not _loaded:
+        for module in JOB_MODULES:
+            importlib.import_module(module)
+        _loaded = True
+    return JOBS
+
+def _session():
+    from backend.database import SessionLocal
+    return SessionLocal()
+
+def run_job(job_id):
+    """
+    Run one attempt of a job in its own session.
+
+    The job is claimed with a conditional UPDATE, so a job submitted twice
+    (e.g. resumed by two workers) runs once. Failures are retried with
+    exponential backoff until max_attempts, then marked failed.
+    """
+    load_jobs()
+    db = _session()
+    try:
+        claimed = db.execute(
+            update(BackgroundJob).where(
+                BackgroundJob.id == job_id,
+                BackgroundJob.status.in_(('queued', 'retrying'))
+            ).values(status='running', started_at=datetime.utcnow(), attempts=BackgroundJob.attempts + 1),
+            execution_options={'synchronize_session': False}
+        ).rowcount
+        db.commit()
+        if not claimed:
+            return
+        job = db.get(BackgroundJob, job_id)
+        spec = JOBS.get(job.name)
+        try:
+            if spec is None:
+                raise LookupError(f"Unknown job: {job.name}")
+            result = spec.func(db, **(job.args or {}))
+        except Exception:
+            db.rollback()
+            job = db.get(BackgroundJob, job_id)
+            job.error = traceback.format_exc(limit=5)
+            retry = spec is not None and job.attempts < job.max_attempts
+            job.status = 'retrying' if retry else 'failed'
+            if not retry:
+                job.finished_at = datetime.utcnow()
+            db.commit()
+            if retry:
+                get_backend().submit(job_id, delay=spec.retry_delay * 2 ** (job.attempts - 1))
+            return
+        job.status = 'succeeded'
+        job.result = result
+        job.error = None
+        job.finished_at = datetime.utcnow()
+        db.commit()
+    finally:
+        db.close()
+
+class ThreadBackend:
+    """Runs jobs on a thread pool in the current process"""
+
+    def __init__(self, workers=JOB_WORKERS):
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='job')
+
+    def _run(self, job_id):
+        try:
+            run_job(job_id)
+        except Exception:
+            logger.exception("Job %s crashed", job_id)
+
+    def submit(self, job_id, delay=0):
+        if delay:
+            timer = threading.Timer(delay, self.executor.submit, args=(self._run, job_id))
+            timer.daemon = True
+            timer.start()
+        else:
+            self.executor.submit(self._run, job_id)
+
+class InlineBackend:
+    """Runs jobs synchronously; retries run immediately"""
+
+    def submit(self, job_id, delay=0):
+        run_job(job_id)
+
+class CeleryBackend:
+    """
+    Sends jobs to Celery workers.
+
+    Start a worker with: celery -A backend.services.jobs:celery_app worker
+    """
+
+    def __init__(self, broker_url=CELERY_BROKER_URL):
+        from celery import Celery
+        self.app = Celery('fusionflow', broker=broker_url)
+        self.task = self.app.task(name='fusionflow.run_job', ignore_result=True)(run_job)
+
+    def submit(self, job_id, delay=0):
+        self.task.apply_async((job_id,), countdown=delay or None)
+
+BACKENDS = {'thread': ThreadBackend, 'inline': InlineBackend, 'celery': CeleryBackend}
+
+_backend = None
+_backend_lock = threading.Lock()
+
+def get_backend():
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                _backend = BACKENDS[JOB_BACKEND]()
+    return _backend
+
+def enqueue(db, name, args=None, idempotency_key=None, created_by_id=None):
+    """
+    Queue a registered job and commit; returns its BackgroundJob row.
+
+    If a job with the same idempotency_key exists, it is returned instead
+    and nothing new is queued. Raises JobBackendError for in_process=False
+    jobs on the thread backend.
+    """
+    spec = load_jobs().get(name)
+    if spec is None:
+        raise KeyError(f"Unknown job: {name}")
+    if not spec.in_process and JOB_BACKEND == 'thread':
+        raise JobBackendError(f"{name} does not run in the web process; use JOB_BACKEND=celery or its command-line script")
+    if idempotency_key:
+        existing = db.query(BackgroundJob).filter(BackgroundJob.idempotency_key == idempotency_key).first()
+        if existing:
+            return existing
+    job = BackgroundJob(
+        id=uuid4().hex,
+        name=name,
+        args=args or {},
+        idempotency_key=idempotency_key,
+        status='queued',
+        max_attempts=spec.max_attempts,
+        created_by_id=created_by_id,
+        created_at=datetime.utcnow(),
+    )
+    db.add(job)
+    try:
+        db.commit()
+    except IntegrityError:
+        # Lost a race with an identical submission
+        db.rollback()
+        return db.query(BackgroundJob).filter(BackgroundJob.idempotency_key == idempotency_key).one()
+    get_backend().submit(job.id)
+    # The backend may already have moved it on (always, when inline)
+    db.expire(job)
+    return job
+
+def resume_pending(db, now=None):
+    """
+    Resubmit jobs left queued or retrying by a restart; returns how many.
+
+    Jobs stuck in 'running' for JOB_STALE_AFTER seconds are requeued too,
+    unless they have used up their attempts.
+    """
+    now = now or datetime.utcnow()
+    retry = BackgroundJob.attempts < BackgroundJob.max_attempts
+    db.execute(
+        update(BackgroundJob).where(
+            BackgroundJob.status == 'running',
+            BackgroundJob.started_at < now - timedelta(seconds=JOB_STALE_AFTER)
+        ).values(
+            status=case((retry, 'retrying'), else_='failed'),
+            finished_at=case((retry, None), else_=now),
+            error='Worker stopped while the job was running'
+        ),
+        execution_options={'synchronize_session': False}
+    )
+    db.commit()
+    job_ids = [job_id for (job_id,) in db.query(BackgroundJob.id).filter(
+        BackgroundJob.status.in_(('queued', 'retrying'))
+    ).order_by(BackgroundJob.created_at)]
+    for job_id in job_ids:
+        get_backend().submit(job_id)
+    return len(job_ids)
+
+def start():
+    """Resume unfinished jobs when running them in-process; Celery workers keep their own queue"""
+    if JOB_BACKEND != 'thread':
+        return 0
+    db = _session()
+    try:
+        return resume_pending(db)
+    finally:
+        db.close()
+
+def job_status(job):
+    """API representation of a job"""
+    return {
+        'id': job.id,
+        'name': job.name,
+        'status': job.status,
+        'attempts': job.attempts,
+        'max_attempts': job.max_attempts,
+        'result': job.result,
+        'error': job.error.strip().splitlines()[-1] if job.error else None,
+        'created_at': job.created_at.isoformat() if job.created_at else None,
+        'started_at': job.started_at.isoformat() if job.started_at else None,
+        'finished_at': job.finished_at.isoformat() if job.finished_at else None,
+    }
+
+# Worker entry point for the Celery backend
+celery_app = get_backend().app if JOB_BACKEND == 'celery' else None
@@ -0,0 +1,73 @@
+from sqlalchemy.orm import joinedload, load_only
+from backend.models import Order, Shipment, Project, Supplier, User
+from backend.models.audit_log import AuditLog
+
+# Named eager-loading profiles per model. Each profile loads exactly the
+# relationships its views touch, so rendering or serializing a page does not
+# fall back to one lazy SELECT per row.
+LOADER_PROFILES = {
+    Order: {
+        'list': (
+            joinedload(Order.project).load_only(Project.id, Project.name),
+            joinedload(Order.supplier).load_only(Supplier.id, Supplier.name),
+        ),
+        'detail': (
+            joinedload(Order.project),
+            joinedload(Order.supplier),
+            joinedload(Order.assigned_user).load_only(User.id, User.full_name),
+        ),
+        'export': (
+            joinedload(Order.project).load_only(Project.id, Project.name, Project.project_code),
+            joinedload(Order.supplier).load_only(Supplier.id, Supplier.name, Supplier.supplier_code),
+        ),
+    },
+    Shipment: {
+        'list': (
+            joinedload(Shipment.order).load_only(Order.id, Order.order_number),
+        ),
+        'detail': (
+            joinedload(Shipment.order).load_only(Order.id, Order.order_number),
+            joinedload(Shipment.assigned_user).load_only(User.id, User.full_name),
+        ),
+        'export': (
+            joinedload(Shipment.order).load_only(Order.id, Order.order_number),
+        ),
+    },
+    Project: {
+        'list': (),
+        'detail': (
+            joinedload(Project.assigned_user).load_only(User.id, User.full_name),
+        ),
+        'export': (),
+    },
+    Supplier: {
+        'list': (),
+        'detail': (),
+        'export': (),
+    },
+    AuditLog: {
+        # Both skip the old/new value JSON payloads
+        'list': (
+            load_only(
+                AuditLog.id, AuditLog.timestamp, AuditLog.user_id, AuditLog.username, AuditLog.user_role,
+                AuditLog.action, AuditLog.entity_type, AuditLog.entity_id, AuditLog.description,
+                AuditLog.level, AuditLog.ip_address
+            ),
+        ),
+        'export': (
+            load_only(
+                AuditLog.id, AuditLog.timestamp, AuditLog.username, AuditLog.user_role,
+                AuditLog.action, AuditLog.entity_type, AuditLog.entity_id, AuditLog.description,
+                AuditLog.level, AuditLog.ip_address, AuditLog.system_source
+            ),
+        ),
+    },
+}
+
+def with_profile(query, model, profile):
+    """Apply the named loader profile for model to query"""
+    try:
+        options = LOADER_PROFILES[model][profile]
+    except KeyError:
+        raise ValueError(f"No loader profile '{profile}' for {model.__name__}")
+    return query.options(*options) if options else query
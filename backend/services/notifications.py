@@ -0,0 +1,320 @@
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+from collections import OrderedDict, namedtuple
+from itertools import chain
+from uuid import uuid4
+from sqlalchemy import delete, event, func, insert, inspect, update
+from sqlalchemy.orm import Session, load_only
+from backend.models.notifications import Notification
+from backend.services import events
+
+logger = logging.getLogger(__name__)
+
+# Upper bound on staleness for notifications created by other worker processes
+NOTIFICATION_COUNT_TTL = int(os.getenv('NOTIFICATION_COUNT_TTL', 30))  # Seconds
+NOTIFICATION_COUNT_CACHE_SIZE = int(os.getenv('NOTIFICATION_COUNT_CACHE_SIZE', 4096))
+# Notifications in the same group arriving within this window are merged into one digest (0 disables)
+NOTIFICATION_DIGEST_WINDOW = int(os.getenv('NOTIFICATION_DIGEST_WINDOW', 600))  # Seconds
+NOTIFICATION_DIGEST_ITEMS = int(os.getenv('NOTIFICATION_DIGEST_ITEMS', 10))
+# How often the scheduler releases due notifications and archives expired ones (0 disables)
+NOTIFICATION_SCHEDULER_INTERVAL = int(os.getenv('NOTIFICATION_SCHEDULER_INTERVAL', 30))  # Seconds
+
+# Unread count and the newest unread id, which clients use as a since_id watermark
+UnreadState = namedtuple('UnreadState', ['count', 'latest_id'])
+
+_TRACKED = ('user_id', 'is_read', 'is_archived', 'sent_via_app')
+
+# Shown in the app: delivered (scheduled ones are held back) and not archived
+VISIBLE = (Notification.sent_via_app == True, Notification.is_archived == False)
+
+_cache = OrderedDict()
+_lock = threading.Lock()
+
+def unread_state(db, user_id):
+    """
+    Cached unread count and newest unread id for a user.
+
+    One indexed aggregate on a miss; commits in this process that add, read
+    or delete a user's notifications drop the entry immediately.
+    """
+    now = time.monotonic()
+    with _lock:
+        entry = _cache.get(user_id)
+        if entry is not None and entry[0] > now:
+            _cache.move_to_end(user_id)
+            return entry[1]
+        generation = entry[2] if entry is not None else 0
+
+    count, latest_id = db.query(func.count(Notification.id), func.max(Notification.id)).filter(
+        Notification.user_id == user_id,
+        Notification.is_read == False,
+        *VISIBLE
+    ).one()
+    state = UnreadState(count, latest_id or 0)
+
+    with _lock:
+        # Skip the store if the user's notifications changed while counting
+        current = _cache.get(user_id)
+        if (current[2] if current is not None else 0) == generation:
+            _cache[user_id] = (now + NOTIFICATION_COUNT_TTL, state, generation)
+            _cache.move_to_end(user_id)
+            while len(_cache) > NOTIFICATION_COUNT_CACHE_SIZE:
+                _cache.popitem(last=False)
+    return state
+
+def unread_notifications(db, user_id, since_id=None, limit=50):
+    """Unread notifications newer than since_id, newest first"""
+    query = db.query(Notification).options(load_only(
+        Notification.id, Notification.title, Notification.message,
+        Notification.action_url, Notification.created_at
+    )).filter(Notification.user_id == user_id, Notification.is_read == False, *VISIBLE)
+    if since_id:
+        query = query.filter(Notification.id > since_id)
+    return query.order_by(Notification.created_at.desc(), Notification.id.desc()).limit(limit).all()
+
+def mark_read(db, user_id, ids=None, read_at=None):
+    """
+    Mark a user's unread notifications read with one UPDATE and commit.
+
+    ids limits the update to the notifications the client has shown, so
+    ones that arrived while the dropdown was open, or older ones beyond the
+    items it listed, stay unread. Returns the row count.
+    """
+    statement = update(Notification).where(
+        Notification.user_id == user_id,
+        Notification.is_read == False,
+        *VISIBLE
+    )
+    if ids:
+        statement = statement.where(Notification.id.in_(ids))
+    statement = statement.values(is_read=True, read_at=read_at or datetime.utcnow())
+    result = db.execute(statement, execution_options={
+        'synchronize_session': False,
+        'notification_users': (user_id,),
+    })
+    db.commit()
+    return result.rowcount
+
+def _digest(previous, row, digest_title):
+    """Fields for a digest replacing previous with row folded in"""
+    meta = dict(previous.meta_data or {})
+    count = meta.get('digest_count', 1) + 1
+    items = ([row['message']] + meta.get('digest_items', [previous.message]))[:NOTIFICATION_DIGEST_ITEMS]
+    message = '\n'.join(items)
+    if count > len(items):
+        message += f'\n...and {count - len(items)} more'
+    meta.update(digest_count=count, digest_items=items)
+    return {
+        'title': f"{digest_title or row['title']} ({count})",
+        'message': message,
+        'meta_data': meta,
+    }
+
+def _open_digests(db, user_ids, group, now):
+    """Each user's newest unread notification in group within the digest window"""
+    rows = db.query(Notification).options(load_only(
+        Notification.id, Notification.user_id, Notification.message, Notification.meta_data
+    )).filter(
+        Notification.notification_group == group,
+        Notification.user_id.in_(user_ids),
+        Notification.is_read == False,
+        Notification.created_at >= now - timedelta(seconds=NOTIFICATION_DIGEST_WINDOW),
+        *VISIBLE
+    ).order_by(Notification.id).all()
+    return {row.user_id: row for row in rows}
+
+def notify(db, user_ids, title, message, notification_type='System Alert', group=None,
+           digest_title=None, scheduled_send_time=None, expires_at=None, **fields):
+    """
+    Send one notification to many users with a single multi-row INSERT.
+
+    With a group, an unread notification in the same group from the last
+    NOTIFICATION_DIGEST_WINDOW seconds is replaced by a digest that folds in
+    the new message, so a burst shows up as one entry per user. Notifications
+    with a future scheduled_send_time stay hidden until the scheduler
+    releases them. Other Notification columns can be passed as keyword
+    arguments. The caller commits; returns the batch id shared by the rows.
+    """
+    user_ids = list(dict.fromkeys(user_id for user_id in user_ids if user_id is not None))
+    if not user_ids:
+        return None
+    now = datetime.utcnow()
+    scheduled = scheduled_send_time is not None and scheduled_send_time > now
+    batch_id = uuid4().hex
+    base = dict(
+        fields,
+        notification_type=notification_type,
+        title=title,
+        message=message,
+        notification_group=group,
+        batch_id=batch_id,
+        scheduled_send_time=scheduled_send_time,
+        expires_at=expires_at,
+        sent_via_app=not scheduled,
+        is_read=False,
+        is_archived=False,
+        created_at=now,
+        updated_at=now,
+    )
+
+    digests = {}
+    if group and not scheduled and NOTIFICATION_DIGEST_WINDOW > 0:
+        digests = _open_digests(db, user_ids, group, now)
+    rows = []
+    for user_id in user_ids:
+        row = dict(base, user_id=user_id)
+        if user_id in digests:
+            row.update(_digest(digests[user_id], row, digest_title))
+        rows.append(row)
+
+    inserted = db.execute(insert(Notification).returning(
+        Notification.id, Notification.user_id, Notification.title, Notification.message,
+        Notification.action_url, Notification.created_at
+    ), rows).all()
+    if digests:
+        # Delete after inserting so digests get new, higher ids and move the since_id watermark
+        db.execute(
+            delete(Notification).where(Notification.id.in_([n.id for n in digests.values()])),
+            execution_options={'synchronize_session': False, 'notification_users': tuple(digests)}
+        )
+
+    if not scheduled:
+        # Bulk inserts bypass the flush hooks that normally do this
+        db.info.setdefault('notification_users', set()).update(user_ids)
+        events.notification_events(db, inserted)
+    return batch_id
+
+def release_scheduled(db, now=None):
+    """
+    Deliver notifications whose scheduled_send_time has passed and commit.
+
+    The UPDATE claims rows atomically, so schedulers in several processes
+    never announce the same notification twice. Returns the count released.
+    """
+    released = db.execute(
+        update(Notification).where(
+            Notification.sent_via_app == False,
+            Notification.scheduled_send_time <= (now or datetime.utcnow())
+        ).values(sent_via_app=True).returning(
+            Notification.id, Notification.user_id, Notification.title, Notification.message,
+            Notification.action_url, Notification.created_at
+        ),
+        execution_options={'synchronize_session': False, 'notification_users': ()}
+    ).all()
+    if released:
+        db.info.setdefault('notification_users', set()).update(row.user_id for row in released)
+        events.notification_events(db, released)
+    db.commit()
+    return len(released)
+
+def archive_expired(db, now=None):
+    """Archive every notification past its expires_at with one UPDATE and commit"""
+    now = now or datetime.utcnow()
+    archived = db.execute(
+        update(Notification).where(
+            Notification.is_archived == False,
+            Notification.expires_at <= now
+        ).values(is_archived=True, archived_at=now).returning(Notification.user_id),
+        execution_options={'synchronize_session': False, 'notification_users': ()}
+    ).scalars().all()
+    if archived:
+        db.info.setdefault('notification_users', set()).update(archived)
+    db.commit()
+    return len(archived)
+
+def run_scheduled(db, now=None):
+    """One scheduler pass; returns (released, archived)"""
+    return release_scheduled(db, now), archive_expired(db, now)
+
+_scheduler = None
+_scheduler_pid = None
+_scheduler_lock = threading.Lock()
+
+def _scheduler_loop(interval):
+    from backend.database import SessionLocal
+    while True:
+        db = SessionLocal()
+        try:
+            run_scheduled(db)
+        except Exception:
+            db.rollback()
+            logger.exception("Notification scheduler pass failed")
+        finally:
+            db.close()
+        time.sleep(interval)
+
+def start_scheduler(interval=NOTIFICATION_SCHEDULER_INTERVAL):
+    """Run the scheduler on a daemon thread in this process (once per process)"""
+    global _scheduler, _scheduler_pid
+    if interval <= 0:
+        return False
+    with _scheduler_lock:
+        if _scheduler is not None and _scheduler.is_alive() and _scheduler_pid == os.getpid():
+            return False
+        _scheduler_pid = os.getpid()
+        _scheduler = threading.Thread(target=_scheduler_loop, args=(interval,),
+                                      name='notification-scheduler', daemon=True)
+        _scheduler.start()
+    return True
+
+def invalidate(*user_ids):
+    """Drop cached counts for the given users (everyone if none given)"""
+    with _lock:
+        for user_id in user_ids or list(_cache):
+            entry = _cache.get(user_id)
+            # Keep a bumped generation so an in-flight load is not stored
+            _cache[user_id] = (0, None, (entry[2] if entry is not None else 0) + 1)
+
+def _changed_users(session):
+    users = set()
+    for obj in chain(session.new, session.deleted):
+        if isinstance(obj, Notification):
+            users.add(obj.user_id)
+    for obj in session.dirty:
+        if isinstance(obj, Notification):
+            state = inspect(obj)
+            if any(state.attrs[column].history.has_changes() for column in _TRACKED):
+                users.add(obj.user_id)
+                # A reassigned notification also changes the previous owner's count
+                users.update(state.attrs.user_id.history.deleted)
+    users.discard(None)
+    return users
+
+@event.listens_for(Session, 'after_flush')
+def _collect_changes(session, flush_context):
+    users = _changed_users(session)
+    if users:
+        session.info.setdefault('notification_users', set()).update(users)
+
+@event.listens_for(Session, 'do_orm_execute')
+def _collect_bulk_changes(orm_execute_state):
+    if not (orm_execute_state.is_update or orm_execute_state.is_delete):
+        return
+    mapper = orm_execute_state.bind_mapper
+    if mapper is None or mapper.class_ is not Notification:
+        return
+    # Bulk statements name their users explicitly; otherwise drop every count
+    users = orm_execute_state.execution_options.get('notification_users')
+    changed = orm_execute_state.session.info.setdefault('notification_users', set())
+    changed.update(users if users is not None else [None])
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_on_commit(session):
+    users = session.info.pop('notification_users', None)
+    if users:
+        if None in users:
+            invalidate()
+        else:
+            invalidate(*users)
+
+if __name__ == '__main__':
+    from backend.database import SessionLocal
+    db = SessionLocal()
+    try:
+        released, archived = run_scheduled(db)
+        print(f"Released {released} scheduled notifications, archived {archived} expired")
+    finally:
+        db.close()
@@ -0,0 +1,209 @@
+import os
+import threading
+from sqlalchemy import func, text
+from backend.models import Order, Project, Supplier, NumberSequence
+
+# Numbers reserved per worker in one round trip. Each worker hands out its
+# own block, so codes are unique but not in creation order across workers
+# (ORD-000011 from one may be created after ORD-000021 from another), and
+# unused numbers in a block are skipped when the process exits or restarts,
+# leaving gaps. Set to 1 for ordered, gap-free codes at a round trip each.
+NUMBER_BLOCK_SIZE = int(os.getenv('NUMBER_BLOCK_SIZE', 10))
+
+# name: (format, prefix, column holding the generated code)
+SEQUENCES = {
+    'orders': ('ORD-{:06d}', 'ORD-', Order.order_number),
+    'projects': ('PRJ-{:04d}', 'PRJ-', Project.project_code),
+    'suppliers': ('SUP-{:04d}', 'SUP-', Supplier.supplier_code),
+}
+
+class PostgresSequenceStore:
+    """Native sequences; nextval() never blocks concurrent callers"""
+
+    def reserve(self, conn, name, count):
+        sequence = _sequence_name(name)
+        rows = conn.execute(
+            text(f"SELECT nextval('{sequence}') FROM generate_series(1, :count)"), {'count': count}
+        ).all()
+        return [value for (value,) in rows]
+
+    def create(self, conn, name, start):
+        conn.execute(text(f"CREATE SEQUENCE IF NOT EXISTS {_sequence_name(name)} START WITH {int(start)}"))
+
+    def exists(self, conn, name):
+        return conn.execute(
+            text("SELECT 1 FROM pg_class WHERE relkind = 'S' AND relname = :name"),
+            {'name': _sequence_name(name)}
+        ).first() is not None
+
+    def advance(self, conn, name, minimum):
+        conn.execute(text(
+            f"SELECT setval('{_sequence_name(name)}', GREATEST(:minimum - 1, "
+            f"(SELECT last_value FROM {_sequence_name(name)})))"
+        ), {'minimum': int(minimum)})
+
+class TableSequenceStore:
+    """Counter rows in number_sequences, for SQLite and other backends"""
+
+    def reserve(self, conn, name, count):
+        # The UPDATE takes the write lock, so the read below sees our own increment
+        table = NumberSequence.__table__
+        conn.execute(table.update().where(table.c.name == name).values(
+            next_value=table.c.next_value + count
+        ))
+        end = conn.execute(table.select().with_only_columns(table.c.next_value).where(table.c.name == name)).scalar()
+        return list(range(end - count, end))
+
+    def create(self, conn, name, start):
+        table = NumberSequence.__table__
+        # Another worker may create it first; keep theirs
+        conn.execute(table.insert().prefix_with('OR IGNORE', dialect='sqlite')
+                     .prefix_with('IGNORE', dialect='mysql')
+                     .values(name=name, next_value=int(start)))
+
+    def exists(self, conn, name):
+        table = NumberSequence.__table__
+        return conn.execute(table.select().where(table.c.name == name)).first() is not None
+
+    def advance(self, conn, name, minimum):
+        table = NumberSequence.__table__
+        conn.execute(table.update().where(
+            table.c.name == name, table.c.next_value < minimum
+        ).values(next_value=int(minimum)))
+
+def _sequence_name(name):
+    return f'{name}_number_seq'
+
+def _store(engine):
+    return PostgresSequenceStore() if engine.dialect.name == 'postgresql' else TableSequenceStore()
+
+def parse_code(name, code):
+    """Number in a code of sequence name, or None if code is not in its format"""
+    prefix = SEQUENCES[name][1]
+    if not code or not code.startswith(prefix) or not code[len(prefix):].isdigit():
+        return None
+    return int(code[len(prefix):])
+
+def _next_free_value(conn, name):
+    """One past the highest number already used for name"""
+    _, prefix, column = SEQUENCES[name]
+    # Codes are zero-padded, so the longest then greatest code is the highest
+    code = conn.execute(
+        column.table.select().with_only_columns(column).where(column.like(f'{prefix}%'))
+        .order_by(func.length(column).desc(), column.desc()).limit(1)
+    ).scalar()
+    highest = conn.execute(column.table.select().with_only_columns(func.max(column.table.c.id))).scalar() or 0
+    if code:
+        suffix = code[len(prefix):]
+        if suffix.isdigit():
+            highest = max(highest, int(suffix))
+    return highest + 1
+
+class NumberAllocator:
+    """
+    Hands out sequence numbers from blocks reserved per process.
+
+    Each reservation is a short transaction of its own, independent of the
+    caller's session, so a rollback never returns a number for reuse. Numbers
+    are unique but, with blocks, neither ordered across processes nor
+    gap-free (see NUMBER_BLOCK_SIZE).
+    """
+
+    def __init__(self, engine, block_size=NUMBER_BLOCK_SIZE):
+        self.engine = engine
+        self.block_size = max(block_size, 1)
+        self.store = _store(engine)
+        self._blocks = {}
+        self._ready = set()
+        self._lock = threading.Lock()
+
+    def _reserve(self, name, count):
+        with self.engine.begin() as conn:
+            if name not in self._ready:
+                if not self.store.exists(conn, name):
+                    self.store.create(conn, name, _next_free_value(conn, name))
+                self._ready.add(name)
+            return self.store.reserve(conn, name, count)
+
+    def allocate(self, name, count=1):
+        """Return count numbers for sequence name; large requests reserve exactly count"""
+        if name not in SEQUENCES:
+            raise ValueError(f"Unknown sequence: {name}")
+        with self._lock:
+            block = self._blocks.setdefault(name, [])
+            if len(block) < count:
+                needed = count - len(block)
+                block.extend(self._reserve(name, needed if needed > self.block_size else self.block_size))
+            numbers, self._blocks[name] = block[:count], block[count:]
+        return numbers
+
+    def next_code(self, name):
+        """Next formatted code, e.g. ORD-000042"""
+        return self.format(name, self.allocate(name)[0])
+
+    def allocate_codes(self, name, count):
+        """count formatted codes in one reservation, for bulk imports"""
+        return [self.format(name, number) for number in self.allocate(name, count)]
+
+    @staticmethod
+    def format(name, number):
+        return SEQUENCES[name][0].format(number)
+
+    def advance(self, name, number):
+        """
+        Move sequence name past number, e.g. after codes were inserted as given.
+
+        Numbers up to it are dropped from this process's block; blocks other
+        processes already reserved are not, so they can still hand out a code
+        inserted this way once.
+        """
+        with self._lock:
+            with self.engine.begin() as conn:
+                if self.store.exists(conn, name):
+                    self.store.advance(conn, name, number + 1)
+                else:
+                    self.store.create(conn, name, max(number + 1, _next_free_value(conn, name)))
+                self._ready.add(name)
+            self._blocks[name] = [n for n in self._blocks.get(name, []) if n > number]
+
+    def sync(self):
+        """
+        Move every sequence past the highest code in use, e.g. after a manual
+        import; returns the lowest number each can hand out next.
+        """
+        synced = {}
+        with self._lock:
+            self._blocks.clear()
+            with self.engine.begin() as conn:
+                for name in SEQUENCES:
+                    minimum = _next_free_value(conn, name)
+                    if self.store.exists(conn, name):
+                        self.store.advance(conn, name, minimum)
+                    else:
+                        self.store.create(conn, name, minimum)
+                    self._ready.add(name)
+                    synced[name] = minimum
+        return synced
+
+_allocator = None
+_allocator_lock = threading.Lock()
+
+def get_allocator():
+    """Process-wide allocator bound to the application engine"""
+    global _allocator
+    if _allocator is None:
+        with _allocator_lock:
+            if _allocator is None:
+                from backend.database import engine
+                _allocator = NumberAllocator(engine)
+    return _allocator
+
+def next_code(name):
+    return get_allocator().next_code(name)
+
+def allocate_codes(name, count):
+    return get_allocator().allocate_codes(name, count)
+
+if __name__ == '__main__':
+    get_allocator().sync()
+    print("Number sequences synced with existing codes")
@@ -0,0 +1,232 @@
+import csv
+import io
+import os
+from dataclasses import dataclass, field
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+from types import SimpleNamespace
+from backend.models import Order, Project, Supplier
+from backend.services.dashboard_snapshot import order_contribution, apply_snapshot_delta
+from backend.services.numbering import allocate_codes, get_allocator, parse_code
+from backend.services import reference_data
+
+# Rows validated and inserted per transaction
+IMPORT_CHUNK_SIZE = int(os.getenv('IMPORT_CHUNK_SIZE', 500))
+
+# Errors kept for the report; later ones are only counted
+MAX_REPORTED_ERRORS = 1000
+
+# Bounds of the orders columns: quantity Integer, unit_price Numeric(12, 4), total_amount Numeric(15, 2)
+MAX_QUANTITY = 2 ** 31 - 1
+MAX_UNIT_PRICE = Decimal(10) ** 8
+MAX_TOTAL_AMOUNT = Decimal(10) ** 13
+
+REQUIRED_COLUMNS = ('project_code', 'supplier_code', 'description', 'quantity', 'unit_price', 'requested_delivery_date')
+OPTIONAL_COLUMNS = ('order_number', 'po_number', 'priority', 'currency', 'order_date', 'part_number', 'unit_of_measure')
+PRIORITIES = ('Low', 'Normal', 'High', 'Critical')
+DATE_FORMATS = ('%Y-%m-%d', '%d/%m/%Y', '%Y-%m-%d %H:%M:%S')
+
+@dataclass
+class ImportResult:
+    """Outcome of an order import"""
+    total_rows: int = 0
+    imported: int = 0
+    error_count: int = 0
+    errors: list = field(default_factory=list)  # [(row_number, message)]
+    dry_run: bool = False
+
+    def add_error(self, row_number, message):
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append((row_number, message))
+
+class ImportFormatError(ValueError):
+    """The file itself cannot be imported (unknown type or missing columns)"""
+
+def iter_rows(stream, filename):
+    """
+    Yield (row_number, {column: value}) from a CSV or XLSX file object.
+
+    Rows are read one at a time; XLSX files are opened in read-only mode so
+    the workbook is never fully loaded.
+    """
+    extension = os.path.splitext(filename or '')[1].lower()
+    if extension == '.csv':
+        reader = csv.reader(io.TextIOWrapper(stream, encoding='utf-8-sig', newline=''))
+        rows = enumerate(reader, start=1)
+    elif extension in ('.xlsx', '.xlsm'):
+        from openpyxl import load_workbook
+        workbook = load_workbook(stream, read_only=True, data_only=True)
+        rows = enumerate(workbook.active.iter_rows(values_only=True), start=1)
+    else:
+        raise ImportFormatError(f"Unsupported file type: {extension or filename}")
+
+    header = None
+    for row_number, values in rows:
+        if header is None:
+            header = [str(value or '').strip().lower().replace(' ', '_') for value in values]
+            missing = [column for column in REQUIRED_COLUMNS if column not in header]
+            if missing:
+                raise ImportFormatError(f"Missing columns: {', '.join(missing)}")
+            continue
+        if not any(value not in (None, '') for value in values):
+            continue
+        yield row_number, dict(zip(header, values))
+
+def _text(value):
+    if value is None:
+        return None
+    value = str(value).strip()
+    return value or None
+
+def _date(value):
+    if isinstance(value, datetime):
+        return value
+    value = _text(value)
+    if value is None:
+        return None
+    for date_format in DATE_FORMATS:
+        try:
+            return datetime.strptime(value, date_format)
+        except ValueError:
+            continue
+    raise ValueError(f"invalid date '{value}'")
+
+class OrderImporter:
+    """Validates rows and inserts them in chunks with bulk_insert_mappings"""
+
+    def __init__(self, db, created_by_id, chunk_size=IMPORT_CHUNK_SIZE, dry_run=False):
+        self.db = db
+        self.created_by_id = created_by_id
+        self.chunk_size = max(chunk_size, 1)
+        self.result = ImportResult(dry_run=dry_run)
+        # Explicit order numbers claimed by earlier chunks of this run
+        self.claimed = set()
+        self.highest_explicit = None
+        # Code lookups are loaded once; they grow with projects/suppliers, not the file
+        self.projects = dict(db.query(Project.project_code, Project.id).all())
+        self.suppliers = dict(db.query(Supplier.supplier_code, Supplier.id).all())
+
+    def validate(self, row):
+        """Order mapping for a row, or raise ValueError with the reason"""
+        project_code = _text(row.get('project_code'))
+        supplier_code = _text(row.get('supplier_code'))
+        if project_code not in self.projects:
+            raise ValueError(f"unknown project_code '{project_code}'")
+        if supplier_code not in self.suppliers:
+            raise ValueError(f"unknown supplier_code '{supplier_code}'")
+        description = _text(row.get('description'))
+        if not description:
+            raise ValueError("description is required")
+        try:
+            quantity = Decimal(str(row.get('quantity')).strip())
+            unit_price = Decimal(str(row.get('unit_price')).strip())
+        except (InvalidOperation, ValueError):
+            raise ValueError("quantity and unit_price must be numbers")
+        # NaN and Infinity parse as Decimals but cannot be compared, converted or stored
+        if not quantity.is_finite() or not unit_price.is_finite():
+            raise ValueError("quantity and unit_price must be finite numbers")
+        if quantity != quantity.to_integral_value():
+            raise ValueError("quantity must be a whole number")
+        if quantity < 1 or unit_price < 0:
+            raise ValueError("quantity must be at least 1 and unit_price not negative")
+        if quantity > MAX_QUANTITY or unit_price >= MAX_UNIT_PRICE or unit_price * quantity >= MAX_TOTAL_AMOUNT:
+            raise ValueError("quantity or unit_price too large")
+        quantity = int(quantity)
+        requested_delivery_date = _date(row.get('requested_delivery_date'))
+        if requested_delivery_date is None:
+            raise ValueError("requested_delivery_date is required")
+        priority = _text(row.get('priority')) or 'Normal'
+        if priority not in PRIORITIES:
+            raise ValueError(f"invalid priority '{priority}'")
+
+        return {
+            'order_number': _text(row.get('order_number')),
+            'po_number': _text(row.get('po_number')),
+            'project_id': self.projects[project_code],
+            'supplier_id': self.suppliers[supplier_code],
+            'created_by_id': self.created_by_id,
+            'description': description,
+            'part_number': _text(row.get('part_number')),
+            'unit_of_measure': _text(row.get('unit_of_measure')) or 'pcs',
+            'quantity': quantity,
+            'unit_price': unit_price,
+            'total_amount': (unit_price * quantity).quantize(Decimal('0.01')),
+            'currency': (_text(row.get('currency')) or 'QAR').upper()[:3],
+            'order_date': _date(row.get('order_date')) or datetime.utcnow(),
+            'requested_delivery_date': requested_delivery_date,
+            'priority': priority,
+            'status': 'Draft',
+        }
+
+    def run(self, rows):
+        chunk = []
+        for row_number, row in rows:
+            self.result.total_rows += 1
+            try:
+                chunk.append((row_number, self.validate(row)))
+            except ValueError as e:
+                self.result.add_error(row_number, str(e))
+            if len(chunk) >= self.chunk_size:
+                self._flush(chunk)
+                chunk = []
+        if chunk:
+            self._flush(chunk)
+        if self.result.imported and not self.result.dry_run:
+            reference_data.invalidate(Order.__tablename__)
+            if self.highest_explicit is not None:
+                # Keep generated numbers from colliding with the ones taken from the file
+                get_allocator().advance('orders', self.highest_explicit)
+        self.result.errors.sort()
+        return self.result
+
+    def _flush(self, chunk):
+        # Explicit order numbers must not already exist, in the file or the table
+        given = [mapping['order_number'] for _, mapping in chunk if mapping['order_number']]
+        taken = set()
+        if given:
+            taken = {number for (number,) in self.db.query(Order.order_number).filter(
+                Order.order_number.in_(given)
+            ).all()}
+        accepted = []
+        explicit = []
+        for row_number, mapping in chunk:
+            number = mapping['order_number']
+            if number and (number in taken or number in self.claimed):
+                self.result.add_error(row_number, f"order_number '{number}' already exists")
+                continue
+            if number:
+                self.claimed.add(number)
+                explicit.append(number)
+            accepted.append((row_number, mapping))
+        if not accepted or self.result.dry_run:
+            self.result.imported += len(accepted)
+            return
+
+        # One reservation for every generated number in the chunk
+        mappings = [mapping for _, mapping in accepted]
+        codes = iter(allocate_codes('orders', sum(1 for m in mappings if not m['order_number'])))
+        totals = {}
+        for mapping in mappings:
+            mapping['order_number'] = mapping['order_number'] or next(codes)
+            for key, value in order_contribution(SimpleNamespace(**mapping)).items():
+                totals[key] = totals.get(key, 0) + value
+        try:
+            self.db.bulk_insert_mappings(Order, mappings)
+            apply_snapshot_delta(self.db, after=totals)
+            self.db.commit()
+        except Exception as e:
+            self.db.rollback()
+            self.claimed.difference_update(explicit)
+            for row_number, _ in accepted:
+                self.result.add_error(row_number, f"insert failed: {e.__class__.__name__}")
+            return
+        self.result.imported += len(accepted)
+        numbers = [n for n in (parse_code('orders', code) for code in explicit) if n is not None]
+        if numbers:
+            self.highest_explicit = max([self.highest_explicit or 0] + numbers)
+
+def import_orders(db, stream, filename, created_by_id, chunk_size=IMPORT_CHUNK_SIZE, dry_run=False):
+    """Import orders from a CSV/XLSX file object; see OrderImporter"""
+    importer = OrderImporter(db, created_by_id, chunk_size=chunk_size, dry_run=dry_run)
+    return importer.run(iter_rows(stream, filename))
@@ -0,0 +1,119 @@
+import base64
+import json
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from decimal import Decimal
+from typing import Optional
+from sqlalchemy import asc, desc, tuple_
+
+# Seconds a filtered total count is reused before it is recomputed
+COUNT_CACHE_TTL = int(os.getenv('COUNT_CACHE_TTL', 60))
+COUNT_CACHE_SIZE = 512
+
+@dataclass
+class Page:
+    """One page of keyset-paginated results"""
+    items: list = field(default_factory=list)
+    per_page: int = 25
+    has_next: bool = False
+    has_prev: bool = False
+    next_cursor: Optional[str] = None
+    prev_cursor: Optional[str] = None
+    total: Optional[int] = None
+
+def encode_cursor(direction, sort_value, row_id):
+    """Opaque token for the position (sort_value, row_id)"""
+    if isinstance(sort_value, datetime):
+        sort_value = sort_value.isoformat()
+    elif isinstance(sort_value, Decimal):
+        sort_value = str(sort_value)
+    payload = json.dumps([direction, sort_value, row_id], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+def decode_cursor(token, sort_column):
+    """Decode a cursor, converting the sort value back to the column's Python type"""
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        direction, sort_value, row_id = json.loads(base64.urlsafe_b64decode(padded))
+        python_type = sort_column.type.python_type
+        if python_type is datetime:
+            sort_value = datetime.fromisoformat(sort_value)
+        elif sort_value is not None and python_type in (Decimal, int, float):
+            sort_value = python_type(sort_value)
+        if direction not in ('next', 'prev'):
+            raise ValueError(direction)
+        return direction, sort_value, int(row_id)
+    except (ValueError, TypeError, json.JSONDecodeError) as e:
+        raise ValueError(f"Invalid cursor: {token}") from e
+
+def paginate_keyset(query, sort_column, id_column, cursor=None, per_page=25, descending=True):
+    """
+    Paginate query on (sort_column, id_column) without OFFSET.
+
+    The cursor pins the last row seen, so every page is a bounded index range
+    scan regardless of depth. sort_column must be non-nullable (rows with
+    NULL sort values could not be compared against a cursor); the order,
+    project and shipment created_at columns are backfilled by
+    create_database. Invalid cursors restart from the first page.
+    """
+    direction, sort_value, row_id = 'next', None, None
+    if cursor:
+        try:
+            direction, sort_value, row_id = decode_cursor(cursor, sort_column)
+        except ValueError:
+            cursor = None
+
+    # Walking backwards flips both the comparison and the ordering
+    forward = direction == 'next'
+    walk_desc = descending if forward else not descending
+    if cursor:
+        position = tuple_(sort_column, id_column)
+        bound = tuple_(sort_value, row_id)
+        query = query.filter(position < bound if walk_desc else position > bound)
+    order = desc if walk_desc else asc
+    rows = query.order_by(None).order_by(order(sort_column), order(id_column)).limit(per_page + 1).all()
+
+    more = len(rows) > per_page
+    rows = rows[:per_page]
+    if not forward:
+        rows.reverse()
+
+    page = Page(items=rows, per_page=per_page)
+    page.has_next = more if forward else bool(cursor)
+    page.has_prev = bool(cursor) if forward else more
+    if rows:
+        sort_key = sort_column.key
+        id_key = id_column.key
+        if page.has_next:
+            page.next_cursor = encode_cursor('next', getattr(rows[-1], sort_key), getattr(rows[-1], id_key))
+        if page.has_prev:
+            page.prev_cursor = encode_cursor('prev', getattr(rows[0], sort_key), getattr(rows[0], id_key))
+    return page
+
+_count_cache = {}
+_count_lock = threading.Lock()
+
+def cached_count(query):
+    """
+    Total rows for query, reused for COUNT_CACHE_TTL seconds per distinct filter set.
+
+    Deep pagination no longer repeats the full filtered scan on every page;
+    counts may lag writes by up to the TTL.
+    """
+    compiled = query.statement.compile()
+    key = (str(compiled), repr(sorted(compiled.params.items())))
+    now = time.monotonic()
+    with _count_lock:
+        entry = _count_cache.get(key)
+        if entry and entry[0] > now:
+            return entry[1]
+
+    total = query.order_by(None).count()
+    with _count_lock:
+        if len(_count_cache) >= COUNT_CACHE_SIZE:
+            _count_cache.clear()
+        _count_cache[key] = (now + COUNT_CACHE_TTL, total)
+    return total
@@ -0,0 +1,117 @@
+import os
+import threading
+import time
+from collections import namedtuple
+from itertools import chain
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+from backend.models import Order, Project, Supplier, Shipment
+
+# Upper bound on staleness for changes made by other worker processes
+REFERENCE_CACHE_TTL = int(os.getenv('REFERENCE_CACHE_TTL', 300))  # Seconds
+
+Option = namedtuple('Option', ['id', 'name'])
+
+def _distinct(column):
+    def load(db):
+        rows = db.query(column).distinct().filter(column.isnot(None)).order_by(column).all()
+        return [value for (value,) in rows]
+    return load
+
+def _options(model, *criteria):
+    def load(db):
+        rows = db.query(model.id, model.name).filter(*criteria).order_by(model.name).all()
+        return [Option(row_id, name) for row_id, name in rows]
+    return load
+
+# name: (model, columns the lookup reads, loader)
+LOOKUPS = {
+    'order_statuses': (Order, ('status',), _distinct(Order.status)),
+    'order_priorities': (Order, ('priority',), _distinct(Order.priority)),
+    'shipment_statuses': (Shipment, ('current_status',), _distinct(Shipment.current_status)),
+    'carriers': (Shipment, ('carrier',), _distinct(Shipment.carrier)),
+    'project_statuses': (Project, ('status',), _distinct(Project.status)),
+    'project_priorities': (Project, ('priority',), _distinct(Project.priority)),
+    'projects': (Project, ('name',), _options(Project)),
+    'active_projects': (Project, ('name', 'status'), _options(Project, Project.status == 'Active')),
+    'supplier_statuses': (Supplier, ('approval_status',), _distinct(Supplier.approval_status)),
+    'supplier_countries': (Supplier, ('country',), _distinct(Supplier.country)),
+    'suppliers': (Supplier, ('name',), _options(Supplier)),
+    'approved_suppliers': (Supplier, ('name', 'approval_status'),
+                           _options(Supplier, Supplier.approval_status == 'Approved')),
+}
+
+# Columns whose changes invalidate a table's lookups
+TRACKED_COLUMNS = {}
+for _model, _columns, _ in LOOKUPS.values():
+    TRACKED_COLUMNS.setdefault(_model.__tablename__, set()).update(_columns)
+
+_versions = {table: 0 for table in TRACKED_COLUMNS}
+_cache = {}
+_lock = threading.Lock()
+
+def get_options(db, name):
+    """
+    Cached dropdown values for a lookup in LOOKUPS.
+
+    Entries are keyed by the version of the table they read, so a committed
+    change to a tracked column is visible on the next request in this
+    process. Other processes pick it up within REFERENCE_CACHE_TTL.
+    """
+    model, _, loader = LOOKUPS[name]
+    table = model.__tablename__
+    now = time.monotonic()
+    with _lock:
+        version = _versions[table]
+        entry = _cache.get(name)
+        if entry and entry[0] == version and entry[1] > now:
+            return entry[2]
+
+    value = loader(db)
+    with _lock:
+        # Skip the store if the table changed while loading
+        if _versions[table] == version:
+            _cache[name] = (version, now + REFERENCE_CACHE_TTL, value)
+    return value
+
+def invalidate(*tables):
+    """Bump the version of the given tables (all tracked tables if none given)"""
+    with _lock:
+        for table in tables or list(_versions):
+            if table in _versions:
+                _versions[table] += 1
+
+def _changed_tables(session):
+    tables = set()
+    for obj in chain(session.new, session.deleted):
+        table = getattr(obj, '__tablename__', None)
+        if table in TRACKED_COLUMNS:
+            tables.add(table)
+    for obj in session.dirty:
+        table = getattr(obj, '__tablename__', None)
+        if table in TRACKED_COLUMNS and table not in tables:
+            state = inspect(obj)
+            if any(state.attrs[column].history.has_changes() for column in TRACKED_COLUMNS[table]):
+                tables.add(table)
+    return tables
+
+@event.listens_for(Session, 'after_flush')
+def _collect_changes(session, flush_context):
+    tables = _changed_tables(session)
+    if tables:
+        session.info.setdefault('reference_tables', set()).update(tables)
+
+@event.listens_for(Session, 'do_orm_execute')
+def _collect_bulk_changes(orm_execute_state):
+    if orm_execute_state.is_update or orm_execute_state.is_delete:
+        mapper = orm_execute_state.bind_mapper
+        table = mapper.local_table.name if mapper is not None else None
+        if table in TRACKED_COLUMNS:
+            orm_execute_state.session.info.setdefault('reference_tables', set()).add(table)
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_on_commit(session):
+    # Markers left by a rolled-back transaction only cause an extra reload
+    tables = session.info.pop('reference_tables', None)
+    if tables:
+        invalidate(*tables)
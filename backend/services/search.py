@@ -0,0 +1,212 @@
+import os
+import re
+from sqlalchemy import JSON, Float, Integer, String, cast, desc, literal, or_, select, text
+from backend.models import Order, Shipment, Supplier, Project
+
+# Force the LIKE backend regardless of database (e.g. SEARCH_BACKEND=like)
+SEARCH_BACKEND = os.getenv('SEARCH_BACKEND', 'auto')
+
+# Columns indexed for the search box of each list
+SEARCH_FIELDS = {
+    Order: ('order_number', 'description', 'po_number'),
+    Shipment: ('tracking_number', 'carrier'),
+    Supplier: ('name', 'supplier_code', 'city', 'contacts'),
+    Project: ('name', 'project_code', 'client_name'),
+}
+
+# Code-like columns searched by substring through trigram indexes on PostgreSQL
+TRIGRAM_FIELDS = {
+    Order: ('order_number', 'po_number'),
+    Shipment: ('tracking_number',),
+    Supplier: ('supplier_code',),
+    Project: ('project_code',),
+}
+
+MAX_TERMS = 8
+
+def search_terms(search_text):
+    """Lower-cased word tokens of a search box value"""
+    return re.findall(r'\w+', (search_text or '').lower())[:MAX_TERMS]
+
+class LikeSearchBackend:
+    """Substring matching with LIKE; no index support, used as the fallback"""
+    name = 'like'
+
+    def matches(self, db, model, search_text):
+        clauses = []
+        for field in SEARCH_FIELDS[model]:
+            column = getattr(model, field)
+            if isinstance(column.type, JSON):
+                column = cast(column, String)
+            clauses.append(column.contains(search_text, autoescape=True))
+        return select(
+            model.id.label('id'), literal(0.0, Float).label('rank')
+        ).where(or_(*clauses)).subquery()
+
+class SQLiteSearchBackend:
+    """FTS5 external-content tables kept in sync with triggers"""
+    name = 'sqlite_fts5'
+
+    def matches(self, db, model, search_text):
+        fts = fts_table(model)
+        # Every term must match; the trailing * makes each one a prefix query
+        match = ' '.join(f'"{term}"*' for term in search_terms(search_text))
+        # bm25() is lower for better matches
+        sql = f"SELECT rowid AS id, -bm25({fts}) AS rank FROM {fts} WHERE {fts} MATCH :match"
+        params = {'match': match}
+        # FTS only matches token prefixes; code columns also match inside, e.g. 000123 in ORD-000123
+        substring = ' OR '.join(f"{field} LIKE :like ESCAPE '\\'" for field in TRIGRAM_FIELDS.get(model, ()))
+        if substring:
+            sql = (
+                f"SELECT id, MAX(rank) AS rank FROM ({sql} UNION ALL "
+                f"SELECT id, 0.0 AS rank FROM {model.__tablename__} WHERE {substring}) GROUP BY id"
+            )
+            params['like'] = _like_pattern(search_text)
+        return text(sql).bindparams(**params).columns(id=Integer, rank=Float).subquery()
+
+    def ensure(self, conn, model, rebuild=False):
+        table = model.__tablename__
+        fts = fts_table(model)
+        fields = SEARCH_FIELDS[model]
+        columns = ', '.join(fields)
+        new_values = ', '.join(f'new.{field}' for field in fields)
+        old_values = ', '.join(f'old.{field}' for field in fields)
+        exists = conn.execute(
+            text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"), {'name': fts}
+        ).first()
+        if not exists:
+            conn.execute(text(
+                f"CREATE VIRTUAL TABLE {fts} USING fts5({columns}, "
+                f"content='{table}', content_rowid='id', tokenize='unicode61')"
+            ))
+        conn.execute(text(
+            f"CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {table} BEGIN "
+            f"INSERT INTO {fts}(rowid, {columns}) VALUES (new.id, {new_values}); END"
+        ))
+        conn.execute(text(
+            f"CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {table} BEGIN "
+            f"INSERT INTO {fts}({fts}, rowid, {columns}) VALUES ('delete', old.id, {old_values}); END"
+        ))
+        conn.execute(text(
+            f"CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE ON {table} BEGIN "
+            f"INSERT INTO {fts}({fts}, rowid, {columns}) VALUES ('delete', old.id, {old_values}); "
+            f"INSERT INTO {fts}(rowid, {columns}) VALUES (new.id, {new_values}); END"
+        ))
+        if rebuild or not exists:
+            conn.execute(text(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')"))
+        return not exists
+
+    def available(self, conn, model):
+        return conn.execute(
+            text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+            {'name': fts_table(model)}
+        ).first() is not None
+
+class PostgresSearchBackend:
+    """tsvector expression indexes plus pg_trgm indexes on code columns"""
+    name = 'postgres_fts'
+
+    def matches(self, db, model, search_text):
+        table = model.__tablename__
+        document = _pg_document(model)
+        query = ' & '.join(f'{term}:*' for term in search_terms(search_text))
+        substring = ' OR '.join(f'{field} ILIKE :like' for field in TRIGRAM_FIELDS.get(model, ()))
+        where = f"({document}) @@ q" + (f" OR {substring}" if substring else '')
+        params = {'query': query}
+        if substring:
+            params['like'] = _like_pattern(search_text)
+        return text(
+            f"SELECT id, ts_rank({document}, q) AS rank "
+            f"FROM {table}, to_tsquery('simple', :query) q WHERE {where}"
+        ).bindparams(**params).columns(id=Integer, rank=Float).subquery()
+
+    def ensure(self, conn, model, rebuild=False):
+        table = model.__tablename__
+        conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+        conn.execute(text(
+            f"CREATE INDEX IF NOT EXISTS ix_{table}_search ON {table} USING gin (({_pg_document(model)}))"
+        ))
+        for field in TRIGRAM_FIELDS.get(model, ()):
+            conn.execute(text(
+                f"CREATE INDEX IF NOT EXISTS ix_{table}_{field}_trgm ON {table} USING gin ({field} gin_trgm_ops)"
+            ))
+        # Expression indexes are maintained by PostgreSQL on every write
+        return False
+
+    def available(self, conn, model):
+        return True
+
+def _like_pattern(search_text):
+    """LIKE pattern matching search_text anywhere, with wildcards escaped by backslash"""
+    return '%' + search_text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+
+def fts_table(model):
+    return f'{model.__tablename__}_fts'
+
+def _pg_document(model):
+    # Must match the indexed expression exactly for the GIN index to be used
+    parts = []
+    for field in SEARCH_FIELDS[model]:
+        column = getattr(model, field)
+        value = f'{field}::text' if isinstance(column.type, JSON) else field
+        parts.append(f"coalesce({value}, '')")
+    return "to_tsvector('simple', " + " || ' ' || ".join(parts) + ")"
+
+_BACKENDS = {
+    'sqlite': SQLiteSearchBackend(),
+    'postgresql': PostgresSearchBackend(),
+}
+_like_backend = LikeSearchBackend()
+
+# Tables confirmed to have a search index, keyed by (dialect, table)
+_ready = set()
+
+def get_search_backend(db, model, search_text=''):
+    """Search backend for the session's database, falling back to LIKE"""
+    dialect = db.get_bind().dialect.name
+    backend = _BACKENDS.get(dialect)
+    if backend is None or SEARCH_BACKEND == 'like' or not search_terms(search_text):
+        return _like_backend
+    key = (dialect, model.__tablename__)
+    if key not in _ready:
+        if not backend.available(db.connection(), model):
+            return _like_backend
+        _ready.add(key)
+    return backend
+
+def search_filter(db, model, search_text):
+    """Filter clause restricting a query on model to rows matching search_text"""
+    matches = get_search_backend(db, model, search_text).matches(db, model, search_text)
+    return model.id.in_(select(matches.c.id))
+
+def search(db, model, search_text, limit=20, query=None):
+    """
+    Ranked search over model.
+
+    Every term is matched as a prefix, so "ord 20" finds "ORD-2024-001".
+    Returns (row, rank) tuples, best match first.
+    """
+    matches = get_search_backend(db, model, search_text).matches(db, model, search_text)
+    query = query if query is not None else db.query(model)
+    return query.add_columns(matches.c.rank).join(
+        matches, model.id == matches.c.id
+    ).order_by(desc(matches.c.rank), desc(model.id)).limit(limit).all()
+
+def ensure_search_indexes(engine, rebuild=False):
+    """Create the search indexes and sync triggers; rebuild repopulates them"""
+    backend = _BACKENDS.get(engine.dialect.name)
+    if backend is None:
+        return []
+    created = []
+    with engine.begin() as conn:
+        for model in SEARCH_FIELDS:
+            if backend.ensure(conn, model, rebuild=rebuild):
+                created.append(model.__tablename__)
+    _ready.clear()
+    return created
+
+if __name__ == '__main__':
+    import sys
+    from backend.database import engine
+    created = ensure_search_indexes(engine, rebuild='--rebuild' in sys.argv)
+    print(f"Search indexes ready ({engine.dialect.name}); created for: {', '.join(created) or 'none'}")
@@ -0,0 +1,184 @@
+from operator import attrgetter
+from backend.models import Order, Shipment, Project, Supplier
+
+# Distinct ?fields= selections kept compiled per model; others are compiled per call
+COMPILED_SELECTIONS_MAX = 256
+
+def related(relationship, field):
+    """Attribute of a related object, or None without one"""
+    get_related = attrgetter(relationship)
+    get_field = attrgetter(field)
+    def get(row):
+        value = get_related(row)
+        return get_field(value) if value is not None else None
+    return get
+
+def number(field):
+    """Numeric column that reads as 0 when empty"""
+    get_field = attrgetter(field)
+    def get(row):
+        value = get_field(row)
+        return value if value is not None else 0
+    return get
+
+def nested(relationship, **fields):
+    """Related object as {name: attribute}, or None without one"""
+    get_related = attrgetter(relationship)
+    getters = [(name, attrgetter(field)) for name, field in fields.items()]
+    def get(row):
+        value = get_related(row)
+        if value is None:
+            return None
+        return {name: getter(value) for name, getter in getters}
+    return get
+
+def _accessor(source):
+    return source if callable(source) else attrgetter(source)
+
+def parse_fields(value):
+    """Field names from a comma-separated ?fields= value, or None for all"""
+    if not value:
+        return None
+    names = tuple(dict.fromkeys(name.strip() for name in value.split(',') if name.strip()))
+    return names or None
+
+class ModelSerializer:
+    """
+    Dicts for the API from one model's objects.
+
+    fields maps output names to an attribute name or accessor; each view
+    lists the fields an endpoint returns, matching the relationships its
+    loader profile loads. Values are left as Decimal/datetime for the JSON
+    provider. Accessors are compiled once per view and field selection.
+    """
+    def __init__(self, model, fields, views):
+        self.model = model
+        self.accessors = {name: _accessor(source) for name, source in fields.items()}
+        self.views = {view: tuple(names) for view, names in views.items()}
+        self._compiled = {}
+
+    def compile(self, view, fields=None):
+        key = (view, fields)
+        compiled = self._compiled.get(key)
+        if compiled is None:
+            names = self.views[view]
+            if fields:
+                unknown = [name for name in fields if name not in names]
+                if unknown:
+                    raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+                names = fields
+            compiled = tuple((name, self.accessors[name]) for name in names)
+            if len(self._compiled) < COMPILED_SELECTIONS_MAX:
+                self._compiled[key] = compiled
+        return compiled
+
+    def one(self, row, view, fields=None):
+        return {name: get(row) for name, get in self.compile(view, fields)}
+
+    def many(self, rows, view, fields=None):
+        accessors = self.compile(view, fields)
+        return [{name: get(row) for name, get in accessors} for row in rows]
+
+SERIALIZERS = {}
+
+def register(model, fields, views):
+    SERIALIZERS[model] = ModelSerializer(model, fields, views)
+    return SERIALIZERS[model]
+
+def serialize(row, view, fields=None):
+    """One object as a dict; raises ValueError for fields not in the view"""
+    return SERIALIZERS[type(row)].one(row, view, fields)
+
+def serialize_many(rows, model, view, fields=None):
+    """List of objects as dicts; raises ValueError for fields not in the view"""
+    return SERIALIZERS[model].many(rows, view, fields)
+
+register(Order, {
+    'id': 'id',
+    'order_number': 'order_number',
+    'po_number': 'po_number',
+    'description': 'description',
+    'status': 'status',
+    'priority': 'priority',
+    'quantity': 'quantity',
+    'unit_price': number('unit_price'),
+    'total_amount': number('total_amount'),
+    'currency': 'currency',
+    'order_date': 'order_date',
+    'requested_delivery_date': 'requested_delivery_date',
+    'promised_delivery_date': 'promised_delivery_date',
+    'actual_delivery_date': 'actual_delivery_date',
+    'project': nested('project', id='id', name='name', code='project_code'),
+    'supplier': nested('supplier', id='id', name='name', code='supplier_code'),
+    'project_name': related('project', 'name'),
+    'supplier_name': related('supplier', 'name'),
+    'created_at': 'created_at',
+    'updated_at': 'updated_at',
+}, {
+    'list': ('id', 'order_number', 'po_number', 'description', 'status', 'priority', 'quantity', 'unit_price',
+             'total_amount', 'currency', 'order_date', 'requested_delivery_date', 'project_name', 'supplier_name',
+             'created_at'),
+    'summary': ('id', 'order_number', 'description', 'status', 'priority', 'total_amount', 'currency',
+                'supplier_name', 'created_at'),
+    'detail': ('id', 'order_number', 'po_number', 'description', 'status', 'priority', 'quantity', 'unit_price',
+               'total_amount', 'currency', 'order_date', 'requested_delivery_date', 'promised_delivery_date',
+               'actual_delivery_date', 'project', 'supplier', 'created_at', 'updated_at'),
+})
+
+register(Shipment, {
+    'id': 'id',
+    'tracking_number': 'tracking_number',
+    'carrier': 'carrier',
+    'current_status': 'current_status',
+    'current_location': 'current_location',
+    'origin_address': 'origin_address',
+    'destination_address': 'destination_address',
+    'ship_date': 'ship_date',
+    'estimated_delivery_date': 'estimated_delivery_date',
+    'actual_delivery_date': 'actual_delivery_date',
+    'last_status_update': 'last_status_update',
+    'order': nested('order', id='id', order_number='order_number'),
+    'created_at': 'created_at',
+}, {
+    'list': ('id', 'tracking_number', 'carrier', 'current_status', 'current_location', 'ship_date',
+             'estimated_delivery_date', 'order', 'created_at'),
+    'tracking': ('id', 'tracking_number', 'carrier', 'current_status', 'current_location', 'origin_address',
+                 'destination_address', 'ship_date', 'estimated_delivery_date', 'actual_delivery_date',
+                 'last_status_update', 'order'),
+})
+
+register(Project, {
+    'id': 'id',
+    'name': 'name',
+    'project_code': 'project_code',
+    'client_name': 'client_name',
+    'status': 'status',
+    'priority': 'priority',
+    'completion_percentage': 'completion_percentage',
+    'start_date': 'start_date',
+    'planned_completion_date': 'planned_completion_date',
+    'total_budget': number('total_budget'),
+    'budget_consumed': number('budget_consumed'),
+    'currency': 'currency',
+    'created_at': 'created_at',
+}, {
+    'list': ('id', 'name', 'project_code', 'client_name', 'status', 'priority', 'completion_percentage',
+             'start_date', 'planned_completion_date', 'total_budget', 'budget_consumed', 'currency', 'created_at'),
+})
+
+register(Supplier, {
+    'id': 'id',
+    'name': 'name',
+    'supplier_code': 'supplier_code',
+    'country': 'country',
+    'approval_status': 'approval_status',
+    'supplier_id': 'id',
+    'supplier_name': 'name',
+    'overall_rating': number('overall_performance_score'),
+    'quality_rating': number('quality_rating'),
+    'communication_rating': number('communication_rating'),
+    'created_at': 'created_at',
+}, {
+    'list': ('id', 'name', 'supplier_code', 'country', 'approval_status', 'overall_rating', 'created_at'),
+    'performance': ('supplier_id', 'supplier_name', 'overall_rating', 'quality_rating', 'communication_rating'),
+})
@@ -0,0 +1,121 @@
+import json
+import os
+import zlib
+from datetime import datetime, timedelta
+from sqlalchemy import func
+from sqlalchemy.orm import load_only, undefer
+from backend.models import ShipmentStatusHistory, ShipmentHistoryArchive
+from backend.services.pagination import paginate_keyset
+
+HISTORY_PAGE_SIZE = int(os.getenv('HISTORY_PAGE_SIZE', 50))
+# Compaction moves rows older than this into the shipment's archive blob...
+HISTORY_COMPACT_AFTER_DAYS = int(os.getenv('HISTORY_COMPACT_AFTER_DAYS', 90))
+# ...but always leaves the newest rows of each shipment in the table
+HISTORY_KEEP_LATEST = int(os.getenv('HISTORY_KEEP_LATEST', 20))
+HISTORY_COMPACT_BATCH = int(os.getenv('HISTORY_COMPACT_BATCH', 100))  # Shipments per transaction
+
+# Columns the timelines show; raw_api_data stays in the database
+TIMELINE_COLUMNS = (
+    ShipmentStatusHistory.id, ShipmentStatusHistory.status, ShipmentStatusHistory.location,
+    ShipmentStatusHistory.timestamp, ShipmentStatusHistory.description, ShipmentStatusHistory.update_source,
+)
+
+ARCHIVE_FIELDS = (
+    'id', 'status', 'location', 'location_coordinates', 'timestamp', 'description', 'exception_code',
+    'next_action', 'update_source', 'updated_by', 'raw_api_data', 'created_at',
+)
+
+def history_page(db, shipment_id, cursor=None, per_page=HISTORY_PAGE_SIZE):
+    """Newest-first keyset page of a shipment's live history rows"""
+    query = db.query(ShipmentStatusHistory).options(load_only(*TIMELINE_COLUMNS)).filter(
+        ShipmentStatusHistory.shipment_id == shipment_id
+    )
+    return paginate_keyset(query, ShipmentStatusHistory.timestamp, ShipmentStatusHistory.id,
+                           cursor=cursor, per_page=per_page)
+
+def _encode(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+def pack_events(events):
+    return zlib.compress(json.dumps(events, separators=(',', ':'), default=str).encode(), 9)
+
+def unpack_events(data):
+    """Archived rows as dicts, oldest first; timestamps are ISO strings"""
+    return json.loads(zlib.decompress(data)) if data else []
+
+def archived_history(db, shipment_id):
+    """A shipment's compacted history rows, oldest first (empty if none)"""
+    archive = db.query(ShipmentHistoryArchive).options(undefer(ShipmentHistoryArchive.data)).filter(
+        ShipmentHistoryArchive.shipment_id == shipment_id
+    ).first()
+    return unpack_events(archive.data) if archive else []
+
+def compaction_candidates(db, cutoff, keep_latest=HISTORY_KEEP_LATEST, limit=None):
+    """Ids of shipments with rows older than cutoff and more than keep_latest rows"""
+    query = db.query(ShipmentStatusHistory.shipment_id).group_by(ShipmentStatusHistory.shipment_id).having(
+        func.count(ShipmentStatusHistory.id) > keep_latest
+    ).having(func.min(ShipmentStatusHistory.timestamp) < cutoff).order_by(ShipmentStatusHistory.shipment_id)
+    if limit:
+        query = query.limit(limit)
+    return [shipment_id for (shipment_id,) in query]
+
+def compact_shipment(db, shipment_id, cutoff, keep_latest=HISTORY_KEEP_LATEST):
+    """
+    Move one shipment's old history rows into its archive blob.
+
+    Rows beyond the newest keep_latest and older than cutoff are appended to
+    the compressed archive (merged with any earlier one) and deleted. The
+    caller commits. Returns the number of rows moved.
+    """
+    keep = db.query(ShipmentStatusHistory.id).filter(
+        ShipmentStatusHistory.shipment_id == shipment_id
+    ).order_by(ShipmentStatusHistory.timestamp.desc(), ShipmentStatusHistory.id.desc()).limit(keep_latest)
+    rows = db.query(ShipmentStatusHistory).options(undefer(ShipmentStatusHistory.raw_api_data)).filter(
+        ShipmentStatusHistory.shipment_id == shipment_id,
+        ShipmentStatusHistory.timestamp < cutoff,
+        ShipmentStatusHistory.id.notin_(keep.scalar_subquery())
+    ).order_by(ShipmentStatusHistory.timestamp, ShipmentStatusHistory.id).all()
+    if not rows:
+        return 0
+
+    archive = db.query(ShipmentHistoryArchive).options(undefer(ShipmentHistoryArchive.data)).filter(
+        ShipmentHistoryArchive.shipment_id == shipment_id
+    ).first()
+    if archive is None:
+        archive = ShipmentHistoryArchive(shipment_id=shipment_id)
+        db.add(archive)
+    events = {event['id']: event for event in unpack_events(archive.data)}
+    for row in rows:
+        events[row.id] = {name: _encode(getattr(row, name)) for name in ARCHIVE_FIELDS}
+    ordered = sorted(events.values(), key=lambda e: (e['timestamp'], e['id']))
+    archive.data = pack_events(ordered)
+    archive.event_count = len(ordered)
+    archive.first_timestamp = datetime.fromisoformat(ordered[0]['timestamp'])
+    archive.last_timestamp = datetime.fromisoformat(ordered[-1]['timestamp'])
+
+    db.query(ShipmentStatusHistory).filter(
+        ShipmentStatusHistory.id.in_([row.id for row in rows])
+    ).delete(synchronize_session=False)
+    return len(rows)
+
+def compact_history(db, older_than_days=HISTORY_COMPACT_AFTER_DAYS, keep_latest=HISTORY_KEEP_LATEST,
+                    now=None, dry_run=False):
+    """
+    Compact old history rows of every shipment, committing every
+    HISTORY_COMPACT_BATCH shipments. Returns (shipments, rows) compacted;
+    with dry_run only the candidate shipments are counted.
+    """
+    cutoff = (now or datetime.utcnow()) - timedelta(days=older_than_days)
+    shipment_ids = compaction_candidates(db, cutoff, keep_latest)
+    if dry_run:
+        return len(shipment_ids), 0
+    shipments = moved = 0
+    for i, shipment_id in enumerate(shipment_ids, 1):
+        count = compact_shipment(db, shipment_id, cutoff, keep_latest)
+        if count:
+            shipments += 1
+            moved += count
+        if i % HISTORY_COMPACT_BATCH == 0:
+            db.commit()
+    db.commit()
+    return shipments, moved
@@ -0,0 +1,62 @@
+from collections import namedtuple
+from decimal import Decimal
+from sqlalchemy import and_, case, func
+from backend.models import Order, Supplier
+
+SupplierMetrics = namedtuple('SupplierMetrics', ['total_orders', 'completed_orders', 'total_value', 'on_time_rate'])
+
+EMPTY_METRICS = SupplierMetrics(0, 0, Decimal('0'), 0.0)
+
+def supplier_metrics(db, supplier_ids=None):
+    """
+    Order metrics per supplier id, aggregated in one grouped query.
+
+    on_time_rate is the percentage of orders with both dates set that were
+    delivered on or before the requested date. Suppliers without orders are
+    absent; use EMPTY_METRICS for them.
+    """
+    dated = and_(Order.actual_delivery_date.isnot(None), Order.requested_delivery_date.isnot(None))
+    query = db.query(
+        Order.supplier_id,
+        func.count(Order.id),
+        func.sum(case((Order.status == 'Delivered', 1), else_=0)),
+        func.coalesce(func.sum(Order.total_amount), 0),
+        func.sum(case((dated, 1), else_=0)),
+        func.sum(case((and_(dated, Order.actual_delivery_date <= Order.requested_delivery_date), 1), else_=0)),
+    ).filter(Order.supplier_id.isnot(None)).group_by(Order.supplier_id)
+    if supplier_ids is not None:
+        query = query.filter(Order.supplier_id.in_(supplier_ids))
+
+    metrics = {}
+    for supplier_id, total, completed, value, dated_count, on_time in query:
+        rate = (on_time / dated_count * 100) if dated_count else 0.0
+        metrics[supplier_id] = SupplierMetrics(total, completed or 0, Decimal(value or 0), rate)
+    return metrics
+
+def get_supplier_metrics(db, supplier_id):
+    return supplier_metrics(db, [supplier_id]).get(supplier_id, EMPTY_METRICS)
+
+def refresh_supplier_totals(db, supplier_ids=None):
+    """
+    Store order count, order value and on-time rate on the supplier rows.
+
+    Writes every supplier in one executemany and commits; returns the
+    number of suppliers updated.
+    """
+    metrics = supplier_metrics(db, supplier_ids)
+    query = db.query(Supplier.id)
+    if supplier_ids is not None:
+        query = query.filter(Supplier.id.in_(supplier_ids))
+    updates = []
+    for (supplier_id,) in query:
+        m = metrics.get(supplier_id, EMPTY_METRICS)
+        updates.append({
+            'id': supplier_id,
+            'total_orders_count': m.total_orders,
+            'total_order_value': m.total_value,
+            'on_time_delivery_rate': round(Decimal(str(m.on_time_rate)), 2),
+        })
+    if updates:
+        db.bulk_update_mappings(Supplier, updates)
+    db.commit()
+    return len(updates)
@@ -0,0 +1,95 @@
+from datetime import datetime, timedelta
+from typing import Optional
+from sqlalchemy import DateTime, func
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import FunctionElement
+
+BUCKET_UNITS = ('day', 'week', 'month')
+
+LABEL_FORMATS = {
+    'day': '%Y-%m-%d',
+    'week': '%Y-%m-%d',  # Monday of the week
+    'month': '%Y-%m',
+}
+
+class _TimeBucket(FunctionElement):
+    """Truncate a datetime column to the start of its day, week or month"""
+    type = DateTime()
+    inherit_cache = True
+    unit = None
+
+class day_bucket(_TimeBucket):
+    name = 'day_bucket'
+    inherit_cache = True
+    unit = 'day'
+
+class week_bucket(_TimeBucket):
+    name = 'week_bucket'
+    inherit_cache = True
+    unit = 'week'
+
+class month_bucket(_TimeBucket):
+    name = 'month_bucket'
+    inherit_cache = True
+    unit = 'month'
+
+_BUCKETS = {'day': day_bucket, 'week': week_bucket, 'month': month_bucket}
+
+def time_bucket(unit, column):
+    """Dialect-aware bucket expression for column ('day', 'week' or 'month')"""
+    if unit not in _BUCKETS:
+        raise ValueError(f"Unsupported bucket unit: {unit}")
+    return _BUCKETS[unit](column)
+
+@compiles(_TimeBucket)
+def _compile_date_trunc(element, compiler, **kw):
+    # PostgreSQL and other backends with date_trunc()
+    return "date_trunc('%s', %s)" % (element.unit, compiler.process(element.clauses, **kw))
+
+@compiles(_TimeBucket, 'sqlite')
+def _compile_sqlite(element, compiler, **kw):
+    column = compiler.process(element.clauses, **kw)
+    if element.unit == 'day':
+        return "datetime(%s, 'start of day')" % column
+    if element.unit == 'week':
+        return "datetime(%s, 'start of day', '-6 days', 'weekday 1')" % column
+    return "datetime(%s, 'start of month')" % column
+
+def bucket_start(unit, periods, now: Optional[datetime] = None):
+    """Start of the bucket `periods - 1` units before the current one"""
+    now = now or datetime.utcnow()
+    day = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    if unit == 'day':
+        return day - timedelta(days=periods - 1)
+    if unit == 'week':
+        monday = day - timedelta(days=day.weekday())
+        return monday - timedelta(weeks=periods - 1)
+    month_index = day.year * 12 + day.month - 1 - (periods - 1)
+    return datetime(month_index // 12, month_index % 12 + 1, 1)
+
+def get_trend(db, column, unit='month', periods=12, value=None, filters=(), now: Optional[datetime] = None):
+    """
+    Aggregate rows into time buckets over a datetime column.
+
+    Counts rows per bucket, or sums `value` when given. The range filter on
+    `column` lets the query use an index on it, so the whole trend is one
+    range scan plus a grouping on every backend.
+
+    Returns a list of {'period': label, 'count': n} or {'period', 'total'} dicts
+    in chronological order.
+    """
+    if unit not in BUCKET_UNITS:
+        raise ValueError(f"Unsupported bucket unit: {unit}")
+    bucket = time_bucket(unit, column).label('bucket')
+    aggregate = func.sum(value) if value is not None else func.count()
+    rows = db.query(bucket, aggregate.label('value')).filter(
+        column >= bucket_start(unit, periods, now=now),
+        *filters
+    ).group_by(bucket).order_by(bucket).all()
+
+    key = 'total' if value is not None else 'count'
+    return [
+        {'period': period.strftime(LABEL_FORMATS[unit]), key: float(amount or 0) if value is not None else amount}
+        for period, amount in rows
+        if period is not None
+    ]
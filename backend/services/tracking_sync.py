@@ -0,0 +1,292 @@
+import asyncio
+import math
+import os
+import random
+import time
+from datetime import datetime, timedelta
+import httpx
+from sqlalchemy import func, or_
+from backend.models import Shipment, ShipmentStatusHistory
+from backend.services.carriers import CarrierError, TrackingEvent, get_adapters, match_adapter
+from backend.services.dashboard_snapshot import shipment_contribution, apply_snapshot_delta
+
+TRACKING_SYNC_LIMIT = int(os.getenv('TRACKING_SYNC_LIMIT', 5000))  # Shipments polled per run
+TRACKING_TIMEOUT = float(os.getenv('TRACKING_TIMEOUT', 15))  # Seconds per carrier request
+TRACKING_MAX_RETRIES = int(os.getenv('TRACKING_MAX_RETRIES', 3))  # Per request, for 429/5xx/network errors
+TRACKING_MAX_INTERVAL = int(os.getenv('TRACKING_MAX_INTERVAL', 1440))  # Minutes; ceiling after repeated errors
+
+# Shipments in these states are no longer polled
+FINAL_STATUSES = ('Delivered', 'Returned', 'Lost')
+
+# Minutes between polls by status: (after a change, ceiling while nothing changes).
+# The interval grows by UNCHANGED_BACKOFF each poll that brings nothing new.
+POLL_INTERVALS = {
+    'Label Created': (240, 720),
+    'Picked Up': (60, 360),
+    'In Transit': (60, 360),
+    'Out for Delivery': (15, 60),
+    'Exception': (30, 240),
+    'Customs Delay': (60, 480),
+}
+DEFAULT_POLL_INTERVAL = (60, 360)
+UNCHANGED_BACKOFF = 1.5
+
+# Rows per IN (...) when looking up history and loading changed shipments
+CHUNK_SIZE = 500
+
+class RateLimiter:
+    """
+    Token bucket for one carrier's requests.
+
+    Waiters queue on a lock, so requests go out in order at no more than
+    rate per second. A 429 pauses the whole carrier, not just one request.
+    """
+
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.capacity = burst or max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0
+        self._lock = asyncio.Lock()
+
+    def pause(self, seconds):
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self.paused_until:
+                    await asyncio.sleep(self.paused_until - now)
+                    continue
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+async def _fetch_chunk(client, adapter, limiter, semaphore, tracking_numbers):
+    """One carrier request with retries; failures are returned per tracking number"""
+    attempt = 0
+    async with semaphore:
+        while True:
+            await limiter.acquire()
+            try:
+                return await adapter.fetch(client, tracking_numbers)
+            except CarrierError as e:
+                error = e
+            except httpx.TransportError as e:
+                error = CarrierError(f'{type(e).__name__}: {e}', retryable=True)
+            except Exception as e:
+                # Unexpected payload; retrying will not help
+                error = CarrierError(f'{type(e).__name__}: {e}')
+            attempt += 1
+            if not error.retryable or attempt > TRACKING_MAX_RETRIES:
+                return dict.fromkeys(tracking_numbers, error)
+            delay = error.retry_after if error.retry_after is not None else min(2 ** attempt, 30) * random.uniform(0.5, 1.0)
+            if error.status_code == 429:
+                limiter.pause(delay)
+            await asyncio.sleep(delay)
+
+async def fetch_tracking(requests, client=None):
+    """
+    Look up tracking numbers concurrently.
+
+    requests is a list of (adapter, tracking_number). Each carrier gets its
+    own rate limiter and concurrency cap, and numbers are grouped into
+    requests of the adapter's batch_size. Returns
+    {(carrier name, tracking_number): TrackingResult, None or CarrierError}.
+    """
+    by_adapter = {}
+    for adapter, tracking_number in requests:
+        by_adapter.setdefault(adapter.name, (adapter, []))[1].append(tracking_number)
+
+    async def run(client):
+        tasks = []
+        for adapter, numbers in by_adapter.values():
+            numbers = list(dict.fromkeys(numbers))
+            limiter = RateLimiter(adapter.rate_limit)
+            semaphore = asyncio.Semaphore(adapter.max_concurrency)
+            for i in range(0, len(numbers), adapter.batch_size):
+                chunk = numbers[i:i + adapter.batch_size]
+                tasks.append((adapter.name, asyncio.ensure_future(
+                    _fetch_chunk(client, adapter, limiter, semaphore, chunk)
+                )))
+        results = {}
+        for name, task in tasks:
+            for tracking_number, result in (await task).items():
+                results[(name, tracking_number)] = result
+        return results
+
+    if client is not None:
+        return await run(client)
+    connections = sum(adapter.max_concurrency for adapter, _ in by_adapter.values()) or 1
+    async with httpx.AsyncClient(timeout=TRACKING_TIMEOUT,
+                                 limits=httpx.Limits(max_connections=connections)) as client:
+        return await run(client)
+
+def next_interval(status, current, changed):
+    """Minutes until the next poll of a shipment in status"""
+    base, ceiling = POLL_INTERVALS.get(status, DEFAULT_POLL_INTERVAL)
+    if changed or not current:
+        return base
+    return min(max(base, math.ceil(current * UNCHANGED_BACKOFF)), ceiling)
+
+def _carrier_filter(adapters):
+    """SQL version of CarrierAdapter.matches for any of adapters"""
+    carrier = func.lower(func.trim(Shipment.carrier))
+    return or_(*(
+        or_(carrier == alias, carrier.startswith(alias + ' ', autoescape=True))
+        for adapter in adapters.values() for alias in adapter.aliases
+    ))
+
+def due_shipments(db, now=None, limit=None, adapters=None):
+    """
+    Shipments whose next poll is due, longest overdue first.
+
+    The due check, carrier match and limit run in SQL on the indexed
+    next_api_sync_at column; only the columns needed for polling are loaded.
+    """
+    now = now or datetime.utcnow()
+    query = db.query(
+        Shipment.id, Shipment.carrier, Shipment.tracking_number, Shipment.current_status,
+        Shipment.last_api_sync, Shipment.api_sync_frequency_minutes
+    ).filter(
+        Shipment.next_api_sync_at <= now,
+        Shipment.tracking_number.isnot(None),
+        or_(Shipment.current_status.is_(None), Shipment.current_status.notin_(FINAL_STATUSES))
+    )
+    if adapters is not None:
+        if not adapters:
+            return []
+        query = query.filter(_carrier_filter(adapters))
+    query = query.order_by(Shipment.next_api_sync_at, Shipment.id)
+    return query.limit(limit).all() if limit else query.all()
+
+def _latest_history(db, shipment_ids):
+    latest = {}
+    for i in range(0, len(shipment_ids), CHUNK_SIZE):
+        chunk = shipment_ids[i:i + CHUNK_SIZE]
+        latest.update(db.query(ShipmentStatusHistory.shipment_id, func.max(ShipmentStatusHistory.timestamp)).filter(
+            ShipmentStatusHistory.shipment_id.in_(chunk)
+        ).group_by(ShipmentStatusHistory.shipment_id).all())
+    return latest
+
+def _apply_change(db, shipment, result, events, carrier, now):
+    before = shipment_contribution(shipment)
+    for event in events:
+        db.add(ShipmentStatusHistory(
+            shipment_id=shipment.id,
+            status=event.status or result.status or shipment.current_status,
+            location=event.location,
+            timestamp=event.timestamp or now,
+            description=event.description,
+            exception_code=event.exception_code,
+            update_source='API',
+            updated_by=carrier,
+            raw_api_data=event.raw,
+        ))
+    if result.status:
+        shipment.current_status = result.status
+        if result.status == 'Delivered' and not shipment.actual_delivery_date:
+            shipment.actual_delivery_date = result.timestamp or now
+    if result.location:
+        shipment.current_location = result.location
+    shipment.last_status_update = result.timestamp or now
+    apply_snapshot_delta(db, before, shipment_contribution(shipment))
+
+def apply_results(db, polled, results, now=None):
+    """
+    Write poll results for polled [(row, adapter)] rows; the caller commits.
+
+    Shipments with new carrier events are loaded and updated through the
+    ORM (status, history rows, dashboard counters). All other rows only
+    get their poll bookkeeping, written with one executemany.
+    """
+    now = now or datetime.utcnow()
+    counts = dict.fromkeys(['updated', 'unchanged', 'not_found', 'errors'], 0)
+    latest = _latest_history(db, [row.id for row, _ in polled])
+    bookkeeping = []
+    changed = {}
+    for row, adapter in polled:
+        result = results.get((adapter.name, row.tracking_number))
+        if isinstance(result, CarrierError):
+            counts['errors'] += 1
+            bookkeeping.append({
+                'id': row.id,
+                'api_sync_frequency_minutes': min((row.api_sync_frequency_minutes or 30) * 2, TRACKING_MAX_INTERVAL),
+                'tracking_api_response': {'status': 'error', 'message': str(result), 'checked_at': now.isoformat()},
+            })
+            continue
+        if result is None:
+            counts['not_found'] += 1
+            bookkeeping.append({
+                'id': row.id,
+                'api_sync_frequency_minutes': next_interval(row.current_status, row.api_sync_frequency_minutes, False),
+                'tracking_api_response': {'status': 'not_found', 'message': f'{adapter.name} has no tracking data yet', 'checked_at': now.isoformat()},
+            })
+            continue
+        known = latest.get(row.id)
+        events = [e for e in result.events if known is None or (e.timestamp and e.timestamp > known)]
+        status_changed = result.status is not None and result.status != row.current_status
+        if status_changed and not events:
+            events = [TrackingEvent(result.status, result.location, result.timestamp, result.description, None, result.raw)]
+        if events:
+            changed[row.id] = (result, events, adapter.name)
+            continue
+        counts['unchanged'] += 1
+        bookkeeping.append({
+            'id': row.id,
+            'api_sync_frequency_minutes': next_interval(row.current_status, row.api_sync_frequency_minutes, False),
+            'tracking_api_response': {'status': 'success', 'message': 'No change', 'checked_at': now.isoformat()},
+        })
+
+    ids = list(changed)
+    for i in range(0, len(ids), CHUNK_SIZE):
+        for shipment in db.query(Shipment).filter(Shipment.id.in_(ids[i:i + CHUNK_SIZE])):
+            result, events, carrier = changed[shipment.id]
+            _apply_change(db, shipment, result, events, carrier, now)
+            shipment.api_sync_frequency_minutes = next_interval(shipment.current_status, None, True)
+            shipment.tracking_api_response = {'status': 'success', 'message': 'Tracking data updated', 'checked_at': now.isoformat()}
+            shipment.last_api_sync = now
+            shipment.next_api_sync_at = now + timedelta(minutes=shipment.api_sync_frequency_minutes)
+            counts['updated'] += 1
+
+    for mapping in bookkeeping:
+        mapping['last_api_sync'] = now
+        mapping['next_api_sync_at'] = now + timedelta(minutes=mapping['api_sync_frequency_minutes'])
+    if bookkeeping:
+        db.bulk_update_mappings(Shipment, bookkeeping)
+    return counts
+
+def sync_tracking(db, carriers=None, limit=TRACKING_SYNC_LIMIT, now=None):
+    """
+    Poll carriers for every shipment that is due and commit the results.
+
+    carriers optionally restricts the run to adapter names, e.g. ['DHL'].
+    Returns a summary of counts.
+    """
+    started = time.monotonic()
+    now = now or datetime.utcnow()
+    adapters = get_adapters()
+    if carriers:
+        wanted = {name.lower() for name in carriers}
+        adapters = {name: adapter for name, adapter in adapters.items() if name.lower() in wanted}
+
+    polled = []
+    skipped = 0
+    for row in due_shipments(db, now, limit=limit, adapters=adapters):
+        adapter = match_adapter(adapters, row.carrier)
+        if adapter is None:
+            skipped += 1
+        else:
+            polled.append((row, adapter))
+    # Release the read transaction while waiting on the carriers
+    db.rollback()
+
+    results = asyncio.run(fetch_tracking([(adapter, row.tracking_number) for row, adapter in polled])) if polled else {}
+    counts = apply_results(db, polled, results, now)
+    db.commit()
+    return dict(counts, checked=len(polled), skipped=skipped, seconds=round(time.monotonic() - started, 2))
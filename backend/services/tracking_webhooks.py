@@ -0,0 +1,288 @@
+import hashlib
+import hmac
+import logging
+import os
+import threading
+from collections import namedtuple
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from sqlalchemy import exists, insert, select, update
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.dialects import postgresql
+from backend.models import Shipment, ShipmentStatusHistory
+from backend.models.tracking_webhooks import TrackingWebhookEvent
+from backend.services import events
+from backend.services.carriers import get_adapters, match_adapter, parse_utc
+from backend.services.dashboard_snapshot import shipment_contribution, apply_snapshot_delta
+
+logger = logging.getLogger(__name__)
+
+# Shared secret carriers sign request bodies with (HMAC-SHA256); webhooks are refused without one
+TRACKING_WEBHOOK_SECRET = os.getenv('TRACKING_WEBHOOK_SECRET', '')
+WEBHOOK_MAX_EVENTS = int(os.getenv('WEBHOOK_MAX_EVENTS', 5000))  # Per request
+WEBHOOK_BATCH_SIZE = int(os.getenv('WEBHOOK_BATCH_SIZE', 1000))  # Events applied per transaction
+WEBHOOK_PROCESS_INTERVAL = int(os.getenv('WEBHOOK_PROCESS_INTERVAL', 5))  # Seconds; 0 disables the processor thread
+# Days an event waits for a shipment with its tracking number before it is given up
+WEBHOOK_UNMATCHED_TTL_DAYS = int(os.getenv('WEBHOOK_UNMATCHED_TTL_DAYS', 14))
+WEBHOOK_DESCRIPTION_MAX = 2000  # Characters kept of an event description
+
+IngestResult = namedtuple('IngestResult', ['accepted', 'duplicates', 'rejected', 'failed'])
+
+def verify_signature(body, signature, secret=None):
+    """Check a 'sha256=<hex>' HMAC of the raw request body"""
+    secret = secret or TRACKING_WEBHOOK_SECRET
+    if not secret or not signature:
+        return False
+    expected = 'sha256=' + hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+    return hmac.compare_digest(expected, signature)
+
+def event_hash(tracking_number, status, timestamp):
+    return hashlib.sha256(f'{tracking_number}|{status}|{timestamp.isoformat()}'.encode()).hexdigest()
+
+def normalize_event(data, carrier=None, adapter=None):
+    """
+    Row for tracking_webhook_events from one event in a webhook payload.
+
+    Carrier status codes are mapped with the carrier's adapter. Returns None
+    for events missing a tracking number, status or valid timestamp.
+    """
+    try:
+        tracking_number = str(data.get('tracking_number') or '').strip()
+        status = str(data.get('status') or '').strip()
+        timestamp = parse_utc(data.get('timestamp'))
+    except (AttributeError, TypeError, ValueError):
+        return None
+    if not tracking_number or not status or timestamp is None:
+        return None
+    if adapter is not None:
+        status = adapter.STATUS_CODES.get(status, status)
+    status = status[:30]
+    return {
+        'event_hash': event_hash(tracking_number, status, timestamp),
+        'carrier': carrier,
+        'tracking_number': tracking_number[:100],
+        'status': status,
+        'location': (data.get('location') or None) and str(data['location'])[:200],
+        'timestamp': timestamp,
+        'description': (data.get('description') or None) and str(data['description'])[:WEBHOOK_DESCRIPTION_MAX],
+        'exception_code': (data.get('exception_code') or None) and str(data['exception_code'])[:20],
+        'payload': data,
+    }
+
+def ingest(db, carrier, payload, now=None):
+    """
+    Store webhook events for asynchronous processing and commit.
+
+    payload is a list of events or {"events": [...]}. Duplicates, within
+    the payload or of earlier deliveries, are skipped via the unique
+    event_hash. Events are inserted with one executemany per batch; a batch
+    the database refuses is counted as failed instead of failing the rest.
+    Returns IngestResult; accepted counts the rows actually inserted (from
+    RETURNING), so rows a concurrent delivery stored first are duplicates.
+    """
+    items = payload.get('events') if isinstance(payload, dict) else payload
+    if not isinstance(items, list):
+        raise ValueError('Expected a list of events')
+    if len(items) > WEBHOOK_MAX_EVENTS:
+        raise ValueError(f'At most {WEBHOOK_MAX_EVENTS} events per request')
+
+    adapter = match_adapter(get_adapters(), carrier)
+    rows = {}
+    rejected = 0
+    for item in items:
+        row = normalize_event(item, carrier, adapter) if isinstance(item, dict) else None
+        if row is None:
+            rejected += 1
+        else:
+            rows.setdefault(row['event_hash'], row)
+
+    table = TrackingWebhookEvent.__table__
+    seen = set()
+    hashes = list(rows)
+    for i in range(0, len(hashes), WEBHOOK_BATCH_SIZE):
+        seen.update(db.execute(select(table.c.event_hash).where(
+            table.c.event_hash.in_(hashes[i:i + WEBHOOK_BATCH_SIZE])
+        )).scalars())
+    db.commit()
+    new_rows = [dict(row, received_at=now or datetime.utcnow()) for key, row in rows.items() if key not in seen]
+    # A concurrent delivery of the same events may still win the race; skip those rows
+    if db.get_bind().dialect.name == 'postgresql':
+        statement = postgresql.insert(table).on_conflict_do_nothing(index_elements=['event_hash'])
+    else:
+        statement = table.insert().prefix_with('OR IGNORE', dialect='sqlite')
+    statement = statement.returning(table.c.event_hash)
+    accepted = failed = 0
+    for i in range(0, len(new_rows), WEBHOOK_BATCH_SIZE):
+        batch = new_rows[i:i + WEBHOOK_BATCH_SIZE]
+        try:
+            inserted = len(db.execute(statement, batch).all())
+            db.commit()
+            accepted += inserted
+        except SQLAlchemyError:
+            db.rollback()
+            failed += len(batch)
+            logger.exception("Storing %d %s webhook events failed", len(batch), carrier)
+    if accepted:
+        wake_processor()
+    return IngestResult(accepted, len(items) - accepted - rejected - failed, rejected, failed)
+
+def process_batch(db, batch_size=WEBHOOK_BATCH_SIZE, now=None):
+    """
+    Apply up to batch_size pending events in one transaction and commit.
+
+    Events are claimed with UPDATE ... RETURNING, so processors in several
+    processes never apply the same event twice. History rows are written
+    with one executemany and shipment status/location with one bulk UPDATE.
+    A shipment only moves to an event's status if the event is newer than
+    its last status update. Events whose tracking number has no shipment
+    are left pending, and are applied once the shipment is created or its
+    tracking number is entered. Returns the number of events processed.
+    """
+    now = now or datetime.utcnow()
+    pending = select(TrackingWebhookEvent.id).where(
+        TrackingWebhookEvent.processed_at.is_(None),
+        _has_shipment()
+    ).order_by(TrackingWebhookEvent.id).limit(batch_size)
+    claimed = db.execute(
+        update(TrackingWebhookEvent).where(
+            TrackingWebhookEvent.id.in_(pending.scalar_subquery()),
+            TrackingWebhookEvent.processed_at.is_(None)
+        ).values(processed_at=now).returning(
+            TrackingWebhookEvent.carrier, TrackingWebhookEvent.tracking_number, TrackingWebhookEvent.status,
+            TrackingWebhookEvent.location, TrackingWebhookEvent.timestamp, TrackingWebhookEvent.description,
+            TrackingWebhookEvent.exception_code, TrackingWebhookEvent.payload
+        ),
+        execution_options={'synchronize_session': False}
+    ).all()
+    if not claimed:
+        db.commit()
+        return 0
+
+    shipments = {row.tracking_number: row for row in db.query(
+        Shipment.id, Shipment.tracking_number, Shipment.current_status, Shipment.current_location,
+        Shipment.last_status_update, Shipment.actual_delivery_date
+    ).filter(Shipment.tracking_number.in_({event.tracking_number for event in claimed}))}
+
+    history = []
+    latest = {}
+    for event in sorted(claimed, key=lambda e: e.timestamp):
+        shipment = shipments.get(event.tracking_number)
+        if shipment is None:
+            # Shipment deleted or renumbered since the claim; the event stays on record
+            continue
+        history.append({
+            'shipment_id': shipment.id,
+            'status': event.status,
+            'location': event.location,
+            'timestamp': event.timestamp,
+            'description': event.description,
+            'exception_code': event.exception_code,
+            'update_source': 'Webhook',
+            'updated_by': event.carrier,
+            'raw_api_data': event.payload,
+            'created_at': now,
+        })
+        if shipment.last_status_update is None or event.timestamp > shipment.last_status_update:
+            latest[shipment.id] = history[-1]
+
+    if history:
+        db.execute(insert(ShipmentStatusHistory), history)
+
+    changes = []
+    before = {}
+    after = {}
+    for shipment in shipments.values():
+        entry = latest.get(shipment.id)
+        if entry is None:
+            continue
+        change = {
+            'id': shipment.id,
+            'current_status': entry['status'],
+            'current_location': entry['location'] or shipment.current_location,
+            'last_status_update': entry['timestamp'],
+            'actual_delivery_date': shipment.actual_delivery_date,
+        }
+        if entry['status'] == 'Delivered' and shipment.actual_delivery_date is None:
+            change['actual_delivery_date'] = entry['timestamp']
+        changes.append(change)
+        # Dashboard counters move by the sum of the per-shipment differences
+        updated = SimpleNamespace(current_status=change['current_status'], actual_delivery_date=change['actual_delivery_date'])
+        for totals, state in ((before, shipment), (after, updated)):
+            for key, value in shipment_contribution(state, now).items():
+                totals[key] = totals.get(key, 0) + value
+    if changes:
+        db.execute(update(Shipment), changes)
+        apply_snapshot_delta(db, before, after)
+        events.shipment_status_events(db, [SimpleNamespace(**latest[change['id']]) for change in changes])
+    db.commit()
+    return len(claimed)
+
+def _has_shipment():
+    return exists().where(Shipment.tracking_number == TrackingWebhookEvent.tracking_number)
+
+def expire_unmatched(db, now=None, ttl_days=WEBHOOK_UNMATCHED_TTL_DAYS):
+    """Stop waiting on events that found no shipment within ttl_days and commit; returns how many"""
+    now = now or datetime.utcnow()
+    expired = db.execute(
+        update(TrackingWebhookEvent).where(
+            TrackingWebhookEvent.processed_at.is_(None),
+            TrackingWebhookEvent.received_at < now - timedelta(days=ttl_days),
+            ~_has_shipment()
+        ).values(processed_at=now),
+        execution_options={'synchronize_session': False}
+    ).rowcount
+    db.commit()
+    if expired:
+        logger.warning("Gave up on %d webhook events with no matching shipment after %d days", expired, ttl_days)
+    return expired
+
+def process_pending(db, batch_size=WEBHOOK_BATCH_SIZE, max_batches=None):
+    """Process batches until no events are pending; returns the number processed"""
+    expire_unmatched(db)
+    total = 0
+    batches = 0
+    while max_batches is None or batches < max_batches:
+        processed = process_batch(db, batch_size)
+        total += processed
+        batches += 1
+        if processed < batch_size:
+            break
+    return total
+
+_processor = None
+_processor_pid = None
+_processor_lock = threading.Lock()
+_wake = threading.Event()
+
+def wake_processor():
+    """Have this process's processor run now instead of at its next interval"""
+    _wake.set()
+
+def _processor_loop(interval):
+    from backend.database import SessionLocal
+    while True:
+        # Also polls, to pick up events ingested by other processes
+        _wake.wait(interval)
+        _wake.clear()
+        db = SessionLocal()
+        try:
+            process_pending(db)
+        except Exception:
+            db.rollback()
+            logger.exception("Tracking webhook processing failed")
+        finally:
+            db.close()
+
+def start_processor(interval=WEBHOOK_PROCESS_INTERVAL):
+    """Run the webhook processor on a daemon thread in this process (once per process)"""
+    global _processor, _processor_pid
+    if interval <= 0:
+        return False
+    with _processor_lock:
+        if _processor is not None and _processor.is_alive() and _processor_pid == os.getpid():
+            return False
+        _processor_pid = os.getpid()
+        _processor = threading.Thread(target=_processor_loop, args=(interval,),
+                                      name='tracking-webhooks', daemon=True)
+        _processor.start()
+    return True
@@ -0,0 +1,57 @@
+from sqlalchemy import func, select
+from backend.models import Order, Project, Supplier, Shipment, ShipmentStatusHistory, ShipmentHistoryArchive
+
+# Version stamps for conditional GETs. Each lookup reads a few indexed
+# columns instead of loading the objects, and returns (version, last_modified)
+# where version changes whenever the serialized response would, or None if
+# the row does not exist. Collections return last_modified None: their
+# newest stamp does not move when a member is deleted or a late one arrives,
+# so If-Modified-Since could answer 304 for a changed list. The ETag, which
+# includes the counts, validates them instead.
+
+def _newest(*stamps):
+    stamps = [stamp for stamp in stamps if stamp is not None]
+    return max(stamps) if stamps else None
+
+def shipment_version(db, shipment_id):
+    row = db.query(Shipment.updated_at, Shipment.last_status_update).filter(Shipment.id == shipment_id).first()
+    if row is None:
+        return None
+    return tuple(row), _newest(*row)
+
+def shipment_history_version(db, shipment_id):
+    """Shipment stamps plus its history count/newest id and archive stamp"""
+    history = select(ShipmentStatusHistory.id).where(ShipmentStatusHistory.shipment_id == shipment_id)
+    row = db.query(
+        Shipment.updated_at,
+        Shipment.last_status_update,
+        history.with_only_columns(func.count()).scalar_subquery(),
+        history.with_only_columns(func.max(ShipmentStatusHistory.id)).scalar_subquery(),
+        select(ShipmentHistoryArchive.updated_at).where(
+            ShipmentHistoryArchive.shipment_id == shipment_id
+        ).scalar_subquery(),
+    ).filter(Shipment.id == shipment_id).first()
+    if row is None:
+        return None
+    return tuple(row), None
+
+def order_version(db, order_id):
+    """Order stamp plus those of its project and supplier, shown with it"""
+    row = db.query(Order.updated_at, Project.updated_at, Supplier.updated_at).outerjoin(
+        Project, Project.id == Order.project_id
+    ).outerjoin(
+        Supplier, Supplier.id == Order.supplier_id
+    ).filter(Order.id == order_id).first()
+    if row is None:
+        return None
+    return tuple(row), _newest(*row)
+
+def project_orders_version(db, project_id):
+    """Count and newest stamp of a project's orders (and their suppliers)"""
+    project = db.query(Project.id).filter(Project.id == project_id).first()
+    if project is None:
+        return None
+    row = db.query(func.count(Order.id), func.max(Order.updated_at), func.max(Supplier.updated_at)).outerjoin(
+        Supplier, Supplier.id == Order.supplier_id
+    ).filter(Order.project_id == project_id).one()
+    return tuple(row), None
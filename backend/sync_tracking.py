@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+FusionFlow Carrier Tracking Sync
+
+Polls the carrier APIs for every shipment whose next check is due and
+records new status events. Each shipment is rechecked on its own interval,
+which grows while nothing changes and shrinks when it does, so run this
+often (e.g. every few minutes from cron, or with --loop).
+
+Usage:
+    python backend/sync_tracking.py [--carrier NAME ...] [--limit N] [--loop] [--interval SECONDS]
+
+Arguments:
+    --carrier: Only poll these carriers (DHL, FedEx, Aramex)
+    --limit: Maximum shipments polled per run (default: TRACKING_SYNC_LIMIT)
+    --loop: Keep running, polling every --interval seconds
+    --interval: Seconds between runs with --loop (default: 60)
+"""
+
+import os
+import sys
+import argparse
+import time
+
+# Add the parent directory to the Python path to import backend modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.database import SessionLocal
+from backend.services.carriers import ADAPTERS
+from backend.services.tracking_sync import sync_tracking, TRACKING_SYNC_LIMIT
+
+def run_once(carriers, limit):
+    db = SessionLocal()
+    try:
+        summary = sync_tracking(db, carriers=carriers, limit=limit)
+    finally:
+        db.close()
+    print(f"✅ Checked {summary['checked']} shipments in {summary['seconds']}s: "
+          f"{summary['updated']} updated, {summary['unchanged']} unchanged, "
+          f"{summary['not_found']} not found, {summary['errors']} errors"
+          + (f", {summary['skipped']} skipped (carrier not polled)" if summary['skipped'] else ""))
+    return summary
+
+def main():
+    parser = argparse.ArgumentParser(description="Poll carrier tracking APIs for due shipments")
+    parser.add_argument("--carrier", action="append", choices=[cls.name for cls in ADAPTERS], help="Only poll this carrier")
+    parser.add_argument("--limit", type=int, default=TRACKING_SYNC_LIMIT, help="Maximum shipments per run")
+    parser.add_argument("--loop", action="store_true", help="Keep polling")
+    parser.add_argument("--interval", type=int, default=60, help="Seconds between runs with --loop")
+    args = parser.parse_args()
+
+    if not args.loop:
+        run_once(args.carrier, args.limit)
+        return
+    try:
+        while True:
+            try:
+                run_once(args.carrier, args.limit)
+            except Exception as e:
+                print(f"❌ Tracking sync failed: {e}")
+            time.sleep(args.interval)
+    except KeyboardInterrupt:
+        print("\nStopped.")
+
+if __name__ == "__main__":
+    main()
@@ -15,6 +15,14 @@ def create_app():
     app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv("DATABASE_URL", "sqlite:///./fusionflow.db")
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
     
+    # JSON encoding of Decimal/datetime values, with orjson when installed
+    from fusionflow_app.json_provider import FusionJSONProvider
+    app.json = FusionJSONProvider(app)
+    
+    # Request-scoped database sessions
+    from fusionflow_app import db
+    db.init_app(app)
+    
     # Initialize Flask-Login
     login_manager.init_app(app)
     login_manager.login_view = 'auth.login'
@@ -22,25 +30,37 @@ def create_app():
     login_manager.login_message_category = 'info'
     
     # User loader for Flask-Login
+    def _load_user_snapshot(user_id):
+        from fusionflow_app.db import get_db
+        from fusionflow_app.user_cache import CachedUser
+        from backend.models import User
+        db = get_db()
+        user = db.query(User).get(user_id)
+        if not user or not user.is_active:
+            return None
+        return CachedUser.from_model(user)
+
+    def _check_user(user_id):
+        from fusionflow_app.db import get_db
+        from backend.models import User
+        row = get_db().query(User.is_active, User.role).filter(User.id == user_id).first()
+        return tuple(row) if row else None
+    
     @login_manager.user_loader
     def load_user(user_id):
-        from backend.database import SessionLocal
-        from backend.models import User
-        db = SessionLocal()
+        from fusionflow_app import user_cache
         try:
-            user = db.query(User).get(int(user_id))
-            if user:
-                # Make User model compatible with Flask-Login
-                user.is_authenticated = True
-                user.is_active = True
-                user.is_anonymous = False
-                user.get_id = lambda: str(user.id)
-            return user
+            return user_cache.get_user(int(user_id), _load_user_snapshot, _check_user)
         except:
             return None
-        finally:
-            db.close()
     
+    # Cached dropdown values, e.g. {% for s in reference_options('carriers') %}
+    @app.context_processor
+    def inject_reference_options():
+        from fusionflow_app.db import get_db
+        from backend.services.reference_data import get_options
+        return {'reference_options': lambda name: get_options(get_db(), name)}
+
     # Register blueprints
     from fusionflow_app.routes.auth import auth_bp
     from fusionflow_app.routes.dashboard import dashboard_bp
@@ -70,4 +90,16 @@ def create_app():
         from backend.database import create_tables
         create_tables()
     
+    # Release scheduled notifications and archive expired ones in the background
+    from backend.services.notifications import start_scheduler
+    start_scheduler()
+    
+    # Apply stored carrier webhook events in the background
+    from backend.services.tracking_webhooks import start_processor
+    start_processor()
+    
+    # Pick up background jobs queued before the last restart
+    from backend.services import jobs
+    jobs.start()
+    
     return app
\ No newline at end of file
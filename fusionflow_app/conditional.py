@@ -0,0 +1,43 @@
+import hashlib
+import os
+from datetime import timezone
+from flask import Response, jsonify, request
+
+# Seconds a client may reuse a response before revalidating; 0 revalidates every time
+CONDITIONAL_MAX_AGE = int(os.getenv('CONDITIONAL_MAX_AGE', 0))
+
+def conditional_json(version, last_modified, build, max_age=CONDITIONAL_MAX_AGE):
+    """
+    JSON response validated by ETag and Last-Modified.
+
+    version is a tuple of stamps from a cheap lookup (updated_at values,
+    counts) that changes whenever the payload would; the ETag hashes it
+    with the request path and query string. build() produces the payload
+    and is only called when the client's copy is stale, so a 304 skips
+    loading and serializing. last_modified is naive UTC. If-None-Match
+    takes precedence over If-Modified-Since; the ETag is the exact
+    validator, as Last-Modified cannot see deleted rows.
+    """
+    etag = hashlib.sha1(repr((request.full_path, version)).encode()).hexdigest()
+    if last_modified is not None:
+        # HTTP dates have whole-second precision
+        last_modified = last_modified.replace(microsecond=0, tzinfo=timezone.utc)
+
+    if request.if_none_match:
+        fresh = request.if_none_match.contains_weak(etag)
+    elif request.if_modified_since and last_modified is not None:
+        fresh = last_modified <= request.if_modified_since
+    else:
+        fresh = False
+
+    response = Response(status=304) if fresh else jsonify(build())
+    response.set_etag(etag)
+    if last_modified is not None:
+        response.last_modified = last_modified
+    response.cache_control.private = True
+    if max_age:
+        response.cache_control.max_age = max_age
+        response.cache_control.must_revalidate = True
+    else:
+        response.cache_control.no_cache = True
+    return response
@@ -0,0 +1,20 @@
+from flask import g
+from backend.database import SessionLocal
+
+def get_db():
+    """Get the database session for the current request"""
+    if 'db' not in g:
+        g.db = SessionLocal()
+    return g.db
+
+def close_db(exc=None):
+    """Release the request session when the app context is torn down"""
+    db = g.pop('db', None)
+    if db is not None:
+        if exc is not None:
+            db.rollback()
+        db.close()
+
+def init_app(app):
+    """Register the session teardown with the Flask app"""
+    app.teardown_appcontext(close_db)
@@ -0,0 +1,19 @@
+from datetime import datetime
+from flask import Response, stream_with_context
+from backend.services.export import iter_export, EXPORT_FORMATS
+
+def export_response(query, columns, export_format, name):
+    """
+    Chunked download of query as CSV or XLSX.
+
+    The request context (and its database session) stays open until the last
+    chunk is sent and is closed by the app teardown, so routes returning this
+    must not close the session themselves.
+    """
+    filename = f"{name}-{datetime.utcnow().strftime('%Y%m%d-%H%M%S')}.{export_format}"
+    body = stream_with_context(iter_export(query, columns, export_format, title=name.title()))
+    return Response(body, mimetype=EXPORT_FORMATS[export_format], headers={
+        'Content-Disposition': f'attachment; filename="{filename}"',
+        'X-Accel-Buffering': 'no',
+        'Cache-Control': 'no-store',
+    })
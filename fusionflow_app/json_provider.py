@@ -0,0 +1,52 @@
+import os
+from datetime import date, time
+from decimal import Decimal
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # Optional; the standard library encoder is used without it
+    orjson = None
+
+# 'orjson' (used when installed) or 'json'
+JSON_BACKEND = os.getenv('JSON_BACKEND', 'orjson')
+USE_ORJSON = orjson is not None and JSON_BACKEND == 'orjson'
+
+class FusionJSONProvider(DefaultJSONProvider):
+    """
+    JSON provider for jsonify and the API responses.
+
+    Decimals are written as numbers and dates/datetimes in ISO 8601, so the
+    serializers can hand over column values unconverted. Keys keep the
+    order they were built in. With orjson the response body is encoded in
+    one call straight to bytes.
+    """
+    sort_keys = False
+
+    @staticmethod
+    def default(o):
+        if isinstance(o, Decimal):
+            return float(o)
+        if isinstance(o, (date, time)):
+            return o.isoformat()
+        if isinstance(o, tuple):
+            return list(o)
+        return DefaultJSONProvider.default(o)
+
+    def _orjson_options(self):
+        options = orjson.OPT_NON_STR_KEYS
+        if self.compact is False or (self.compact is None and self._app.debug):
+            options |= orjson.OPT_INDENT_2
+        return options
+
+    def dumps(self, obj, **kwargs):
+        if not USE_ORJSON or kwargs:
+            return super().dumps(obj, **kwargs)
+        return orjson.dumps(obj, default=self.default, option=self._orjson_options()).decode()
+
+    def response(self, *args, **kwargs):
+        if not USE_ORJSON:
+            return super().response(*args, **kwargs)
+        obj = self._prepare_response_obj(args, kwargs)
+        body = orjson.dumps(obj, default=self.default, option=self._orjson_options())
+        return self._app.response_class(body + b'\n', mimetype=self.mimetype)
@@ -1,15 +1,32 @@
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, Response, jsonify, request, url_for
 from flask_login import login_required, current_user
-from backend.database import SessionLocal
-from backend.models import Order, Project, Supplier, Shipment, User
+from fusionflow_app.db import get_db
+from backend.models import Order, Project, Supplier, Shipment, User, CostBreakdown, BackgroundJob
+from backend.services.dashboard_snapshot import get_dashboard_snapshot
+from backend.services.time_buckets import get_trend, BUCKET_UNITS
+from backend.services.pagination import paginate_keyset, cached_count
+from backend.services.loader_profiles import with_profile
+from backend.services.search import search
+from backend.services import events, jobs, tracking_webhooks
+from backend.services.supplier_metrics import get_supplier_metrics
+from backend.services.serializers import serialize, serialize_many, parse_fields
+from backend.services.versions import order_version, shipment_version, project_orders_version
+from fusionflow_app.conditional import conditional_json
 from sqlalchemy import func, desc
+from sqlalchemy.orm import load_only
 from datetime import datetime, timedelta
+from inspect import signature
+import json
+import os
+import time
 
 api_bp = Blueprint('api', __name__, url_prefix='/api')
 
-def get_db():
-    """Get database session"""
-    return SessionLocal()
+# Server-Sent Events stream settings (seconds unless noted)
+EVENT_KEEPALIVE = int(os.getenv('EVENT_KEEPALIVE', 25))
+EVENT_STREAM_MAX_AGE = int(os.getenv('EVENT_STREAM_MAX_AGE', 600))
+EVENT_RETRY_MS = int(os.getenv('EVENT_RETRY_MS', 5000))
+EVENT_MAX_SHIPMENTS = int(os.getenv('EVENT_MAX_SHIPMENTS', 50))  # Shipment channels per stream
 
 @api_bp.route('/dashboard/stats')
 @login_required
@@ -17,45 +34,98 @@ def dashboard_stats():
     """API endpoint for dashboard statistics"""
     db = get_db()
     try:
+        metrics = get_dashboard_snapshot(db)
+        
         # Key metrics
         stats = {
-            'total_orders': db.query(Order).count(),
-            'total_projects': db.query(Project).count(),
-            'total_suppliers': db.query(Supplier).count(),
-            'total_shipments': db.query(Shipment).count(),
-            'active_projects': db.query(Project).filter(Project.status == 'Active').count(),
-            'pending_orders': db.query(Order).filter(Order.status.in_(['Draft', 'Pending Approval'])).count(),
-            'in_transit_shipments': db.query(Shipment).filter(
-                Shipment.current_status.in_(['In Transit', 'Out for Delivery'])
-            ).count()
+            'total_orders': metrics.total_orders,
+            'total_projects': metrics.total_projects,
+            'total_suppliers': metrics.total_suppliers,
+            'total_shipments': metrics.total_shipments,
+            'active_projects': metrics.active_projects,
+            'pending_orders': metrics.pending_orders,
+            'in_transit_shipments': metrics.in_transit_shipments
         }
         
         # Order status distribution
-        order_statuses = db.query(
-            Order.status,
-            func.count(Order.id).label('count')
-        ).group_by(Order.status).all()
-        
-        stats['order_statuses'] = {status: count for status, count in order_statuses}
+        stats['order_statuses'] = metrics.order_statuses
         
         # Monthly order trend (last 12 months)
-        twelve_months_ago = datetime.utcnow() - timedelta(days=365)
-        monthly_orders = db.query(
-            func.date_trunc('month', Order.created_at).label('month'),
-            func.count(Order.id).label('count')
-        ).filter(Order.created_at >= twelve_months_ago).group_by('month').all()
-        
         stats['monthly_orders'] = [
-            {'month': month.strftime('%Y-%m'), 'count': count}
-            for month, count in monthly_orders
+            {'month': bucket['period'], 'count': bucket['count']}
+            for bucket in get_trend(db, Order.created_at, unit='month', periods=12)
         ]
         
         return jsonify({'success': True, 'data': stats})
         
     except Exception as e:
         return jsonify({'success': False, 'message': str(e)})
-    finally:
-        db.close()
+
+@api_bp.route('/trends/<entity>')
+@login_required
+def trends(entity):
+    """API endpoint for order, shipment and cost trends bucketed by day, week or month"""
+    unit = request.args.get('unit', 'month')
+    periods = max(1, min(request.args.get('periods', 12, type=int), 366))
+    if unit not in BUCKET_UNITS:
+        return jsonify({'success': False, 'message': 'Invalid unit'}), 400
+    
+    db = get_db()
+    try:
+        if entity == 'orders':
+            data = get_trend(db, Order.created_at, unit=unit, periods=periods)
+        elif entity == 'shipments':
+            data = get_trend(db, Shipment.created_at, unit=unit, periods=periods)
+        elif entity == 'costs':
+            data = get_trend(db, CostBreakdown.created_at, unit=unit, periods=periods,
+                             value=CostBreakdown.amount_in_base_currency)
+        else:
+            return jsonify({'success': False, 'message': 'Unknown trend'}), 404
+        
+        return jsonify({'success': True, 'data': data, 'unit': unit})
+        
+    except Exception as e:
+        return jsonify({'success': False, 'message': str(e)})
+
+# Searchable entities: model, title field, subtitle field, detail endpoint
+SEARCH_ENTITIES = {
+    'orders': (Order, 'order_number', 'description', 'orders.view_order'),
+    'shipments': (Shipment, 'tracking_number', 'carrier', 'shipments.view_shipment'),
+    'suppliers': (Supplier, 'name', 'supplier_code', 'suppliers.view_supplier'),
+    'projects': (Project, 'name', 'project_code', 'projects.view_project'),
+}
+
+@api_bp.route('/search/<entity>')
+@login_required
+def search_api(entity):
+    """API endpoint for ranked prefix search over orders, shipments, suppliers or projects"""
+    if entity not in SEARCH_ENTITIES:
+        return jsonify({'success': False, 'message': 'Unknown search entity'}), 404
+    search_text = request.args.get('q', '').strip()
+    limit = max(1, min(request.args.get('limit', 20, type=int), 100))
+    if not search_text:
+        return jsonify({'success': True, 'data': []})
+
+    model, title_field, subtitle_field, endpoint = SEARCH_ENTITIES[entity]
+    db = get_db()
+    try:
+        query = db.query(model).options(load_only(
+            model.id, getattr(model, title_field), getattr(model, subtitle_field)
+        ))
+        results = search(db, model, search_text, limit=limit, query=query)
+
+        data = [{
+            'id': row.id,
+            'title': getattr(row, title_field),
+            'subtitle': getattr(row, subtitle_field),
+            'url': url_for(endpoint, **{f'{entity[:-1]}_id': row.id}),
+            'rank': round(rank or 0, 4)
+        } for row, rank in results]
+
+        return jsonify({'success': True, 'data': data})
+
+    except Exception as e:
+        return jsonify({'success': False, 'message': str(e)})
 
 @api_bp.route('/orders')
 @login_required
@@ -64,63 +134,49 @@ def list_orders_api():
     db = get_db()
     try:
         # Get query parameters
-        page = int(request.args.get('page', 1))
+        cursor = request.args.get('cursor')
         per_page = min(int(request.args.get('per_page', 50)), 100)  # Max 100 per page
+        with_total = request.args.get('count', 'true').lower() != 'false'
         status = request.args.get('status')
         priority = request.args.get('priority')
+        fields = parse_fields(request.args.get('fields'))
         
         # Build query
-        query = db.query(Order)
+        query = with_profile(db.query(Order), Order, 'list')
         
         if status:
             query = query.filter(Order.status == status)
         if priority:
             query = query.filter(Order.priority == priority)
         
-        # Get total count
-        total = query.count()
+        # Total count is optional and cached per filter set
+        total = cached_count(query) if with_total else None
         
-        # Apply pagination and get results
-        orders = query.order_by(desc(Order.created_at)).offset(
-            (page - 1) * per_page
-        ).limit(per_page).all()
+        # Keyset pagination on (created_at, id)
+        page = paginate_keyset(query, Order.created_at, Order.id,
+                               cursor=cursor, per_page=per_page)
+        orders = page.items
         
         # Format response
-        orders_data = []
-        for order in orders:
-            orders_data.append({
-                'id': order.id,
-                'order_number': order.order_number,
-                'po_number': order.po_number,
-                'description': order.description,
-                'status': order.status,
-                'priority': order.priority,
-                'quantity': order.quantity,
-                'unit_price': float(order.unit_price) if order.unit_price else 0,
-                'total_amount': float(order.total_amount) if order.total_amount else 0,
-                'currency': order.currency,
-                'order_date': order.order_date.isoformat() if order.order_date else None,
-                'requested_delivery_date': order.requested_delivery_date.isoformat() if order.requested_delivery_date else None,
-                'project_name': order.project.name if order.project else None,
-                'supplier_name': order.supplier.name if order.supplier else None,
-                'created_at': order.created_at.isoformat()
-            })
+        orders_data = serialize_many(orders, Order, 'list', fields)
         
         return jsonify({
             'success': True,
             'data': orders_data,
             'pagination': {
-                'page': page,
                 'per_page': per_page,
                 'total': total,
-                'pages': (total + per_page - 1) // per_page
+                'has_next': page.has_next,
+                'has_prev': page.has_prev,
+                'next_cursor': page.next_cursor,
+                'prev_cursor': page.prev_cursor
             }
         })
         
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
     except Exception as e:
         return jsonify({'success': False, 'message': str(e)})
-    finally:
-        db.close()
 
 @api_bp.route('/orders/<int:order_id>')
 @login_required
@@ -128,45 +184,22 @@ def get_order_api(order_id):
     """API endpoint for single order details"""
     db = get_db()
     try:
-        order = db.query(Order).filter(Order.id == order_id).first()
-        if not order:
+        fields = parse_fields(request.args.get('fields'))
+        stamp = order_version(db, order_id)
+        if not stamp:
             return jsonify({'success': False, 'message': 'Order not found'}), 404
         
-        order_data = {
-            'id': order.id,
-            'order_number': order.order_number,
-            'po_number': order.po_number,
-            'description': order.description,
-            'status': order.status,
-            'priority': order.priority,
-            'quantity': order.quantity,
-            'unit_price': float(order.unit_price) if order.unit_price else 0,
-            'total_amount': float(order.total_amount) if order.total_amount else 0,
-            'currency': order.currency,
-            'order_date': order.order_date.isoformat() if order.order_date else None,
-            'requested_delivery_date': order.requested_delivery_date.isoformat() if order.requested_delivery_date else None,
-            'promised_delivery_date': order.promised_delivery_date.isoformat() if order.promised_delivery_date else None,
-            'actual_delivery_date': order.actual_delivery_date.isoformat() if order.actual_delivery_date else None,
-            'project': {
-                'id': order.project.id,
-                'name': order.project.name,
-                'code': order.project.project_code
-            } if order.project else None,
-            'supplier': {
-                'id': order.supplier.id,
-                'name': order.supplier.name,
-                'code': order.supplier.supplier_code
-            } if order.supplier else None,
-            'created_at': order.created_at.isoformat(),
-            'updated_at': order.updated_at.isoformat()
-        }
+        def build():
+            order = with_profile(db.query(Order), Order, 'detail').filter(Order.id == order_id).first()
+            order_data = serialize(order, 'detail', fields)
+            return {'success': True, 'data': order_data}
         
-        return jsonify({'success': True, 'data': order_data})
+        return conditional_json(*stamp, build)
         
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
     except Exception as e:
         return jsonify({'success': False, 'message': str(e)})
-    finally:
-        db.close()
 
 @api_bp.route('/shipments/<int:shipment_id>/track')
 @login_required
@@ -174,34 +207,23 @@ def track_shipment_api(shipment_id):
     """API endpoint for shipment tracking"""
     db = get_db()
     try:
-        shipment = db.query(Shipment).filter(Shipment.id == shipment_id).first()
-        if not shipment:
+        fields = parse_fields(request.args.get('fields'))
+        stamp = shipment_version(db, shipment_id)
+        if not stamp:
             return jsonify({'success': False, 'message': 'Shipment not found'}), 404
         
-        tracking_data = {
-            'id': shipment.id,
-            'tracking_number': shipment.tracking_number,
-            'carrier': shipment.carrier,
-            'current_status': shipment.current_status,
-            'current_location': shipment.current_location,
-            'origin_address': shipment.origin_address,
-            'destination_address': shipment.destination_address,
-            'ship_date': shipment.ship_date.isoformat() if shipment.ship_date else None,
-            'estimated_delivery_date': shipment.estimated_delivery_date.isoformat() if shipment.estimated_delivery_date else None,
-            'actual_delivery_date': shipment.actual_delivery_date.isoformat() if shipment.actual_delivery_date else None,
-            'last_status_update': shipment.last_status_update.isoformat() if shipment.last_status_update else None,
-            'order': {
-                'id': shipment.order.id,
-                'order_number': shipment.order.order_number
-            } if shipment.order else None
-        }
+        def build():
+            shipment = with_profile(db.query(Shipment), Shipment, 'detail').filter(Shipment.id == shipment_id).first()
+            tracking_data = serialize(shipment, 'tracking', fields)
+            
+            return {'success': True, 'data': tracking_data}
         
-        return jsonify({'success': True, 'data': tracking_data})
+        return conditional_json(*stamp, build)
         
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
     except Exception as e:
         return jsonify({'success': False, 'message': str(e)})
-    finally:
-        db.close()
 
 @api_bp.route('/projects/<int:project_id>/orders')
 @login_required
@@ -209,32 +231,24 @@ def project_orders_api(project_id):
     """API endpoint for project orders"""
     db = get_db()
     try:
-        project = db.query(Project).filter(Project.id == project_id).first()
-        if not project:
+        fields = parse_fields(request.args.get('fields'))
+        stamp = project_orders_version(db, project_id)
+        if not stamp:
             return jsonify({'success': False, 'message': 'Project not found'}), 404
         
-        orders = db.query(Order).filter(Order.project_id == project_id).all()
+        def build():
+            orders = with_profile(db.query(Order), Order, 'list').filter(Order.project_id == project_id).all()
+            
+            orders_data = serialize_many(orders, Order, 'summary', fields)
+            
+            return {'success': True, 'data': orders_data}
         
-        orders_data = []
-        for order in orders:
-            orders_data.append({
-                'id': order.id,
-                'order_number': order.order_number,
-                'description': order.description,
-                'status': order.status,
-                'priority': order.priority,
-                'total_amount': float(order.total_amount) if order.total_amount else 0,
-                'currency': order.currency,
-                'supplier_name': order.supplier.name if order.supplier else None,
-                'created_at': order.created_at.isoformat()
-            })
-        
-        return jsonify({'success': True, 'data': orders_data})
+        return conditional_json(*stamp, build)
         
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
     except Exception as e:
         return jsonify({'success': False, 'message': str(e)})
-    finally:
-        db.close()
 
 @api_bp.route('/suppliers/<int:supplier_id>/performance')
 @login_required
@@ -246,34 +260,125 @@ def supplier_performance_api(supplier_id):
         if not supplier:
             return jsonify({'success': False, 'message': 'Supplier not found'}), 404
         
-        # Get supplier orders for calculations
-        orders = db.query(Order).filter(Order.supplier_id == supplier_id).all()
-        
-        # Calculate metrics
-        total_orders = len(orders)
-        completed_orders = len([o for o in orders if o.status == 'Delivered'])
-        total_value = sum(order.total_amount or 0 for order in orders)
-        
-        # On-time delivery calculation
-        delivered_orders = [o for o in orders if o.actual_delivery_date and o.requested_delivery_date]
-        on_time_orders = len([o for o in delivered_orders if o.actual_delivery_date <= o.requested_delivery_date])
-        on_time_rate = (on_time_orders / len(delivered_orders) * 100) if delivered_orders else 0
+        metrics = get_supplier_metrics(db, supplier_id)
         
-        performance_data = {
-            'supplier_id': supplier.id,
-            'supplier_name': supplier.name,
-            'total_orders': total_orders,
-            'completed_orders': completed_orders,
-            'total_value': float(total_value),
-            'on_time_delivery_rate': round(on_time_rate, 2),
-            'overall_rating': float(supplier.overall_performance_score) if supplier.overall_performance_score else 0,
-            'quality_rating': float(supplier.quality_rating) if supplier.quality_rating else 0,
-            'communication_rating': float(supplier.communication_rating) if supplier.communication_rating else 0
-        }
+        performance_data = serialize(supplier, 'performance')
+        performance_data.update({
+            'total_orders': metrics.total_orders,
+            'completed_orders': metrics.completed_orders,
+            'total_value': metrics.total_value,
+            'on_time_delivery_rate': round(metrics.on_time_rate, 2),
+        })
         
         return jsonify({'success': True, 'data': performance_data})
         
     except Exception as e:
         return jsonify({'success': False, 'message': str(e)})
-    finally:
-        db.close()
\ No newline at end of file
+
+@api_bp.route('/jobs/<name>', methods=['POST'])
+@login_required
+def start_job(name):
+    """
+    Queue a background job and return 202 with its id.
+
+    The JSON body holds the job's arguments. Sending the same
+    Idempotency-Key header (or idempotency_key field) again returns the
+    original job instead of starting another.
+    """
+    spec = jobs.load_jobs().get(name)
+    if spec is None or spec.api_roles == ():
+        return jsonify({'success': False, 'message': 'Unknown job'}), 404
+    if spec.api_roles is not None and current_user.role not in spec.api_roles:
+        return jsonify({'success': False, 'message': 'Not allowed to start this job'}), 403
+    payload = request.get_json(silent=True) or {}
+    if not isinstance(payload, dict):
+        return jsonify({'success': False, 'message': 'Expected a JSON object of job arguments'}), 400
+    idempotency_key = request.headers.get('Idempotency-Key') or payload.pop('idempotency_key', None)
+    if idempotency_key:
+        # Keys are scoped to the user so they cannot collide across accounts
+        idempotency_key = f'{current_user.id}:{idempotency_key}'[:100]
+    try:
+        signature(spec.func).bind(None, **payload)
+    except TypeError as e:
+        return jsonify({'success': False, 'message': f'Invalid job arguments: {e}'}), 400
+    db = get_db()
+    try:
+        job = jobs.enqueue(db, name, payload, idempotency_key=idempotency_key, created_by_id=current_user.id)
+    except jobs.JobBackendError as e:
+        return jsonify({'success': False, 'message': str(e)}), 409
+    response = jsonify({'success': True, 'data': jobs.job_status(job)})
+    response.headers['Location'] = url_for('api.get_job', job_id=job.id)
+    return response, 202
+
+@api_bp.route('/jobs/<job_id>')
+@login_required
+def get_job(job_id):
+    """Status of a background job, for its creator or an admin"""
+    db = get_db()
+    job = db.get(BackgroundJob, job_id)
+    if not job or (job.created_by_id != current_user.id and current_user.role != 'admin'):
+        return jsonify({'success': False, 'message': 'Job not found'}), 404
+    return jsonify({'success': True, 'data': jobs.job_status(job)})
+
+@api_bp.route('/webhooks/tracking/<carrier>', methods=['POST'])
+def tracking_webhook(carrier):
+    """
+    Receive a batch of tracking events pushed by a carrier.
+
+    The raw body must be signed with TRACKING_WEBHOOK_SECRET in the
+    X-FusionFlow-Signature header ('sha256=<hex>'). Events are stored and
+    acknowledged with 202; the webhook processor applies them to shipments
+    in the background. If some could not be stored the response is 503, and
+    the carrier can resend the batch: stored events are skipped as duplicates.
+    """
+    if not tracking_webhooks.verify_signature(request.get_data(), request.headers.get('X-FusionFlow-Signature')):
+        return jsonify({'success': False, 'message': 'Invalid signature'}), 401
+    payload = request.get_json(silent=True)
+    if payload is None:
+        return jsonify({'success': False, 'message': 'Expected a JSON body'}), 400
+    db = get_db()
+    try:
+        result = tracking_webhooks.ingest(db, carrier[:100], payload)
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    if result.failed:
+        return jsonify({'success': False, 'message': 'Some events could not be stored', 'data': result._asdict()}), 503
+    return jsonify({'success': True, 'data': result._asdict()}), 202
+
+@api_bp.route('/events')
+@login_required
+def event_stream():
+    """
+    Server-Sent Events stream of the user's notifications and the status
+    changes of the shipments given as repeated ?shipment= ids.
+
+    The stream holds no database session; it waits on an in-process queue
+    and sends a comment every EVENT_KEEPALIVE seconds so proxies keep the
+    connection open. It ends after EVENT_STREAM_MAX_AGE seconds and the
+    browser reconnects, which bounds how long a dead client can hold a worker.
+    """
+    shipment_ids = request.args.getlist('shipment', type=int)[:EVENT_MAX_SHIPMENTS]
+    channels = [events.user_channel(current_user.id)] + [events.shipment_channel(i) for i in shipment_ids]
+
+    def stream():
+        subscription = events.subscribe(channels)
+        try:
+            yield f'retry: {EVENT_RETRY_MS}\n\n'
+            deadline = time.monotonic() + EVENT_STREAM_MAX_AGE
+            while time.monotonic() < deadline:
+                event = subscription.get(timeout=EVENT_KEEPALIVE)
+                dropped = subscription.take_overflowed()
+                if dropped:
+                    # Events were dropped; ask the client to refetch those channels' state
+                    yield f'event: resync\ndata: {json.dumps({"channels": sorted(dropped)})}\n\n'
+                if event is None:
+                    yield ': keepalive\n\n'
+                else:
+                    yield events.format_sse(event)
+        finally:
+            subscription.close()
+
+    return Response(stream(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no',
+    })
@@ -1,17 +1,14 @@
 from flask import Blueprint, render_template, request, redirect, url_for, flash, session
 from flask_login import login_user, logout_user, login_required, current_user
-from backend.database import SessionLocal
+from fusionflow_app.db import get_db
 from backend.models import User
 from backend.auth import verify_password
-from backend.models.audit_log import AuditLog
+from backend.services import audit
+from fusionflow_app.user_cache import invalidate_user
 from datetime import datetime
 
 auth_bp = Blueprint('auth', __name__)
 
-def get_db():
-    """Get database session"""
-    return SessionLocal()
-
 @auth_bp.route('/login', methods=['GET', 'POST'])
 def login():
     """User login page"""
@@ -43,6 +40,7 @@ def login():
                 # Update last login
                 user.last_login = datetime.utcnow()
                 db.commit()
+                invalidate_user(user.id)
                 
                 # Redirect to next page or dashboard
                 next_page = request.args.get('next')
@@ -51,24 +49,21 @@ def login():
                 return redirect(url_for('dashboard.index'))
             else:
                 # Log failed login attempt
-                log = AuditLog(
-                    user_id=user.id if user else None,
-                    username=username,
-                    user_role=user.role if user else None,
-                    action='LOGIN_FAILED',
-                    entity_type='User',
+                audit.record(
+                    'LOGIN_FAILED', 'User',
                     entity_id=user.id if user else None,
                     description=f'Failed login attempt for username: {username} from IP: {request.remote_addr}',
                     level='warning',
-                    timestamp=datetime.utcnow()
+                    user_id=user.id if user else None,
+                    username=username,
+                    user_role=user.role if user else None,
+                    ip_address=request.remote_addr,
+                    user_agent=(request.user_agent.string or '')[:500] or None,
+                    system_source='Web UI'
                 )
-                db.add(log)
-                db.commit()
                 flash('Invalid username or password.', 'danger')
         except Exception as e:
             flash('An error occurred during login. Please try again.', 'danger')
-        finally:
-            db.close()
     
     return render_template('auth/login_simple.html')
 
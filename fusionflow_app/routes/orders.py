@@ -1,222 +1,279 @@
 from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify
 from flask_login import login_required, current_user
-from backend.database import SessionLocal
+from fusionflow_app.db import get_db
 from backend.models import Order, Project, Supplier, User
+from backend.services.dashboard_snapshot import order_contribution, apply_snapshot_delta, invalidate_snapshot
+from backend.services.pagination import paginate_keyset, cached_count
+from backend.services.search import search_filter
+from backend.services.reference_data import get_options
+from backend.services.numbering import next_code
+from backend.services.order_import import import_orders, ImportFormatError, REQUIRED_COLUMNS, OPTIONAL_COLUMNS
+from backend.services.loader_profiles import with_profile
+from backend.services.export import ORDER_EXPORT_COLUMNS, EXPORT_FORMATS
+from fusionflow_app.exports import export_response
 from sqlalchemy import desc, asc, func
 from datetime import datetime
 
 orders_bp = Blueprint('orders', __name__, url_prefix='/orders')
 
-def get_db():
-    """Get database session"""
-    return SessionLocal()
+# Non-nullable columns the order list can be sorted (and keyset-paginated) by
+ORDER_SORT_COLUMNS = {
+    'created_at': Order.created_at,
+    'order_date': Order.order_date,
+    'requested_delivery_date': Order.requested_delivery_date,
+    'order_number': Order.order_number,
+    'total_amount': Order.total_amount,
+    'id': Order.id,
+}
+
+def filter_orders(db, query, args):
+    """Apply the order list filters in args (status, priority, project, supplier, search)"""
+    status_filter = args.get('status', 'all')
+    priority_filter = args.get('priority', 'all')
+    project_filter = args.get('project', 'all')
+    supplier_filter = args.get('supplier', 'all')
+    search = args.get('search', '')
+    if status_filter != 'all':
+        query = query.filter(Order.status == status_filter)
+    if priority_filter != 'all':
+        query = query.filter(Order.priority == priority_filter)
+    if project_filter != 'all':
+        query = query.filter(Order.project_id == int(project_filter))
+    if supplier_filter != 'all':
+        query = query.filter(Order.supplier_id == int(supplier_filter))
+    if search:
+        query = query.filter(search_filter(db, Order, search))
+    return query
 
 @orders_bp.route('/')
 @login_required
 def list_orders():
     """List all orders with filtering and pagination"""
     db = get_db()
-    try:
-        # Get filter parameters
-        status_filter = request.args.get('status', 'all')
-        priority_filter = request.args.get('priority', 'all')
-        project_filter = request.args.get('project', 'all')
-        supplier_filter = request.args.get('supplier', 'all')
-        search = request.args.get('search', '')
-        sort_by = request.args.get('sort', 'created_at')
-        sort_order = request.args.get('order', 'desc')
-        page = int(request.args.get('page', 1))
-        per_page = int(request.args.get('per_page', 25))
-        
-        # Build query
-        query = db.query(Order)
-        
-        # Apply filters
-        if status_filter != 'all':
-            query = query.filter(Order.status == status_filter)
-        if priority_filter != 'all':
-            query = query.filter(Order.priority == priority_filter)
-        if project_filter != 'all':
-            query = query.filter(Order.project_id == int(project_filter))
-        if supplier_filter != 'all':
-            query = query.filter(Order.supplier_id == int(supplier_filter))
-        if search:
-            query = query.filter(
-                (Order.order_number.contains(search)) |
-                (Order.description.contains(search)) |
-                (Order.po_number.contains(search))
-            )
-        
-        # Apply sorting
-        if hasattr(Order, sort_by):
-            if sort_order == 'desc':
-                query = query.order_by(desc(getattr(Order, sort_by)))
-            else:
-                query = query.order_by(asc(getattr(Order, sort_by)))
-        
-        # Get total count for pagination
-        total = query.count()
-        
-        # Apply pagination
-        orders = query.offset((page - 1) * per_page).limit(per_page).all()
-        
-        # Get filter options
-        statuses = db.query(Order.status).distinct().filter(Order.status.isnot(None)).all()
-        priorities = db.query(Order.priority).distinct().filter(Order.priority.isnot(None)).all()
-        projects = db.query(Project.id, Project.name).all()
-        suppliers = db.query(Supplier.id, Supplier.name).all()
-        
-        # Calculate pagination info
-        total_pages = (total + per_page - 1) // per_page
-        has_prev = page > 1
-        has_next = page < total_pages
-        
-        return render_template('orders/list.html',
-                             orders=orders,
-                             total=total,
-                             page=page,
-                             per_page=per_page,
-                             total_pages=total_pages,
-                             has_prev=has_prev,
-                             has_next=has_next,
-                             statuses=[s[0] for s in statuses],
-                             priorities=[p[0] for p in priorities],
-                             projects=projects,
-                             suppliers=suppliers,
-                             current_filters={
-                                 'status': status_filter,
-                                 'priority': priority_filter,
-                                 'project': project_filter,
-                                 'supplier': supplier_filter,
-                                 'search': search,
-                                 'sort': sort_by,
-                                 'order': sort_order
-                             })
-    finally:
-        db.close()
+    # Get filter parameters
+    status_filter = request.args.get('status', 'all')
+    priority_filter = request.args.get('priority', 'all')
+    project_filter = request.args.get('project', 'all')
+    supplier_filter = request.args.get('supplier', 'all')
+    search = request.args.get('search', '')
+    sort_by = request.args.get('sort', 'created_at')
+    sort_order = request.args.get('order', 'desc')
+    cursor = request.args.get('cursor')
+    per_page = min(int(request.args.get('per_page', 25)), 100)
+    
+    # Build filtered query
+    query = filter_orders(db, with_profile(db.query(Order), Order, 'list'), request.args)
+    
+    # Get total count for pagination
+    total = cached_count(query)
+    
+    # Apply sorting and keyset pagination
+    if sort_by not in ORDER_SORT_COLUMNS:
+        sort_by = 'created_at'
+    page = paginate_keyset(query, ORDER_SORT_COLUMNS[sort_by], Order.id,
+                           cursor=cursor, per_page=per_page,
+                           descending=sort_order == 'desc')
+    
+    # Get filter options
+    statuses = get_options(db, 'order_statuses')
+    priorities = get_options(db, 'order_priorities')
+    projects = get_options(db, 'projects')
+    suppliers = get_options(db, 'suppliers')
+    
+    return render_template('orders/list.html',
+                         orders=page.items,
+                         total=total,
+                         per_page=per_page,
+                         has_prev=page.has_prev,
+                         has_next=page.has_next,
+                         prev_cursor=page.prev_cursor,
+                         next_cursor=page.next_cursor,
+                         statuses=statuses,
+                         priorities=priorities,
+                         projects=projects,
+                         suppliers=suppliers,
+                         current_filters={
+                             'status': status_filter,
+                             'priority': priority_filter,
+                             'project': project_filter,
+                             'supplier': supplier_filter,
+                             'search': search,
+                             'sort': sort_by,
+                             'order': sort_order
+                         })
+
+@orders_bp.route('/export')
+@login_required
+def export_orders():
+    """Download the filtered order list as CSV or XLSX"""
+    export_format = request.args.get('format', 'csv')
+    if export_format not in EXPORT_FORMATS:
+        flash('Unsupported export format.', 'danger')
+        return redirect(url_for('orders.list_orders'))
+    db = get_db()
+    query = filter_orders(db, with_profile(db.query(Order), Order, 'export'), request.args)
+    query = query.order_by(desc(Order.created_at), desc(Order.id))
+    # Session is closed by the request teardown after the last chunk
+    return export_response(query, ORDER_EXPORT_COLUMNS, export_format, 'orders')
 
 @orders_bp.route('/<int:order_id>')
 @login_required
 def view_order(order_id):
     """View detailed order information"""
     db = get_db()
-    try:
-        order = db.query(Order).filter(Order.id == order_id).first()
-        if not order:
-            flash('Order not found.', 'danger')
-            return redirect(url_for('orders.list_orders'))
-        
-        return render_template('orders/detail.html', order=order)
-    finally:
-        db.close()
+    order = with_profile(db.query(Order), Order, 'detail').filter(Order.id == order_id).first()
+    if not order:
+        flash('Order not found.', 'danger')
+        return redirect(url_for('orders.list_orders'))
+    
+    return render_template('orders/detail.html', order=order)
 
 @orders_bp.route('/create', methods=['GET', 'POST'])
 @login_required
 def create_order():
     """Create a new order"""
     db = get_db()
-    try:
-        if request.method == 'POST':
-            # Get form data
-            project_id = request.form.get('project_id')
-            supplier_id = request.form.get('supplier_id')
-            description = request.form.get('description')
-            quantity = request.form.get('quantity')
-            unit_price = request.form.get('unit_price')
-            requested_delivery_date = request.form.get('requested_delivery_date')
-            priority = request.form.get('priority', 'Normal')
-            
-            # Validate required fields
-            if not all([project_id, supplier_id, description, quantity, unit_price, requested_delivery_date]):
-                flash('Please fill in all required fields.', 'danger')
-                # Use the same filters as the GET path
-                projects = db.query(Project).filter(Project.status == 'Active').all()
-                suppliers = db.query(Supplier).filter(Supplier.approval_status == 'Approved').all()
-                return render_template('orders/create.html', 
-                                     projects=projects,
-                                     suppliers=suppliers)
-            
-            try:
-                # Generate order number
-                last_order = db.query(Order).order_by(desc(Order.id)).first()
-                order_number = f"ORD-{(last_order.id + 1 if last_order else 1):06d}"
-                
-                # Calculate total amount
-                total_amount = float(quantity) * float(unit_price)
-                
-                # Create new order
-                new_order = Order(
-                    order_number=order_number,
-                    project_id=int(project_id),
-                    supplier_id=int(supplier_id),
-                    created_by_id=current_user.id,
-                    description=description,
-                    quantity=int(quantity),
-                    unit_price=float(unit_price),
-                    total_amount=total_amount,
-                    requested_delivery_date=datetime.strptime(requested_delivery_date, '%Y-%m-%d'),
-                    priority=priority,
-                    status='Draft'
-                )
-                
-                db.add(new_order)
-                db.commit()
-                
-                flash(f'Order {order_number} created successfully!', 'success')
-                return redirect(url_for('orders.view_order', order_id=new_order.id))
-                
-            except ValueError as e:
-                flash('Please check your input values.', 'danger')
-            except Exception as e:
-                flash('An error occurred while creating the order.', 'danger')
-                db.rollback()
+    if request.method == 'POST':
+        # Get form data
+        project_id = request.form.get('project_id')
+        supplier_id = request.form.get('supplier_id')
+        description = request.form.get('description')
+        quantity = request.form.get('quantity')
+        unit_price = request.form.get('unit_price')
+        requested_delivery_date = request.form.get('requested_delivery_date')
+        priority = request.form.get('priority', 'Normal')
         
-        # GET request - show form
-        projects = db.query(Project).filter(Project.status == 'Active').all()
-        suppliers = db.query(Supplier).filter(Supplier.approval_status == 'Approved').all()
+        # Validate required fields
+        if not all([project_id, supplier_id, description, quantity, unit_price, requested_delivery_date]):
+            flash('Please fill in all required fields.', 'danger')
+            # Use the same filters as the GET path
+            projects = get_options(db, 'active_projects')
+            suppliers = get_options(db, 'approved_suppliers')
+            return render_template('orders/create.html', 
+                                 projects=projects,
+                                 suppliers=suppliers)
         
-        return render_template('orders/create.html', 
-                             projects=projects, 
-                             suppliers=suppliers)
-    finally:
-        db.close()
+        try:
+            # Allocate order number
+            order_number = next_code('orders')
+            
+            # Calculate total amount
+            total_amount = float(quantity) * float(unit_price)
+            
+            # Create new order
+            new_order = Order(
+                order_number=order_number,
+                project_id=int(project_id),
+                supplier_id=int(supplier_id),
+                created_by_id=current_user.id,
+                description=description,
+                quantity=int(quantity),
+                unit_price=float(unit_price),
+                total_amount=total_amount,
+                requested_delivery_date=datetime.strptime(requested_delivery_date, '%Y-%m-%d'),
+                priority=priority,
+                status='Draft'
+            )
+            
+            db.add(new_order)
+            apply_snapshot_delta(db, after=order_contribution(new_order))
+            db.commit()
+            
+            flash(f'Order {order_number} created successfully!', 'success')
+            return redirect(url_for('orders.view_order', order_id=new_order.id))
+            
+        except ValueError as e:
+            flash('Please check your input values.', 'danger')
+        except Exception as e:
+            flash('An error occurred while creating the order.', 'danger')
+            db.rollback()
+    
+    # GET request - show form
+    projects = get_options(db, 'active_projects')
+    suppliers = get_options(db, 'approved_suppliers')
+    
+    return render_template('orders/create.html', 
+                         projects=projects, 
+                         suppliers=suppliers)
+
+@orders_bp.route('/import', methods=['GET', 'POST'])
+@login_required
+def import_orders_view():
+    """Bulk import orders from a CSV or Excel file"""
+    wants_json = request.args.get('format') == 'json'
+    if request.method == 'GET':
+        return render_template('orders/import.html', result=None,
+                               required_columns=REQUIRED_COLUMNS, optional_columns=OPTIONAL_COLUMNS)
+
+    upload = request.files.get('file')
+    if not upload or not upload.filename:
+        if wants_json:
+            return jsonify({'success': False, 'message': 'No file uploaded'}), 400
+        flash('Please choose a CSV or Excel file to import.', 'danger')
+        return redirect(url_for('orders.import_orders_view'))
+
+    db = get_db()
+    try:
+        result = import_orders(db, upload.stream, upload.filename, current_user.id,
+                               dry_run=bool(request.form.get('dry_run')))
+    except ImportFormatError as e:
+        if wants_json:
+            return jsonify({'success': False, 'message': str(e)}), 400
+        flash(str(e), 'danger')
+        return redirect(url_for('orders.import_orders_view'))
+
+    if wants_json:
+        return jsonify({'success': True, 'data': {
+            'total_rows': result.total_rows,
+            'imported': result.imported,
+            'error_count': result.error_count,
+            'dry_run': result.dry_run,
+            'errors': [{'row': row, 'message': message} for row, message in result.errors]
+        }})
+
+    if result.imported:
+        verb = 'validated' if result.dry_run else 'imported'
+        flash(f'{result.imported} orders {verb} successfully.', 'success')
+    if result.error_count:
+        flash(f'{result.error_count} rows could not be imported.', 'warning')
+    return render_template('orders/import.html', result=result,
+                           required_columns=REQUIRED_COLUMNS, optional_columns=OPTIONAL_COLUMNS)
 
 @orders_bp.route('/<int:order_id>/edit', methods=['GET', 'POST'])
 @login_required
 def edit_order(order_id):
     """Edit an existing order"""
     db = get_db()
-    try:
-        order = db.query(Order).filter(Order.id == order_id).first()
-        if not order:
-            flash('Order not found.', 'danger')
-            return redirect(url_for('orders.list_orders'))
+    order = db.query(Order).filter(Order.id == order_id).first()
+    if not order:
+        flash('Order not found.', 'danger')
+        return redirect(url_for('orders.list_orders'))
+    
+    if request.method == 'POST':
+        before = order_contribution(order)
+        # Update order fields
+        order.description = request.form.get('description', order.description)
+        order.quantity = int(request.form.get('quantity', order.quantity))
+        order.unit_price = float(request.form.get('unit_price', order.unit_price))
+        order.total_amount = order.quantity * order.unit_price
+        order.priority = request.form.get('priority', order.priority)
+        order.status = request.form.get('status', order.status)
         
-        if request.method == 'POST':
-            # Update order fields
-            order.description = request.form.get('description', order.description)
-            order.quantity = int(request.form.get('quantity', order.quantity))
-            order.unit_price = float(request.form.get('unit_price', order.unit_price))
-            order.total_amount = order.quantity * order.unit_price
-            order.priority = request.form.get('priority', order.priority)
-            order.status = request.form.get('status', order.status)
-            
-            if request.form.get('requested_delivery_date'):
-                order.requested_delivery_date = datetime.strptime(
-                    request.form.get('requested_delivery_date'), '%Y-%m-%d'
-                )
-            
-            try:
-                db.commit()
-                flash('Order updated successfully!', 'success')
-                return redirect(url_for('orders.view_order', order_id=order.id))
-            except Exception as e:
-                flash('An error occurred while updating the order.', 'danger')
-                db.rollback()
+        if request.form.get('requested_delivery_date'):
+            order.requested_delivery_date = datetime.strptime(
+                request.form.get('requested_delivery_date'), '%Y-%m-%d'
+            )
         
-        return render_template('orders/edit.html', order=order)
-    finally:
-        db.close()
+        try:
+            apply_snapshot_delta(db, before, order_contribution(order))
+            db.commit()
+            flash('Order updated successfully!', 'success')
+            return redirect(url_for('orders.view_order', order_id=order.id))
+        except Exception as e:
+            flash('An error occurred while updating the order.', 'danger')
+            db.rollback()
+    
+    return render_template('orders/edit.html', order=order)
 
 @orders_bp.route('/<int:order_id>/status', methods=['POST'])
 @login_required
@@ -230,19 +287,19 @@ def update_status(order_id):
         
         new_status = request.json.get('status')
         if new_status:
+            before = order_contribution(order)
             order.previous_status = order.status
             order.status = new_status
             order.status_changed_at = datetime.utcnow()
             order.status_changed_by = current_user.username
             
+            apply_snapshot_delta(db, before, order_contribution(order))
             db.commit()
             return jsonify({'success': True, 'message': 'Status updated successfully'})
         
         return jsonify({'success': False, 'message': 'Invalid status'})
     except Exception as e:
         return jsonify({'success': False, 'message': str(e)})
-    finally:
-        db.close()
 
 @orders_bp.route('/<int:order_id>/delete', methods=['POST', 'GET'])
 @login_required
@@ -257,12 +314,11 @@ def delete_order(order_id):
         if not confirm:
             return render_template('orders/delete_confirm.html', order=order)
         db.delete(order)
+        invalidate_snapshot(db)
         db.commit()
         flash('Order deleted successfully.', 'success')
         return redirect(url_for('orders.list_orders'))
     except Exception as e:
         db.rollback()
         flash('An error occurred while deleting the order.', 'danger')
-        return redirect(url_for('orders.view_order', order_id=order_id))
-    finally:
-        db.close()
\ No newline at end of file
+        return redirect(url_for('orders.view_order', order_id=order_id))
\ No newline at end of file
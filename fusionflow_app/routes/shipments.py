@@ -1,167 +1,169 @@
 from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify
 from flask_login import login_required, current_user
-from backend.database import SessionLocal
+from fusionflow_app.db import get_db
 from backend.models import Shipment, Order, ShipmentStatusHistory
+from backend.services.dashboard_snapshot import shipment_contribution, apply_snapshot_delta, invalidate_snapshot
+from backend.services.pagination import paginate_keyset, cached_count
+from backend.services.search import search_filter
+from backend.services.reference_data import get_options
+from backend.services.loader_profiles import with_profile
+from backend.services.shipment_history import history_page, archived_history
+from backend.services.versions import shipment_history_version
+from backend.services.export import SHIPMENT_EXPORT_COLUMNS, EXPORT_FORMATS
+from fusionflow_app.exports import export_response
+from fusionflow_app.conditional import conditional_json
 from sqlalchemy import desc, asc
 from datetime import datetime
 
 shipments_bp = Blueprint('shipments', __name__, url_prefix='/shipments')
 
-def get_db():
-    """Get database session"""
-    return SessionLocal()
+def filter_shipments(db, query, args):
+    """Apply the shipment list filters in args (status, carrier, search)"""
+    status_filter = args.get('status', 'all')
+    carrier_filter = args.get('carrier', 'all')
+    search = args.get('search', '')
+    if status_filter != 'all':
+        query = query.filter(Shipment.current_status == status_filter)
+    if carrier_filter != 'all':
+        query = query.filter(Shipment.carrier == carrier_filter)
+    if search:
+        query = query.filter(search_filter(db, Shipment, search))
+    return query
 
 @shipments_bp.route('/')
 @login_required
 def list_shipments():
     """List all shipments with filtering"""
     db = get_db()
-    try:
-        # Get filter parameters
-        status_filter = request.args.get('status', 'all')
-        carrier_filter = request.args.get('carrier', 'all')
-        search = request.args.get('search', '')
-        page = int(request.args.get('page', 1))
-        per_page = int(request.args.get('per_page', 25))
-        
-        # Build query
-        query = db.query(Shipment)
-        
-        # Apply filters
-        if status_filter != 'all':
-            query = query.filter(Shipment.current_status == status_filter)
-        if carrier_filter != 'all':
-            query = query.filter(Shipment.carrier == carrier_filter)
-        if search:
-            query = query.filter(
-                (Shipment.tracking_number.contains(search)) |
-                (Shipment.carrier.contains(search))
-            )
-        
-        # Order by latest first
-        query = query.order_by(desc(Shipment.created_at))
-        
-        # Get total count for pagination
-        total = query.count()
-        
-        # Apply pagination
-        shipments = query.offset((page - 1) * per_page).limit(per_page).all()
-        
-        # Get filter options
-        statuses = db.query(Shipment.current_status).distinct().filter(
-            Shipment.current_status.isnot(None)
-        ).all()
-        carriers = db.query(Shipment.carrier).distinct().filter(
-            Shipment.carrier.isnot(None)
-        ).all()
-        
-        # Calculate pagination info
-        total_pages = (total + per_page - 1) // per_page
-        has_prev = page > 1
-        has_next = page < total_pages
-        
-        return render_template('shipments/list.html',
-                             shipments=shipments,
-                             total=total,
-                             page=page,
-                             per_page=per_page,
-                             total_pages=total_pages,
-                             has_prev=has_prev,
-                             has_next=has_next,
-                             statuses=[s[0] for s in statuses],
-                             carriers=[c[0] for c in carriers],
-                             current_filters={
-                                 'status': status_filter,
-                                 'carrier': carrier_filter,
-                                 'search': search
-                             })
-    finally:
-        db.close()
+    # Get filter parameters
+    status_filter = request.args.get('status', 'all')
+    carrier_filter = request.args.get('carrier', 'all')
+    search = request.args.get('search', '')
+    cursor = request.args.get('cursor')
+    per_page = min(int(request.args.get('per_page', 25)), 100)
+    
+    # Build filtered query
+    query = filter_shipments(db, with_profile(db.query(Shipment), Shipment, 'list'), request.args)
+    
+    # Get total count for pagination
+    total = cached_count(query)
+    
+    # Order by latest first, keyset-paginated
+    page = paginate_keyset(query, Shipment.created_at, Shipment.id,
+                           cursor=cursor, per_page=per_page, descending=True)
+    
+    # Get filter options
+    statuses = get_options(db, 'shipment_statuses')
+    carriers = get_options(db, 'carriers')
+    
+    return render_template('shipments/list.html',
+                         shipments=page.items,
+                         total=total,
+                         per_page=per_page,
+                         has_prev=page.has_prev,
+                         has_next=page.has_next,
+                         prev_cursor=page.prev_cursor,
+                         next_cursor=page.next_cursor,
+                         statuses=statuses,
+                         carriers=carriers,
+                         current_filters={
+                             'status': status_filter,
+                             'carrier': carrier_filter,
+                             'search': search
+                         })
+
+@shipments_bp.route('/export')
+@login_required
+def export_shipments():
+    """Download the filtered shipment list as CSV or XLSX"""
+    export_format = request.args.get('format', 'csv')
+    if export_format not in EXPORT_FORMATS:
+        flash('Unsupported export format.', 'danger')
+        return redirect(url_for('shipments.list_shipments'))
+    db = get_db()
+    query = filter_shipments(db, with_profile(db.query(Shipment), Shipment, 'export'), request.args)
+    query = query.order_by(desc(Shipment.created_at), desc(Shipment.id))
+    # Session is closed by the request teardown after the last chunk
+    return export_response(query, SHIPMENT_EXPORT_COLUMNS, export_format, 'shipments')
 
 @shipments_bp.route('/<int:shipment_id>')
 @login_required
 def view_shipment(shipment_id):
     """View detailed shipment information"""
     db = get_db()
-    try:
-        shipment = db.query(Shipment).filter(Shipment.id == shipment_id).first()
-        if not shipment:
-            flash('Shipment not found.', 'danger')
-            return redirect(url_for('shipments.list_shipments'))
-        
-        # Get status history
-        status_history = db.query(ShipmentStatusHistory).filter(
-            ShipmentStatusHistory.shipment_id == shipment_id
-        ).order_by(desc(ShipmentStatusHistory.timestamp)).all()
-        
-        return render_template('shipments/detail.html', 
-                             shipment=shipment, 
-                             status_history=status_history)
-    finally:
-        db.close()
+    shipment = with_profile(db.query(Shipment), Shipment, 'detail').filter(Shipment.id == shipment_id).first()
+    if not shipment:
+        flash('Shipment not found.', 'danger')
+        return redirect(url_for('shipments.list_shipments'))
+    
+    # Latest page of the status history; current status is on the shipment row
+    history = history_page(db, shipment_id)
+    
+    return render_template('shipments/detail.html', 
+                         shipment=shipment, 
+                         status_history=history.items,
+                         stream_shipments=[shipment.id])
 
 @shipments_bp.route('/create', methods=['GET', 'POST'])
 @login_required
 def create_shipment():
     """Create a new shipment"""
     db = get_db()
-    try:
-        if request.method == 'POST':
-            # Get form data
-            order_id = request.form.get('order_id')
-            tracking_number = request.form.get('tracking_number')
-            carrier = request.form.get('carrier')
-            service_type = request.form.get('service_type')
-            origin_address = request.form.get('origin_address')
-            destination_address = request.form.get('destination_address')
-            
-            # Validate required fields
-            if not all([order_id, tracking_number, carrier, origin_address, destination_address]):
-                flash('Please fill in all required fields.', 'danger')
-                return render_template('shipments/create.html',
-                                     orders=db.query(Order).filter(Order.status.in_(['Approved', 'Confirmed'])).all())
-            
-            try:
-                # Create new shipment
-                new_shipment = Shipment(
-                    order_id=int(order_id),
-                    tracking_number=tracking_number,
-                    carrier=carrier,
-                    service_type=service_type,
-                    origin_address=origin_address,
-                    destination_address=destination_address,
-                    current_status='Label Created'
-                )
-                
-                db.add(new_shipment)
-                db.commit()
-                
-                # Create initial status history entry
-                status_entry = ShipmentStatusHistory(
-                    shipment_id=new_shipment.id,
-                    status='Label Created',
-                    timestamp=datetime.utcnow(),
-                    description='Shipment created and label generated',
-                    update_source='Manual',
-                    updated_by=current_user.username
-                )
-                
-                db.add(status_entry)
-                db.commit()
-                
-                flash(f'Shipment {tracking_number} created successfully!', 'success')
-                return redirect(url_for('shipments.view_shipment', shipment_id=new_shipment.id))
-                
-            except Exception as e:
-                flash('An error occurred while creating the shipment.', 'danger')
-                db.rollback()
+    if request.method == 'POST':
+        # Get form data
+        order_id = request.form.get('order_id')
+        tracking_number = request.form.get('tracking_number')
+        carrier = request.form.get('carrier')
+        service_type = request.form.get('service_type')
+        origin_address = request.form.get('origin_address')
+        destination_address = request.form.get('destination_address')
         
-        # GET request - show form
-        orders = db.query(Order).filter(Order.status.in_(['Approved', 'Confirmed'])).all()
+        # Validate required fields
+        if not all([order_id, tracking_number, carrier, origin_address, destination_address]):
+            flash('Please fill in all required fields.', 'danger')
+            return render_template('shipments/create.html',
+                                 orders=db.query(Order).filter(Order.status.in_(['Approved', 'Confirmed'])).all())
         
-        return render_template('shipments/create.html', orders=orders)
-    finally:
-        db.close()
+        try:
+            # Create new shipment
+            new_shipment = Shipment(
+                order_id=int(order_id),
+                tracking_number=tracking_number,
+                carrier=carrier,
+                service_type=service_type,
+                origin_address=origin_address,
+                destination_address=destination_address,
+                current_status='Label Created'
+            )
+            
+            db.add(new_shipment)
+            apply_snapshot_delta(db, after=shipment_contribution(new_shipment))
+            db.commit()
+            
+            # Create initial status history entry
+            status_entry = ShipmentStatusHistory(
+                shipment_id=new_shipment.id,
+                status='Label Created',
+                timestamp=datetime.utcnow(),
+                description='Shipment created and label generated',
+                update_source='Manual',
+                updated_by=current_user.username
+            )
+            
+            db.add(status_entry)
+            db.commit()
+            
+            flash(f'Shipment {tracking_number} created successfully!', 'success')
+            return redirect(url_for('shipments.view_shipment', shipment_id=new_shipment.id))
+            
+        except Exception as e:
+            flash('An error occurred while creating the shipment.', 'danger')
+            db.rollback()
+    
+    # GET request - show form
+    orders = db.query(Order).filter(Order.status.in_(['Approved', 'Confirmed'])).all()
+    
+    return render_template('shipments/create.html', orders=orders)
 
 @shipments_bp.route('/<int:shipment_id>/track')
 @login_required
@@ -169,38 +171,47 @@ def track_shipment(shipment_id):
     """Track shipment status"""
     db = get_db()
     try:
-        shipment = db.query(Shipment).filter(Shipment.id == shipment_id).first()
-        if not shipment:
+        stamp = shipment_history_version(db, shipment_id)
+        if not stamp:
             return jsonify({'success': False, 'message': 'Shipment not found'})
         
-        # Get latest status history
-        status_history = db.query(ShipmentStatusHistory).filter(
-            ShipmentStatusHistory.shipment_id == shipment_id
-        ).order_by(desc(ShipmentStatusHistory.timestamp)).all()
-        
-        # Format response
-        tracking_data = {
-            'tracking_number': shipment.tracking_number,
-            'carrier': shipment.carrier,
-            'current_status': shipment.current_status,
-            'current_location': shipment.current_location,
-            'estimated_delivery': shipment.estimated_delivery_date.isoformat() if shipment.estimated_delivery_date else None,
-            'status_history': [
+        def build():
+            shipment = db.query(Shipment).filter(Shipment.id == shipment_id).first()
+            
+            # One page of the status history, newest first; ?cursor= continues it
+            history = history_page(db, shipment_id, cursor=request.args.get('cursor'))
+            status_history = [
                 {
                     'status': entry.status,
                     'location': entry.location,
                     'timestamp': entry.timestamp.isoformat(),
                     'description': entry.description
                 }
-                for entry in status_history
+                for entry in history.items
             ]
-        }
+            # Compacted older entries follow the last page when asked for
+            if request.args.get('archived') == '1' and not history.has_next:
+                status_history.extend(
+                    {key: event[key] for key in ('status', 'location', 'timestamp', 'description')}
+                    for event in reversed(archived_history(db, shipment_id))
+                )
+            
+            # Format response
+            tracking_data = {
+                'tracking_number': shipment.tracking_number,
+                'carrier': shipment.carrier,
+                'current_status': shipment.current_status,
+                'current_location': shipment.current_location,
+                'estimated_delivery': shipment.estimated_delivery_date.isoformat() if shipment.estimated_delivery_date else None,
+                'status_history': status_history,
+                'next_cursor': history.next_cursor
+            }
+            
+            return {'success': True, 'data': tracking_data}
         
-        return jsonify({'success': True, 'data': tracking_data})
+        return conditional_json(*stamp, build)
     except Exception as e:
         return jsonify({'success': False, 'message': str(e)})
-    finally:
-        db.close()
 
 @shipments_bp.route('/<int:shipment_id>/update-status', methods=['POST'])
 @login_required
@@ -220,6 +231,7 @@ def update_shipment_status(shipment_id):
             return jsonify({'success': False, 'message': 'Status is required'})
         
         # Update shipment
+        before = shipment_contribution(shipment)
         shipment.current_status = new_status
         shipment.current_location = location
         shipment.last_status_update = datetime.utcnow()
@@ -240,14 +252,13 @@ def update_shipment_status(shipment_id):
         )
         
         db.add(status_entry)
+        apply_snapshot_delta(db, before, shipment_contribution(shipment))
         db.commit()
         
         return jsonify({'success': True, 'message': 'Status updated successfully'})
         
     except Exception as e:
         return jsonify({'success': False, 'message': str(e)})
-    finally:
-        db.close()
 
 @shipments_bp.route('/<int:shipment_id>/delete', methods=['POST', 'GET'])
 @login_required
@@ -262,12 +273,11 @@ def delete_shipment(shipment_id):
         if not confirm:
             return render_template('shipments/delete_confirm.html', shipment=shipment)
         db.delete(shipment)
+        invalidate_snapshot(db)
         db.commit()
         flash('Shipment deleted successfully.', 'success')
         return redirect(url_for('shipments.list_shipments'))
     except Exception as e:
         db.rollback()
         flash('An error occurred while deleting the shipment.', 'danger')
-        return redirect(url_for('shipments.view_shipment', shipment_id=shipment_id))
-    finally:
-        db.close()
\ No newline at end of file
+        return redirect(url_for('shipments.view_shipment', shipment_id=shipment_id))
\ No newline at end of file
@@ -1,220 +1,209 @@
 from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify
 from flask_login import login_required, current_user
-from backend.database import SessionLocal
+from fusionflow_app.db import get_db
 from backend.models import Supplier, Order, SupplierPerformance
+from backend.services.dashboard_snapshot import supplier_contribution, apply_snapshot_delta, invalidate_snapshot
+from backend.services.pagination import paginate_keyset, cached_count
+from backend.services.search import search_filter
+from backend.services.reference_data import get_options
+from backend.services.numbering import next_code
+from backend.services.loader_profiles import with_profile
+from backend.services.export import SUPPLIER_EXPORT_COLUMNS, EXPORT_FORMATS
+from backend.services.supplier_metrics import get_supplier_metrics
+from fusionflow_app.exports import export_response
 from sqlalchemy import desc, func
 from datetime import datetime
 
 suppliers_bp = Blueprint('suppliers', __name__, url_prefix='/suppliers')
 
-def get_db():
-    """Get database session"""
-    return SessionLocal()
+def filter_suppliers(db, query, args):
+    """Apply the supplier list filters in args (status, country, local, search)"""
+    status_filter = args.get('status', 'all')
+    country_filter = args.get('country', 'all')
+    local_filter = args.get('local', 'all')
+    search = args.get('search', '')
+    if status_filter != 'all':
+        query = query.filter(Supplier.approval_status == status_filter)
+    if country_filter != 'all':
+        query = query.filter(Supplier.country == country_filter)
+    if local_filter == 'yes':
+        query = query.filter(Supplier.is_local_company == True)
+    elif local_filter == 'no':
+        query = query.filter(Supplier.is_local_company == False)
+    if search:
+        query = query.filter(search_filter(db, Supplier, search))
+    return query
 
 @suppliers_bp.route('/')
 @login_required
 def list_suppliers():
     """List all suppliers with filtering"""
     db = get_db()
-    try:
-        # Get filter parameters
-        status_filter = request.args.get('status', 'all')
-        country_filter = request.args.get('country', 'all')
-        local_filter = request.args.get('local', 'all')
-        search = request.args.get('search', '')
-        page = int(request.args.get('page', 1))
-        per_page = int(request.args.get('per_page', 25))
-        
-        # Build query
-        query = db.query(Supplier)
-        
-        # Apply filters
-        if status_filter != 'all':
-            query = query.filter(Supplier.approval_status == status_filter)
-        if country_filter != 'all':
-            query = query.filter(Supplier.country == country_filter)
-        if local_filter == 'yes':
-            query = query.filter(Supplier.is_local_company == True)
-        elif local_filter == 'no':
-            query = query.filter(Supplier.is_local_company == False)
-        if search:
-            query = query.filter(
-                (Supplier.name.contains(search)) |
-                (Supplier.supplier_code.contains(search)) |
-                (Supplier.primary_contact_person.contains(search))
-            )
-        
-        # Order by name
-        query = query.order_by(Supplier.name)
-        
-        # Get total count for pagination
-        total = query.count()
-        
-        # Apply pagination
-        suppliers = query.offset((page - 1) * per_page).limit(per_page).all()
-        
-        # Get filter options
-        statuses = db.query(Supplier.approval_status).distinct().filter(
-            Supplier.approval_status.isnot(None)
-        ).all()
-        countries = db.query(Supplier.country).distinct().filter(
-            Supplier.country.isnot(None)
-        ).all()
-        
-        # Calculate pagination info
-        total_pages = (total + per_page - 1) // per_page
-        has_prev = page > 1
-        has_next = page < total_pages
-        
-        return render_template('suppliers/list.html',
-                             suppliers=suppliers,
-                             total=total,
-                             page=page,
-                             per_page=per_page,
-                             total_pages=total_pages,
-                             has_prev=has_prev,
-                             has_next=has_next,
-                             statuses=[s[0] for s in statuses],
-                             countries=[c[0] for c in countries],
-                             current_filters={
-                                 'status': status_filter,
-                                 'country': country_filter,
-                                 'local': local_filter,
-                                 'search': search
-                             })
-    finally:
-        db.close()
+    # Get filter parameters
+    status_filter = request.args.get('status', 'all')
+    country_filter = request.args.get('country', 'all')
+    local_filter = request.args.get('local', 'all')
+    search = request.args.get('search', '')
+    cursor = request.args.get('cursor')
+    per_page = min(int(request.args.get('per_page', 25)), 100)
+    
+    # Build filtered query
+    query = filter_suppliers(db, db.query(Supplier), request.args)
+    
+    # Get total count for pagination
+    total = cached_count(query)
+    
+    # Order by name, keyset-paginated
+    page = paginate_keyset(query, Supplier.name, Supplier.id,
+                           cursor=cursor, per_page=per_page, descending=False)
+    
+    # Get filter options
+    statuses = get_options(db, 'supplier_statuses')
+    countries = get_options(db, 'supplier_countries')
+    
+    return render_template('suppliers/list.html',
+                         suppliers=page.items,
+                         total=total,
+                         per_page=per_page,
+                         has_prev=page.has_prev,
+                         has_next=page.has_next,
+                         prev_cursor=page.prev_cursor,
+                         next_cursor=page.next_cursor,
+                         statuses=statuses,
+                         countries=countries,
+                         current_filters={
+                             'status': status_filter,
+                             'country': country_filter,
+                             'local': local_filter,
+                             'search': search
+                         })
+
+@suppliers_bp.route('/export')
+@login_required
+def export_suppliers():
+    """Download the filtered supplier list as CSV or XLSX"""
+    export_format = request.args.get('format', 'csv')
+    if export_format not in EXPORT_FORMATS:
+        flash('Unsupported export format.', 'danger')
+        return redirect(url_for('suppliers.list_suppliers'))
+    db = get_db()
+    query = filter_suppliers(db, with_profile(db.query(Supplier), Supplier, 'export'), request.args)
+    query = query.order_by(Supplier.name, Supplier.id)
+    # Session is closed by the request teardown after the last chunk
+    return export_response(query, SUPPLIER_EXPORT_COLUMNS, export_format, 'suppliers')
 
 @suppliers_bp.route('/<int:supplier_id>')
 @login_required
 def view_supplier(supplier_id):
     """View detailed supplier information"""
     db = get_db()
-    try:
-        supplier = db.query(Supplier).filter(Supplier.id == supplier_id).first()
-        if not supplier:
-            flash('Supplier not found.', 'danger')
-            return redirect(url_for('suppliers.list_suppliers'))
-        
-        # Get supplier orders
-        orders = db.query(Order).filter(Order.supplier_id == supplier_id).all()
-        
-        # Calculate performance metrics
-        total_orders = len(orders)
-        completed_orders = len([o for o in orders if o.status == 'Delivered'])
-        total_value = sum(order.total_amount or 0 for order in orders)
-        
-        # On-time delivery calculation
-        delivered_orders = [o for o in orders if o.actual_delivery_date and o.requested_delivery_date]
-        on_time_orders = len([o for o in delivered_orders if o.actual_delivery_date <= o.requested_delivery_date])
-        on_time_rate = (on_time_orders / len(delivered_orders) * 100) if delivered_orders else 0
-        
-        return render_template('suppliers/detail.html',
-                             supplier=supplier,
-                             orders=orders[:10],  # Show recent 10 orders
-                             total_orders=total_orders,
-                             completed_orders=completed_orders,
-                             total_value=total_value,
-                             on_time_rate=round(on_time_rate, 1))
-    finally:
-        db.close()
+    supplier = db.query(Supplier).filter(Supplier.id == supplier_id).first()
+    if not supplier:
+        flash('Supplier not found.', 'danger')
+        return redirect(url_for('suppliers.list_suppliers'))
+    
+    # Recent orders for display; metrics are aggregated in SQL
+    orders = db.query(Order).filter(Order.supplier_id == supplier_id).order_by(desc(Order.order_date)).limit(10).all()
+    metrics = get_supplier_metrics(db, supplier_id)
+    
+    return render_template('suppliers/detail.html',
+                         supplier=supplier,
+                         orders=orders,
+                         total_orders=metrics.total_orders,
+                         completed_orders=metrics.completed_orders,
+                         total_value=metrics.total_value,
+                         on_time_rate=round(metrics.on_time_rate, 1))
 
 @suppliers_bp.route('/create', methods=['GET', 'POST'])
 @login_required
 def create_supplier():
     """Create a new supplier"""
     db = get_db()
-    try:
-        if request.method == 'POST':
-            # Get form data
-            name = request.form.get('name')
-            brands_supplied_raw = request.form.get('brands_supplied', '')
-            brands_supplied = [b.strip() for b in brands_supplied_raw.split(',') if b.strip()]
-            contacts_json = request.form.get('contacts_json', '[]')
-            import json
-            try:
-                contacts = json.loads(contacts_json)
-            except Exception:
-                contacts = []
-            country = request.form.get('country')
-            address_line1 = request.form.get('address_line1')
-            city = request.form.get('city')
-            is_local_company = bool(request.form.get('is_local_company'))
-            relationship_tag = request.form.get('relationship_tag')
-            if relationship_tag == 'Custom':
-                relationship_tag = request.form.get('custom_relationship_tag') or 'Custom'
-            # Validate required fields
-            if not all([name, country]) or not contacts:
-                flash('Please fill in all required fields and at least one contact.', 'danger')
-                return render_template('suppliers/create.html')
-            try:
-                # Generate supplier code
-                last_supplier = db.query(Supplier).order_by(desc(Supplier.id)).first()
-                supplier_code = f"SUP-{(last_supplier.id + 1 if last_supplier else 1):04d}"
-                # Create new supplier
-                new_supplier = Supplier(
-                    name=name,
-                    supplier_code=supplier_code,
-                    brands_supplied=brands_supplied,
-                    contacts=contacts,
-                    country=country,
-                    address_line1=address_line1,
-                    city=city,
-                    is_local_company=is_local_company,
-                    approval_status=request.form.get('approval_status', 'Pending'),
-                    created_by=current_user.username,
-                    relationship_tag=relationship_tag
-                )
-                db.add(new_supplier)
-                db.commit()
-                flash(f'Supplier {supplier_code} created successfully!', 'success')
-                return redirect(url_for('suppliers.view_supplier', supplier_id=new_supplier.id))
-            except Exception as e:
-                flash('An error occurred while creating the supplier.', 'danger')
-                db.rollback()
-        return render_template('suppliers/create.html')
-    finally:
-        db.close()
+    if request.method == 'POST':
+        # Get form data
+        name = request.form.get('name')
+        brands_supplied_raw = request.form.get('brands_supplied', '')
+        brands_supplied = [b.strip() for b in brands_supplied_raw.split(',') if b.strip()]
+        contacts_json = request.form.get('contacts_json', '[]')
+        import json
+        try:
+            contacts = json.loads(contacts_json)
+        except Exception:
+            contacts = []
+        country = request.form.get('country')
+        address_line1 = request.form.get('address_line1')
+        city = request.form.get('city')
+        is_local_company = bool(request.form.get('is_local_company'))
+        relationship_tag = request.form.get('relationship_tag')
+        if relationship_tag == 'Custom':
+            relationship_tag = request.form.get('custom_relationship_tag') or 'Custom'
+        # Validate required fields
+        if not all([name, country]) or not contacts:
+            flash('Please fill in all required fields and at least one contact.', 'danger')
+            return render_template('suppliers/create.html')
+        try:
+            # Allocate supplier code
+            supplier_code = next_code('suppliers')
+            # Create new supplier
+            new_supplier = Supplier(
+                name=name,
+                supplier_code=supplier_code,
+                brands_supplied=brands_supplied,
+                contacts=contacts,
+                country=country,
+                address_line1=address_line1,
+                city=city,
+                is_local_company=is_local_company,
+                approval_status=request.form.get('approval_status', 'Pending'),
+                created_by=current_user.username,
+                relationship_tag=relationship_tag
+            )
+            db.add(new_supplier)
+            apply_snapshot_delta(db, after=supplier_contribution(new_supplier))
+            db.commit()
+            flash(f'Supplier {supplier_code} created successfully!', 'success')
+            return redirect(url_for('suppliers.view_supplier', supplier_id=new_supplier.id))
+        except Exception as e:
+            flash('An error occurred while creating the supplier.', 'danger')
+            db.rollback()
+    return render_template('suppliers/create.html')
 
 @suppliers_bp.route('/<int:supplier_id>/edit', methods=['GET', 'POST'])
 @login_required
 def edit_supplier(supplier_id):
     """Edit an existing supplier"""
     db = get_db()
-    try:
-        supplier = db.query(Supplier).filter(Supplier.id == supplier_id).first()
-        if not supplier:
-            flash('Supplier not found.', 'danger')
-            return redirect(url_for('suppliers.list_suppliers'))
-        if request.method == 'POST':
-            supplier.name = request.form.get('name', supplier.name)
-            brands_supplied_raw = request.form.get('brands_supplied', '')
-            supplier.brands_supplied = [b.strip() for b in brands_supplied_raw.split(',') if b.strip()]
-            contacts_json = request.form.get('contacts_json', '[]')
-            import json
-            try:
-                supplier.contacts = json.loads(contacts_json)
-            except Exception:
-                pass
-            supplier.country = request.form.get('country', supplier.country)
-            supplier.address_line1 = request.form.get('address_line1', supplier.address_line1)
-            supplier.city = request.form.get('city', supplier.city)
-            supplier.is_local_company = bool(request.form.get('is_local_company'))
-            relationship_tag = request.form.get('relationship_tag')
-            if relationship_tag == 'Custom':
-                relationship_tag = request.form.get('custom_relationship_tag') or 'Custom'
-            supplier.relationship_tag = relationship_tag
-            supplier.approval_status = request.form.get('approval_status', supplier.approval_status)
-            try:
-                db.commit()
-                flash('Supplier updated successfully!', 'success')
-                return redirect(url_for('suppliers.view_supplier', supplier_id=supplier.id))
-            except Exception as e:
-                flash('An error occurred while updating the supplier.', 'danger')
-                db.rollback()
-        return render_template('suppliers/edit.html', supplier=supplier)
-    finally:
-        db.close()
+    supplier = db.query(Supplier).filter(Supplier.id == supplier_id).first()
+    if not supplier:
+        flash('Supplier not found.', 'danger')
+        return redirect(url_for('suppliers.list_suppliers'))
+    if request.method == 'POST':
+        supplier.name = request.form.get('name', supplier.name)
+        brands_supplied_raw = request.form.get('brands_supplied', '')
+        supplier.brands_supplied = [b.strip() for b in brands_supplied_raw.split(',') if b.strip()]
+        contacts_json = request.form.get('contacts_json', '[]')
+        import json
+        try:
+            supplier.contacts = json.loads(contacts_json)
+        except Exception:
+            pass
+        supplier.country = request.form.get('country', supplier.country)
+        supplier.address_line1 = request.form.get('address_line1', supplier.address_line1)
+        supplier.city = request.form.get('city', supplier.city)
+        supplier.is_local_company = bool(request.form.get('is_local_company'))
+        relationship_tag = request.form.get('relationship_tag')
+        if relationship_tag == 'Custom':
+            relationship_tag = request.form.get('custom_relationship_tag') or 'Custom'
+        supplier.relationship_tag = relationship_tag
+        supplier.approval_status = request.form.get('approval_status', supplier.approval_status)
+        try:
+            db.commit()
+            flash('Supplier updated successfully!', 'success')
+            return redirect(url_for('suppliers.view_supplier', supplier_id=supplier.id))
+        except Exception as e:
+            flash('An error occurred while updating the supplier.', 'danger')
+            db.rollback()
+    return render_template('suppliers/edit.html', supplier=supplier)
 
 @suppliers_bp.route('/<int:supplier_id>/approve', methods=['POST'])
 @login_required
@@ -245,31 +234,26 @@ def approve_supplier(supplier_id):
         
     except Exception as e:
         return jsonify({'success': False, 'message': str(e)})
-    finally:
-        db.close()
 
 @suppliers_bp.route('/performance')
 @login_required
 def supplier_performance():
     """View supplier performance dashboard"""
     db = get_db()
-    try:
-        # Get top performing suppliers
-        top_suppliers = db.query(Supplier).filter(
-            Supplier.approval_status == 'Approved'
-        ).order_by(desc(Supplier.overall_performance_score)).limit(10).all()
-        
-        # Get suppliers needing attention (low performance)
-        attention_suppliers = db.query(Supplier).filter(
-            Supplier.approval_status == 'Approved',
-            Supplier.overall_performance_score < 3.0
-        ).all()
-        
-        return render_template('suppliers/performance.html',
-                             top_suppliers=top_suppliers,
-                             attention_suppliers=attention_suppliers)
-    finally:
-        db.close()
+    # Get top performing suppliers
+    top_suppliers = db.query(Supplier).filter(
+        Supplier.approval_status == 'Approved'
+    ).order_by(desc(Supplier.overall_performance_score)).limit(10).all()
+    
+    # Get suppliers needing attention (low performance)
+    attention_suppliers = db.query(Supplier).filter(
+        Supplier.approval_status == 'Approved',
+        Supplier.overall_performance_score < 3.0
+    ).all()
+    
+    return render_template('suppliers/performance.html',
+                         top_suppliers=top_suppliers,
+                         attention_suppliers=attention_suppliers)
 
 @suppliers_bp.route('/<int:supplier_id>/delete', methods=['POST', 'GET'])
 @login_required
@@ -286,12 +270,11 @@ def delete_supplier(supplier_id):
             # Show warning page
             return render_template('suppliers/delete_confirm.html', supplier=supplier, order_count=len(supplier.orders))
         db.delete(supplier)
+        invalidate_snapshot(db)
         db.commit()
         flash('Supplier and all associated orders deleted successfully.' if has_orders else 'Supplier deleted successfully.', 'success')
         return redirect(url_for('suppliers.list_suppliers'))
     except Exception as e:
         db.rollback()
         flash('An error occurred while deleting the supplier.', 'danger')
-        return redirect(url_for('suppliers.edit_supplier', supplier_id=supplier_id))
-    finally:
-        db.close()
\ No newline at end of file
+        return redirect(url_for('suppliers.edit_supplier', supplier_id=supplier_id))
\ No newline at end of file
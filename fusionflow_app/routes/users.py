@@ -1,16 +1,21 @@
 from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify
 from flask_login import login_required, current_user
-from backend.database import SessionLocal
+from fusionflow_app.db import get_db
 from backend.models import User, Project, Order, Shipment
-from backend.models.notifications import Notification
-from datetime import datetime
+from datetime import datetime, timedelta
 from sqlalchemy import desc
 from backend.models.audit_log import AuditLog
+from fusionflow_app.user_cache import invalidate_user
+from fusionflow_app.exports import export_response
+from backend.services.export import AUDIT_LOG_EXPORT_COLUMNS, EXPORT_FORMATS
+from backend.services.loader_profiles import with_profile
+from backend.services.pagination import paginate_keyset, encode_cursor, decode_cursor
+from backend.services.audit_archive import archive_end, query_archive
+from backend.services import jobs, notifications
 
 users_bp = Blueprint('users', __name__, url_prefix='/users')
 
-def get_db():
-    return SessionLocal()
+AUDIT_LOG_LEVELS = ['info', 'warning', 'critical']
 
 def admin_required(f):
     from functools import wraps
@@ -40,70 +45,62 @@ def list_users():
         flash('Access denied.', 'danger')
         return redirect(url_for('dashboard.index'))
     db = get_db()
-    try:
-        users = db.query(User).filter(User.is_active == True).order_by(User.full_name).all()
-        return render_template('users/list.html', users=users)
-    finally:
-        db.close()
+    users = db.query(User).filter(User.is_active == True).order_by(User.full_name).all()
+    return render_template('users/list.html', users=users)
 
 @users_bp.route('/add', methods=['GET', 'POST'])
 @login_required
 @admin_required
 def add_user():
     db = get_db()
-    try:
-        if request.method == 'POST':
-            full_name = request.form.get('full_name')
-            username = request.form.get('username')
-            email = request.form.get('email')
-            role = request.form.get('role')
-            department = request.form.get('department')
-            password = request.form.get('password')
-            if not all([full_name, username, email, role, password]):
-                flash('All fields are required.', 'danger')
-                return render_template('users/add.html')
-            # Check for existing username or email
-            existing_user = db.query(User).filter((User.username == username) | (User.email == email)).first()
-            if existing_user:
-                flash('A user with that username or email already exists.', 'danger')
-                return render_template('users/add.html')
-            from backend.auth import get_password_hash
-            hashed_password = get_password_hash(password)
-            new_user = User(
-                full_name=full_name,
-                username=username,
-                email=email,
-                role=role,
-                department=department,
-                hashed_password=hashed_password,
-                is_active=True
-            )
-            db.add(new_user)
-            db.commit()
-            flash('User added successfully.', 'success')
-            return redirect(url_for('users.list_users'))
-        return render_template('users/add.html')
-    finally:
-        db.close()
+    if request.method == 'POST':
+        full_name = request.form.get('full_name')
+        username = request.form.get('username')
+        email = request.form.get('email')
+        role = request.form.get('role')
+        department = request.form.get('department')
+        password = request.form.get('password')
+        if not all([full_name, username, email, role, password]):
+            flash('All fields are required.', 'danger')
+            return render_template('users/add.html')
+        # Check for existing username or email
+        existing_user = db.query(User).filter((User.username == username) | (User.email == email)).first()
+        if existing_user:
+            flash('A user with that username or email already exists.', 'danger')
+            return render_template('users/add.html')
+        from backend.auth import get_password_hash
+        hashed_password = get_password_hash(password)
+        new_user = User(
+            full_name=full_name,
+            username=username,
+            email=email,
+            role=role,
+            department=department,
+            hashed_password=hashed_password,
+            is_active=True
+        )
+        db.add(new_user)
+        db.commit()
+        flash('User added successfully.', 'success')
+        return redirect(url_for('users.list_users'))
+    return render_template('users/add.html')
 
 @users_bp.route('/<int:user_id>/delete', methods=['POST'])
 @login_required
 @admin_required
 def delete_user(user_id):
     db = get_db()
-    try:
-        user = db.query(User).filter(User.id == user_id).first()
-        if not user:
-            flash('User not found.', 'danger')
-        elif user.role == 'admin':
-            flash('Cannot delete another admin.', 'danger')
-        else:
-            db.delete(user)
-            db.commit()
-            flash('User deleted.', 'success')
-        return redirect(url_for('users.list_users'))
-    finally:
-        db.close()
+    user = db.query(User).filter(User.id == user_id).first()
+    if not user:
+        flash('User not found.', 'danger')
+    elif user.role == 'admin':
+        flash('Cannot delete another admin.', 'danger')
+    else:
+        db.delete(user)
+        db.commit()
+        invalidate_user(user_id)
+        flash('User deleted.', 'success')
+    return redirect(url_for('users.list_users'))
 
 @users_bp.route('/<int:user_id>/assign', methods=['GET', 'POST'])
 @login_required
@@ -121,156 +118,307 @@ def assign_user(user_id):
         flash('Access denied.', 'danger')
         return redirect(url_for('users.list_users'))
     db = get_db()
-    try:
-        user = db.query(User).filter(User.id == user_id).first()
-        if not user:
-            flash('User not found.', 'danger')
-            return redirect(url_for('users.list_users'))
-        projects = db.query(Project).order_by(Project.name).all()
-        orders = db.query(Order).order_by(Order.order_number).all()
-        shipments = db.query(Shipment).order_by(Shipment.tracking_number).all()
-        if request.method == 'POST':
-            project_id = request.form.get('project_id')
-            order_id = request.form.get('order_id')
-            shipment_id = request.form.get('shipment_id')
-            assigned = False
-            if project_id:
-                project = db.query(Project).get(int(project_id))
-                if project:
-                    project.assigned_user_id = user.id
-                    project.assigned_by = current_user.full_name
-                    assigned = True
-                    notif = Notification(
-                        user_id=user.id,
-                        notification_type='Assignment',
-                        title='Assigned to Project',
-                        message=f'You have been assigned to project "{project.name}" by {current_user.full_name}.',
-                        action_url=url_for('projects.view_project', project_id=project.id),
-                        action_button_text='View Project',
-                        created_at=datetime.utcnow()
-                    )
-                    db.add(notif)
-            if order_id:
-                order = db.query(Order).get(int(order_id))
-                if order:
-                    order.assigned_user_id = user.id
-                    order.assigned_by = current_user.full_name
-                    assigned = True
-                    notif = Notification(
-                        user_id=user.id,
-                        notification_type='Assignment',
-                        title='Assigned to Order',
-                        message=f'You have been assigned to order "{order.order_number}" by {current_user.full_name}.',
-                        action_url=url_for('orders.view_order', order_id=order.id),
-                        action_button_text='View Order',
-                        created_at=datetime.utcnow()
-                    )
-                    db.add(notif)
-            if shipment_id:
-                shipment = db.query(Shipment).get(int(shipment_id))
-                if shipment:
-                    shipment.assigned_user_id = user.id
-                    shipment.assigned_by = current_user.full_name
-                    assigned = True
-                    notif = Notification(
-                        user_id=user.id,
-                        notification_type='Assignment',
-                        title='Assigned to Shipment',
-                        message=f'You have been assigned to shipment "{shipment.tracking_number}" by {current_user.full_name}.',
-                        action_url=url_for('shipments.view_shipment', shipment_id=shipment.id),
-                        action_button_text='View Shipment',
-                        created_at=datetime.utcnow()
-                    )
-                    db.add(notif)
-            if assigned:
-                db.commit()
-                flash('User assignments updated and notification sent.', 'success')
-            else:
-                flash('No assignment selected.', 'warning')
-            return redirect(url_for('users.list_users'))
-        return render_template('users/assign.html', user=user, projects=projects, orders=orders, shipments=shipments)
-    finally:
-        db.close()
+    user = db.query(User).filter(User.id == user_id).first()
+    if not user:
+        flash('User not found.', 'danger')
+        return redirect(url_for('users.list_users'))
+    projects = db.query(Project).order_by(Project.name).all()
+    orders = db.query(Order).order_by(Order.order_number).all()
+    shipments = db.query(Shipment).order_by(Shipment.tracking_number).all()
+    if request.method == 'POST':
+        project_id = request.form.get('project_id')
+        order_id = request.form.get('order_id')
+        shipment_id = request.form.get('shipment_id')
+        assigned = False
+        notices = []
+        if project_id:
+            project = db.query(Project).get(int(project_id))
+            if project:
+                project.assigned_user_id = user.id
+                project.assigned_by = current_user.full_name
+                assigned = True
+                notices.append(dict(
+                    notification_type='Assignment',
+                    title='Assigned to Project',
+                    message=f'You have been assigned to project "{project.name}" by {current_user.full_name}.',
+                    action_url=url_for('projects.view_project', project_id=project.id),
+                    action_button_text='View Project',
+                    group=f'assignment:{current_user.id}',
+                    digest_title=f'New assignments from {current_user.full_name}',
+                    project_id=project.id
+                ))
+        if order_id:
+            order = db.query(Order).get(int(order_id))
+            if order:
+                order.assigned_user_id = user.id
+                order.assigned_by = current_user.full_name
+                assigned = True
+                notices.append(dict(
+                    notification_type='Assignment',
+                    title='Assigned to Order',
+                    message=f'You have been assigned to order "{order.order_number}" by {current_user.full_name}.',
+                    action_url=url_for('orders.view_order', order_id=order.id),
+                    action_button_text='View Order',
+                    group=f'assignment:{current_user.id}',
+                    digest_title=f'New assignments from {current_user.full_name}',
+                    related_order_id=order.id
+                ))
+        if shipment_id:
+            shipment = db.query(Shipment).get(int(shipment_id))
+            if shipment:
+                shipment.assigned_user_id = user.id
+                shipment.assigned_by = current_user.full_name
+                assigned = True
+                notices.append(dict(
+                    notification_type='Assignment',
+                    title='Assigned to Shipment',
+                    message=f'You have been assigned to shipment "{shipment.tracking_number}" by {current_user.full_name}.',
+                    action_url=url_for('shipments.view_shipment', shipment_id=shipment.id),
+                    action_button_text='View Shipment',
+                    group=f'assignment:{current_user.id}',
+                    digest_title=f'New assignments from {current_user.full_name}',
+                    related_shipment_id=shipment.id
+                ))
+        if assigned:
+            db.commit()
+            # Notifications (digest lookup, insert, push) are built off the request
+            for notice in notices:
+                jobs.enqueue(db, 'notifications.notify', dict(notice, user_ids=[user.id]),
+                             created_by_id=current_user.id)
+            flash('User assignments updated and notification sent.', 'success')
+        else:
+            flash('No assignment selected.', 'warning')
+        return redirect(url_for('users.list_users'))
+    return render_template('users/assign.html', user=user, projects=projects, orders=orders, shipments=shipments)
 
 @users_bp.route('/assignments')
 @login_required
 def assignments():
     db = get_db()
-    try:
-        projects = db.query(Project).filter(Project.assigned_user_id == current_user.id).all()
-        orders = db.query(Order).filter(Order.assigned_user_id == current_user.id).all()
-        shipments = db.query(Shipment).filter(Shipment.assigned_user_id == current_user.id).all()
-        # Pass assigned_by for each
-        projects = [{**p.__dict__, 'assigned_by': p.assigned_by} for p in projects]
-        orders = [{**o.__dict__, 'assigned_by': o.assigned_by} for o in orders]
-        shipments = [{**s.__dict__, 'assigned_by': s.assigned_by} for s in shipments]
-        return render_template('users/assignments.html', projects=projects, orders=orders, shipments=shipments)
-    finally:
-        db.close()
+    projects = db.query(Project).filter(Project.assigned_user_id == current_user.id).all()
+    orders = db.query(Order).filter(Order.assigned_user_id == current_user.id).all()
+    shipments = db.query(Shipment).filter(Shipment.assigned_user_id == current_user.id).all()
+    # Pass assigned_by for each
+    projects = [{**p.__dict__, 'assigned_by': p.assigned_by} for p in projects]
+    orders = [{**o.__dict__, 'assigned_by': o.assigned_by} for o in orders]
+    shipments = [{**s.__dict__, 'assigned_by': s.assigned_by} for s in shipments]
+    return render_template('users/assignments.html', projects=projects, orders=orders, shipments=shipments)
+
+def _parse_time(value, end=False):
+    """Parse an ISO date or datetime filter; a bare end date covers the whole day"""
+    if not value:
+        return None
+    parsed = datetime.fromisoformat(value)
+    if end and len(value) == 10:
+        parsed += timedelta(days=1)
+    return parsed
+
+def filter_logs(query, args):
+    """Apply the audit log filters in args (action, entity_type, user_id, level, start, end)"""
+    if args.get('action'):
+        query = query.filter(AuditLog.action == args['action'])
+    if args.get('entity_type'):
+        query = query.filter(AuditLog.entity_type == args['entity_type'])
+    if args.get('user_id'):
+        query = query.filter(AuditLog.user_id == int(args['user_id']))
+    if args.get('level'):
+        query = query.filter(AuditLog.level == args['level'])
+    start = _parse_time(args.get('start'))
+    end = _parse_time(args.get('end'), end=True)
+    if start:
+        query = query.filter(AuditLog.timestamp >= start)
+    if end:
+        query = query.filter(AuditLog.timestamp < end)
+    return query
+
+def _with_archived(page, args, cursor, per_page):
+    """
+    Extend a page of audit logs with matching rows from archived months.
+
+    Archived rows are all older than the archive boundary, so the archive
+    files are only read once the page reaches that point in time.
+    """
+    boundary = archive_end()
+    if boundary is None:
+        return page
+    if page.has_next and page.items and page.items[-1].timestamp >= boundary:
+        return page
+    before = None
+    if cursor:
+        try:
+            direction, sort_value, row_id = decode_cursor(cursor, AuditLog.timestamp)
+        except ValueError:
+            direction = 'next'
+        else:
+            before = (sort_value, row_id)
+        if direction != 'next':
+            return page
+
+    criteria = {key: args[key] for key in ('action', 'entity_type', 'level') if args.get(key)}
+    if args.get('user_id'):
+        criteria['user_id'] = int(args['user_id'])
+    archived = query_archive(criteria, start=_parse_time(args.get('start')),
+                             end=_parse_time(args.get('end'), end=True),
+                             before=before, limit=per_page + 1)
+    rows = sorted(page.items + archived, key=lambda log: (log.timestamp, log.id), reverse=True)
+    page.items = rows[:per_page]
+    page.has_next = page.has_next or len(rows) > per_page
+    page.next_cursor = page.prev_cursor = None
+    if page.items:
+        first, last = page.items[0], page.items[-1]
+        if page.has_next:
+            page.next_cursor = encode_cursor('next', last.timestamp, last.id)
+        if page.has_prev:
+            page.prev_cursor = encode_cursor('prev', first.timestamp, first.id)
+    return page
 
 @users_bp.route('/logs')
 @login_required
 def logs():
+    """Audit log viewer, keyset-paginated newest first (?format=json for lazy loading)"""
+    wants_json = request.args.get('format') == 'json'
+    if current_user.role != 'admin':
+        if wants_json:
+            return jsonify({'success': False, 'message': 'Access denied'}), 403
+        flash('Access denied.', 'danger')
+        return redirect(url_for('dashboard.index'))
+    db = get_db()
+    cursor = request.args.get('cursor')
+    try:
+        per_page = min(max(int(request.args.get('per_page', 50)), 1), 200)
+        query = filter_logs(with_profile(db.query(AuditLog), AuditLog, 'list'), request.args)
+    except ValueError:
+        if wants_json:
+            return jsonify({'success': False, 'message': 'Invalid filter value'}), 400
+        flash('Invalid filter value.', 'danger')
+        return redirect(url_for('users.logs'))
+    
+    # No total count: counting millions of rows is what made this page slow
+    page = paginate_keyset(query, AuditLog.timestamp, AuditLog.id,
+                           cursor=cursor, per_page=per_page, descending=True)
+    if request.args.get('archived'):
+        # Months past retention live in archive files; only read on request
+        page = _with_archived(page, request.args, cursor, per_page)
+    
+    if wants_json:
+        return jsonify({
+            'success': True,
+            'data': [{
+                'id': log.id,
+                'timestamp': log.timestamp.isoformat(),
+                'user_id': log.user_id,
+                'username': log.username,
+                'user_role': log.user_role,
+                'action': log.action,
+                'entity_type': log.entity_type,
+                'entity_id': log.entity_id,
+                'description': log.description,
+                'level': log.level,
+                'ip_address': log.ip_address
+            } for log in page.items],
+            'pagination': {
+                'per_page': per_page,
+                'has_next': page.has_next,
+                'has_prev': page.has_prev,
+                'next_cursor': page.next_cursor,
+                'prev_cursor': page.prev_cursor
+            }
+        })
+    
+    filters = {key: request.args.get(key, '') for key in ('action', 'entity_type', 'user_id', 'level', 'start', 'end', 'archived')}
+    return render_template('users/logs.html',
+                         logs=page.items,
+                         total=None,
+                         per_page=per_page,
+                         has_prev=page.has_prev,
+                         has_next=page.has_next,
+                         prev_cursor=page.prev_cursor,
+                         next_cursor=page.next_cursor,
+                         levels=AUDIT_LOG_LEVELS,
+                         current_filters=filters)
+
+@users_bp.route('/logs/export')
+@login_required
+def export_logs():
+    """Download the audit log as CSV or XLSX"""
     if current_user.role != 'admin':
         flash('Access denied.', 'danger')
         return redirect(url_for('dashboard.index'))
+    export_format = request.args.get('format', 'csv')
+    if export_format not in EXPORT_FORMATS:
+        flash('Unsupported export format.', 'danger')
+        return redirect(url_for('users.logs'))
     db = get_db()
     try:
-        logs = db.query(AuditLog).order_by(AuditLog.timestamp.desc()).all()
-        return render_template('users/logs.html', logs=logs)
-    finally:
-        db.close()
+        query = filter_logs(with_profile(db.query(AuditLog), AuditLog, 'export'), request.args)
+    except ValueError:
+        flash('Invalid filter value.', 'danger')
+        return redirect(url_for('users.logs'))
+    query = query.order_by(AuditLog.timestamp.desc(), AuditLog.id.desc())
+    # Session is closed by the request teardown after the last chunk
+    return export_response(query, AUDIT_LOG_EXPORT_COLUMNS, export_format, 'audit-logs')
 
 @users_bp.route('/notifications/unread', methods=['GET', 'POST'])
 @login_required
 def unread_notifications():
+    """
+    Unread notification counter polled by every page.
+
+    GET returns only the cached count and since_id, the newest unread id;
+    clients fetch bodies from unread_notification_items when it changes.
+    POST marks the notifications given as repeated id values (default: all) read.
+    """
     db = get_db()
-    try:
-        if request.method == 'POST':
-            notifs = db.query(Notification).filter(Notification.user_id == current_user.id, Notification.is_read == False).all()
-            for n in notifs:
-                n.is_read = True
-                n.read_at = datetime.utcnow()
-            db.commit()
-            return '', 204
-        notifs = db.query(Notification).filter(Notification.user_id == current_user.id, Notification.is_read == False).order_by(Notification.created_at.desc()).all()
-        notif_list = [
-            {
-                'id': n.id,
-                'title': n.title,
-                'message': n.message,
-                'action_url': n.action_url,
-                'created_at': n.created_at.strftime('%d/%m/%Y %H:%M'),
-            } for n in notifs
-        ]
-        return jsonify({'unread': notif_list})
-    finally:
-        db.close()
+    if request.method == 'POST':
+        ids = request.form.getlist('id', type=int) or request.args.getlist('id', type=int)
+        notifications.mark_read(db, current_user.id, ids=ids[:100])
+        return '', 204
+    state = notifications.unread_state(db, current_user.id)
+    response = jsonify({'unread_count': state.count, 'since_id': state.latest_id})
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+@users_bp.route('/notifications/unread/items')
+@login_required
+def unread_notification_items():
+    """Unread notification bodies newer than since_id, newest first"""
+    db = get_db()
+    since_id = request.args.get('since_id', type=int)
+    limit = min(request.args.get('limit', 20, type=int), 100)
+    notifs = notifications.unread_notifications(db, current_user.id, since_id=since_id, limit=limit)
+    notif_list = [
+        {
+            'id': n.id,
+            'title': n.title,
+            'message': n.message,
+            'action_url': n.action_url,
+            'created_at': n.created_at.strftime('%d/%m/%Y %H:%M'),
+        } for n in notifs
+    ]
+    return jsonify({'unread': notif_list})
 
 @users_bp.route('/<int:user_id>/edit', methods=['GET', 'POST'])
 @login_required
 @admin_required
 def edit_user(user_id):
     db = get_db()
-    try:
-        user = db.query(User).filter(User.id == user_id).first()
-        if not user:
-            flash('User not found.', 'danger')
+    user = db.query(User).filter(User.id == user_id).first()
+    if not user:
+        flash('User not found.', 'danger')
+        return redirect(url_for('users.list_users'))
+    if request.method == 'POST':
+        user.full_name = request.form.get('full_name', user.full_name)
+        user.username = request.form.get('username', user.username)
+        user.email = request.form.get('email', user.email)
+        user.role = request.form.get('role', user.role)
+        user.department = request.form.get('department', user.department)
+        user.is_active = bool(request.form.get('is_active', user.is_active))
+        try:
+            db.commit()
+            invalidate_user(user_id)
+            flash('User updated successfully.', 'success')
             return redirect(url_for('users.list_users'))
-        if request.method == 'POST':
-            user.full_name = request.form.get('full_name', user.full_name)
-            user.username = request.form.get('username', user.username)
-            user.email = request.form.get('email', user.email)
-            user.role = request.form.get('role', user.role)
-            user.department = request.form.get('department', user.department)
-            user.is_active = bool(request.form.get('is_active', user.is_active))
-            try:
-                db.commit()
-                flash('User updated successfully.', 'success')
-                return redirect(url_for('users.list_users'))
-            except Exception as e:
-                db.rollback()
-                flash('An error occurred while updating the user.', 'danger')
-        return render_template('users/edit.html', user=user)
-    finally:
-        db.close() 
\ No newline at end of file
+        except Exception as e:
+            db.rollback()
+            flash('An error occurred while updating the user.', 'danger')
+    return render_template('users/edit.html', user=user)
\ No newline at end of file
@@ -0,0 +1,83 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+# Per-process identity cache used by the Flask-Login user loader. invalidate_user
+# only reaches the worker that handled the edit, so other workers re-check
+# is_active and role with a one-row query at most every USER_CACHE_RECHECK
+# seconds: a deactivation or role change takes effect everywhere within that.
+USER_CACHE_TTL = int(os.getenv('USER_CACHE_TTL', 300))  # Seconds
+USER_CACHE_RECHECK = float(os.getenv('USER_CACHE_RECHECK', 5))  # Seconds
+USER_CACHE_SIZE = int(os.getenv('USER_CACHE_SIZE', 1024))
+
+CACHED_USER_FIELDS = (
+    'id', 'username', 'email', 'full_name', 'role', 'department',
+    'timezone', 'language', 'is_active', 'last_login', 'created_at'
+)
+
+class CachedUser:
+    """Detached snapshot of the User fields needed for identity and role checks"""
+
+    # Flask-Login interface
+    is_authenticated = True
+    is_anonymous = False
+
+    def __init__(self, **fields):
+        for field in CACHED_USER_FIELDS:
+            setattr(self, field, fields.get(field))
+
+    @classmethod
+    def from_model(cls, user):
+        return cls(**{field: getattr(user, field) for field in CACHED_USER_FIELDS})
+
+    def get_id(self):
+        return str(self.id)
+
+_cache = OrderedDict()
+_lock = threading.Lock()
+
+def get_user(user_id, loader, checker=None):
+    """
+    Return the cached user for user_id, calling loader(user_id) on a miss or expiry.
+
+    checker(user_id) returns the current (is_active, role) of the user, or
+    None if it no longer exists; it is called on a hit once the entry is
+    USER_CACHE_RECHECK seconds old, and the user is reloaded if they differ.
+    """
+    now = time.monotonic()
+    with _lock:
+        entry = _cache.get(user_id)
+        if entry is not None and entry[0] > now:
+            _cache.move_to_end(user_id)
+    if entry is not None and entry[0] > now:
+        expires, checked, user = entry
+        if checker is None or now < checked + USER_CACHE_RECHECK:
+            return user
+        if checker(user_id) == (user.is_active, user.role):
+            with _lock:
+                if user_id in _cache:
+                    _cache[user_id] = (expires, now, user)
+            return user
+
+    user = loader(user_id)
+    if user is None:
+        invalidate_user(user_id)
+        return None
+
+    with _lock:
+        _cache[user_id] = (now + USER_CACHE_TTL, now, user)
+        _cache.move_to_end(user_id)
+        while len(_cache) > USER_CACHE_SIZE:
+            _cache.popitem(last=False)
+    return user
+
+def invalidate_user(user_id):
+    """Drop a user from the cache after it is edited, deactivated or deleted"""
+    with _lock:
+        _cache.pop(int(user_id), None)
+
+def clear():
+    """Drop every cached user"""
+    with _lock:
+        _cache.clear()
@@ -0,0 +1,57 @@
+import os
+import sys
+import tempfile
+
+# The engine is created at import time, so point it at a scratch database first
+_db_dir = tempfile.mkdtemp(prefix='fusionflow-tests-')
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(_db_dir, 'test.db')}"
+os.environ.setdefault('NOTIFICATION_SCHEDULER_INTERVAL', '0')
+os.environ.setdefault('WEBHOOK_PROCESS_INTERVAL', '0')
+os.environ.setdefault('JOB_BACKEND', 'inline')
+os.environ.setdefault('AUDIT_ASYNC', 'false')
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from datetime import datetime, timedelta
+import pytest
+
+@pytest.fixture(scope='session')
+def app():
+    from fusionflow_app import create_app
+    from backend.database import SessionLocal
+    from backend.models import User, Project, Supplier, Order, Shipment
+    from backend.auth import get_password_hash
+
+    app = create_app()
+    db = SessionLocal()
+    user = User(username='admin', email='admin@example.com', full_name='Admin',
+                hashed_password=get_password_hash('pw'), role='admin', is_active=True)
+    db.add(user)
+    db.commit()
+    projects = [Project(name=f'Project {i}', project_code=f'PRJ-{i:04d}', client_name='Client',
+                        start_date=datetime.utcnow(), planned_completion_date=datetime.utcnow() + timedelta(days=90),
+                        status='Active', created_by_id=user.id) for i in range(1, 4)]
+    suppliers = [Supplier(name=f'Supplier {i}', supplier_code=f'SUP-{i:04d}', country='QA',
+                          approval_status='Approved') for i in range(1, 6)]
+    db.add_all(projects + suppliers)
+    db.commit()
+    for i in range(60):
+        order = Order(order_number=f'ORD-{i + 1:06d}', project_id=projects[i % 3].id, supplier_id=suppliers[i % 5].id,
+                      created_by_id=user.id, description=f'Item {i}', quantity=2, unit_price=10, total_amount=20,
+                      requested_delivery_date=datetime.utcnow() + timedelta(days=i), status='Approved',
+                      priority='Normal', created_at=datetime.utcnow() - timedelta(hours=i))
+        db.add(order)
+        db.flush()
+        db.add(Shipment(order_id=order.id, tracking_number=f'TRK{i:06d}', carrier='DHL', origin_address='Hamburg',
+                        origin_country='DE', destination_address='Doha', destination_country='QA',
+                        current_status='In Transit', created_at=datetime.utcnow() - timedelta(hours=i)))
+    db.commit()
+    db.close()
+    return app
+
+@pytest.fixture
+def client(app):
+    client = app.test_client()
+    response = client.post('/login', data={'username': 'admin', 'password': 'pw'})
+    assert response.status_code == 302
+    return client
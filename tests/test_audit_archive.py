@@ -0,0 +1,56 @@
+from datetime import datetime
+import pytest
+from backend.database import SessionLocal, engine
+from backend.models.audit_log import AuditLog
+from backend.services import audit_archive, jobs
+
+@pytest.fixture
+def db(app):
+    db = SessionLocal()
+    yield db
+    db.rollback()
+    db.close()
+
+def add_logs(db, start, count):
+    db.add_all([
+        AuditLog(action='UPDATE', entity_type='Order', entity_id=i, timestamp=start.replace(day=i + 1))
+        for i in range(count)
+    ])
+    db.commit()
+
+def month_rows(db, start):
+    return db.query(AuditLog).filter(
+        AuditLog.timestamp >= start, AuditLog.timestamp < audit_archive.add_months(start, 1)
+    ).count()
+
+def test_archive_month_moves_rows_to_the_archive(db, tmp_path):
+    start = datetime(2001, 1, 1)
+    add_logs(db, start, 4)
+
+    assert audit_archive.archive_month(engine, start, str(tmp_path)) == 4
+
+    assert month_rows(db, start) == 0
+    assert sorted(row.entity_id for row in audit_archive.iter_archive(start, str(tmp_path))) == [0, 1, 2, 3]
+
+def test_resumed_month_reports_rows_already_in_the_archive(db, tmp_path):
+    start = datetime(2001, 2, 1)
+    add_logs(db, start, 3)
+    path = audit_archive.archive_path(start, str(tmp_path))
+    with engine.connect() as conn:
+        audit_archive._write_archive(conn, audit_archive.TABLE, start, datetime(2001, 3, 1), None, path)
+    add_logs(db, start.replace(day=10), 1)
+
+    assert audit_archive.archive_month(engine, start, str(tmp_path)) == 4
+
+    assert month_rows(db, start) == 0
+    assert len(list(audit_archive.iter_archive(start, str(tmp_path)))) == 4
+
+def test_archive_job_ensures_partitions(db, monkeypatch):
+    calls = []
+    monkeypatch.setattr(audit_archive, 'ensure_partitions', lambda conn: calls.append(conn) or ['audit_logs_2099_01'])
+
+    job = jobs.enqueue(db, 'audit.archive', {'retention_months': 1200})
+
+    assert job.status == 'succeeded'
+    assert len(calls) == 1
+    assert job.result == {'archived': {}, 'partitions_created': ['audit_logs_2099_01'], 'dry_run': False}
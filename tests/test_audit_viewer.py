@@ -0,0 +1,83 @@
+from datetime import datetime, timedelta
+from functools import partial
+import pytest
+from backend.auth import get_password_hash
+from backend.database import SessionLocal, engine
+from backend.models import User
+from backend.models.audit_log import AuditLog
+from backend.services import audit_archive
+from fusionflow_app.routes import users
+
+@pytest.fixture
+def db(app):
+    db = SessionLocal()
+    yield db
+    db.rollback()
+    db.close()
+
+@pytest.fixture
+def logs(db):
+    if not db.query(AuditLog).filter(AuditLog.entity_type == 'Viewer').first():
+        start = datetime(2031, 3, 1)
+        db.add_all([
+            AuditLog(action='UPDATE' if i % 2 else 'CREATE', entity_type='Viewer', entity_id=i,
+                     level='warning' if i == 7 else 'info', timestamp=start + timedelta(hours=i))
+            for i in range(12)
+        ])
+        db.commit()
+
+def fetch(client, **args):
+    response = client.get('/users/logs', query_string=dict(args, format='json'))
+    assert response.status_code == 200
+    return response.get_json()
+
+def test_filters(client, logs):
+    entity = {'entity_type': 'Viewer'}
+
+    assert len(fetch(client, **entity)['data']) == 12
+    assert {row['action'] for row in fetch(client, action='CREATE', **entity)['data']} == {'CREATE'}
+    assert [row['entity_id'] for row in fetch(client, level='warning', **entity)['data']] == [7]
+    ranged = fetch(client, start='2031-03-01T03:00:00', end='2031-03-01T05:00:00', **entity)['data']
+    assert [row['entity_id'] for row in ranged] == [4, 3]
+    assert len(fetch(client, start='2031-03-01', end='2031-03-01', **entity)['data']) == 12  # whole day
+
+def test_pages_newest_first_without_overlap(client, logs):
+    first = fetch(client, entity_type='Viewer', per_page=5)
+    second = fetch(client, entity_type='Viewer', per_page=5, cursor=first['pagination']['next_cursor'])
+
+    assert [row['entity_id'] for row in first['data']] == [11, 10, 9, 8, 7]
+    assert [row['entity_id'] for row in second['data']] == [6, 5, 4, 3, 2]
+    assert second['pagination']['has_prev']
+
+@pytest.mark.parametrize('args', [{'start': 'yesterday'}, {'user_id': 'me'}, {'per_page': 'lots'}])
+def test_invalid_filters(client, args):
+    assert client.get('/users/logs', query_string=dict(args, format='json')).status_code == 400
+    assert client.get('/users/logs', query_string=args).status_code == 302
+
+def test_non_admins_are_refused(app, db):
+    if not db.query(User).filter(User.username == 'viewer').first():
+        db.add(User(username='viewer', email='viewer@example.com', full_name='Viewer', role='field',
+                    hashed_password=get_password_hash('pw'), is_active=True))
+        db.commit()
+    client = app.test_client()
+    client.post('/login', data={'username': 'viewer', 'password': 'pw'})
+
+    assert client.get('/users/logs?format=json').status_code == 403
+
+def test_archived_months_are_merged_on_request(client, db, tmp_path, monkeypatch):
+    start = datetime(2002, 6, 1)
+    db.add_all([AuditLog(action='DELETE', entity_type='Archived', entity_id=i, timestamp=start + timedelta(days=i))
+                for i in range(3)])
+    db.add(AuditLog(action='DELETE', entity_type='Archived', entity_id=99, timestamp=datetime(2031, 1, 1)))
+    db.commit()
+    audit_archive.archive_month(engine, start, str(tmp_path))
+    monkeypatch.setattr(users, 'archive_end', partial(audit_archive.archive_end, str(tmp_path)))
+    monkeypatch.setattr(users, 'query_archive', partial(audit_archive.query_archive, archive_dir=str(tmp_path)))
+
+    live = fetch(client, entity_type='Archived')
+    merged = fetch(client, entity_type='Archived', archived=1, per_page=3)
+    rest = fetch(client, entity_type='Archived', archived=1, per_page=3, cursor=merged['pagination']['next_cursor'])
+
+    assert [row['entity_id'] for row in live['data']] == [99]
+    assert [row['entity_id'] for row in merged['data']] == [99, 2, 1]
+    assert [row['entity_id'] for row in rest['data']] == [0]
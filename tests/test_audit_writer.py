@@ -0,0 +1,35 @@
+from datetime import datetime
+import pytest
+from backend.database import SessionLocal
+from backend.models.audit_log import AuditLog
+from backend.services import audit
+
+@pytest.fixture
+def db(app):
+    db = SessionLocal()
+    yield db
+    db.rollback()
+    db.close()
+
+def test_record_stores_missing_json_values_as_sql_null(db):
+    audit.record('UPDATE', 'NullCheck', 1, old_values=None, new_values={'status': 'Done'})
+
+    log = db.query(AuditLog).filter(AuditLog.entity_type == 'NullCheck').one()
+    assert db.query(AuditLog).filter(AuditLog.entity_type == 'NullCheck', AuditLog.old_values.is_(None)).count() == 1
+    assert log.new_values == {'status': 'Done'}
+
+def test_record_rejects_unknown_fields():
+    with pytest.raises(TypeError):
+        audit.record('UPDATE', 'Order', 1, colour='red')
+
+def test_writer_batches_queued_events(db):
+    writer = audit.AuditWriter(session_factory=SessionLocal, batch_size=3, max_latency=60)
+    event = dict({field: None for field in audit.AUDIT_FIELDS}, action='VIEW', entity_type='Batched',
+                 level='info', timestamp=datetime.utcnow())
+
+    for _ in range(5):
+        assert writer.submit(dict(event))
+    writer.flush()
+    writer.shutdown()
+
+    assert db.query(AuditLog).filter(AuditLog.entity_type == 'Batched').count() == 5
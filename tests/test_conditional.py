@@ -0,0 +1,83 @@
+from datetime import datetime, timedelta
+import pytest
+from backend.database import SessionLocal
+from backend.models import Order, Shipment
+
+HTTP_FUTURE = 'Wed, 01 Jan 2099 00:00:00 GMT'
+HTTP_PAST = 'Thu, 01 Jan 2004 00:00:00 GMT'
+
+@pytest.fixture
+def db(app):
+    db = SessionLocal()
+    yield db
+    db.rollback()
+    db.close()
+
+def ids(db):
+    order = db.query(Order).filter(Order.order_number == 'ORD-000030').one()
+    shipment = db.query(Shipment).filter(Shipment.order_id == order.id).one()
+    return order, shipment
+
+def urls(db):
+    order, shipment = ids(db)
+    return [f'/api/orders/{order.id}', f'/api/shipments/{shipment.id}/track', f'/api/projects/{order.project_id}/orders',
+            f'/shipments/{shipment.id}/track']
+
+def test_matching_etag_is_a_304_without_a_body(client, db):
+    for url in urls(db):
+        first = client.get(url)
+        assert first.status_code == 200, url
+        assert first.headers['ETag']
+
+        again = client.get(url, headers={'If-None-Match': first.headers['ETag']})
+
+        assert again.status_code == 304, url
+        assert again.data == b''
+        assert 'no-cache' in again.headers['Cache-Control']
+
+def test_changes_invalidate_the_etag(client, db):
+    order, _ = ids(db)
+    url = f'/api/projects/{order.project_id}/orders'
+    etag = client.get(url).headers['ETag']
+
+    order.updated_at = datetime.utcnow() + timedelta(seconds=5)
+    db.commit()
+
+    assert client.get(url, headers={'If-None-Match': etag}).status_code == 200
+
+def test_etag_depends_on_the_query_string(client, db):
+    order, _ = ids(db)
+
+    full = client.get(f'/api/orders/{order.id}')
+    partial = client.get(f'/api/orders/{order.id}?fields=id', headers={'If-None-Match': full.headers['ETag']})
+
+    assert partial.status_code == 200
+    assert partial.headers['ETag'] != full.headers['ETag']
+
+def test_if_modified_since_validates_detail_endpoints(client, db):
+    order, _ = ids(db)
+    url = f'/api/orders/{order.id}'
+
+    assert client.get(url, headers={'If-Modified-Since': HTTP_FUTURE}).status_code == 304
+    assert client.get(url, headers={'If-Modified-Since': HTTP_PAST}).status_code == 200
+
+def test_if_modified_since_is_ignored_for_collections(client, db):
+    order, shipment = ids(db)
+
+    for url in (f'/api/projects/{order.project_id}/orders', f'/shipments/{shipment.id}/track'):
+        response = client.get(url, headers={'If-Modified-Since': HTTP_FUTURE})
+
+        assert response.status_code == 200, url
+        assert 'Last-Modified' not in response.headers
+
+def test_etag_wins_over_if_modified_since(client, db):
+    order, _ = ids(db)
+    url = f'/api/orders/{order.id}'
+
+    response = client.get(url, headers={'If-None-Match': '"stale"', 'If-Modified-Since': HTTP_FUTURE})
+
+    assert response.status_code == 200
+
+@pytest.mark.parametrize('url', ['/api/orders/999999', '/api/shipments/999999/track', '/api/projects/999999/orders'])
+def test_missing_rows_are_404(client, url):
+    assert client.get(url).status_code == 404
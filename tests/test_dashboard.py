@@ -0,0 +1,56 @@
+from datetime import datetime
+import pytest
+from backend.database import SessionLocal
+from backend.models import Order, Project, Shipment, Supplier
+from backend.query_counter import QueryCounter
+from backend.services.dashboard import (
+    IN_TRANSIT_STATUSES, PENDING_ORDER_STATUSES, get_dashboard_metrics, get_upcoming_deadlines
+)
+
+@pytest.fixture
+def db(app):
+    db = SessionLocal()
+    yield db
+    db.close()
+
+def test_metrics_match_the_tables(db):
+    now = datetime.utcnow()
+    orders = db.query(Order).all()
+    shipments = db.query(Shipment).all()
+
+    metrics = get_dashboard_metrics(db, include_details=False, now=now)
+
+    assert metrics.total_orders == len(orders)
+    assert metrics.pending_orders == sum(o.status in PENDING_ORDER_STATUSES for o in orders)
+    assert metrics.attention_orders == sum(
+        o.priority == 'Critical' or o.status == 'On Hold' or
+        (o.requested_delivery_date is not None and o.requested_delivery_date < now) for o in orders)
+    assert sum(metrics.order_statuses.values()) == sum(metrics.priority_counts.values()) == len(orders)
+    assert metrics.total_projects == db.query(Project).count()
+    assert metrics.active_projects == db.query(Project).filter(Project.status == 'Active').count()
+    assert metrics.total_suppliers == db.query(Supplier).count()
+    assert metrics.total_shipments == len(shipments)
+    assert metrics.in_transit_shipments == sum(s.current_status in IN_TRANSIT_STATUSES for s in shipments)
+
+def test_metrics_use_a_fixed_number_of_statements(db):
+    with QueryCounter() as counter:
+        get_dashboard_metrics(db)
+
+    # order groups, counters row, deadlines, recent orders (with their project and supplier)
+    assert counter.count <= 4, counter.statements
+
+def test_upcoming_deadlines_are_the_soonest_across_types(db):
+    now = datetime.utcnow()
+
+    deadlines = get_upcoming_deadlines(db, limit=5, now=now)
+
+    dates = [row.date for row in deadlines]
+    assert len(deadlines) == 5
+    assert dates == sorted(dates)
+    assert all(date > now for date in dates)
+    soonest_order = db.query(Order.requested_delivery_date).filter(Order.requested_delivery_date > now) \
+        .order_by(Order.requested_delivery_date).limit(1).scalar()
+    assert dates[0] <= soonest_order
+
+def test_dashboard_page(client):
+    assert client.get('/').status_code == 200
@@ -0,0 +1,49 @@
+from datetime import datetime
+import pytest
+from backend.database import SessionLocal
+from backend.models import DashboardCounter, Order
+from backend.services.dashboard import get_dashboard_metrics
+from backend.services.dashboard_snapshot import (
+    RECONCILED_AT_KEY, get_dashboard_snapshot, invalidate_snapshot, reconcile_snapshot
+)
+
+COUNTERS = ('total_orders', 'pending_orders', 'attention_orders', 'total_projects', 'active_projects',
+            'total_suppliers', 'total_shipments', 'in_transit_shipments', 'customs_delay_shipments')
+
+@pytest.fixture
+def db(app):
+    db = SessionLocal()
+    reconcile_snapshot(db)
+    yield db
+    db.rollback()
+    db.close()
+
+def assert_snapshot_is_live(db):
+    # A huge max_age keeps the snapshot from reconciling itself before the comparison
+    snapshot = get_dashboard_snapshot(db, max_age=10 ** 9)
+    live = get_dashboard_metrics(db, include_details=False, now=datetime.utcnow())
+    assert {name: getattr(snapshot, name) for name in COUNTERS} == {name: getattr(live, name) for name in COUNTERS}
+    assert snapshot.order_statuses == live.order_statuses
+
+@pytest.mark.parametrize('status', ['Pending Approval', 'A status never seen before', 'Approved'])
+def test_status_changes_keep_the_snapshot_in_step(client, db, status):
+    order = db.query(Order).filter(Order.order_number == 'ORD-000040').one()
+
+    response = client.post(f'/orders/{order.id}/status', json={'status': status})
+
+    assert response.get_json()['success']
+    assert_snapshot_is_live(db)
+
+def test_a_stale_snapshot_is_reconciled_on_read(db):
+    db.query(DashboardCounter).filter(DashboardCounter.metric_key == 'orders.total').update({'value': -1})
+    invalidate_snapshot(db)
+    db.commit()
+
+    assert get_dashboard_snapshot(db).total_orders == db.query(Order).count()
+
+def test_reconcile_stamps_the_snapshot(db):
+    counters = reconcile_snapshot(db)
+
+    assert counters[RECONCILED_AT_KEY] > 0
+    assert db.query(DashboardCounter.value).filter(DashboardCounter.metric_key == 'orders.total').scalar() == \
+        db.query(Order).count()
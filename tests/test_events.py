@@ -0,0 +1,84 @@
+from datetime import datetime
+import pytest
+from backend.database import SessionLocal
+from backend.services import events
+
+@pytest.fixture
+def db(app):
+    db = SessionLocal()
+    yield db
+    db.rollback()
+    db.close()
+
+@pytest.fixture
+def broker(monkeypatch):
+    broker = events.LocalBroker()
+    monkeypatch.setattr(events, '_broker', broker)
+    return broker
+
+def status(shipment_id, value, hour):
+    return events.shipment_channel(shipment_id), 'shipment_status', {
+        'shipment_id': shipment_id, 'status': value, 'timestamp': datetime(2030, 1, 1, hour)
+    }
+
+def test_only_the_latest_status_per_shipment_is_published():
+    note = (events.user_channel(1), 'notification', {'id': 1})
+    pending = [status(1, 'Picked Up', 8), note, status(1, 'Delivered', 12), status(2, 'In Transit', 9),
+               status(1, 'In Transit', 10)]
+
+    assert events._latest_status_only(pending) == [note, status(1, 'Delivered', 12), status(2, 'In Transit', 9)]
+
+def test_subscribers_only_see_their_channels(broker):
+    subscription = broker.subscribe([events.shipment_channel(1)])
+
+    broker.publish(events.shipment_channel(2), 'shipment_status', {})
+    broker.publish(events.shipment_channel(1), 'shipment_status', {'status': 'Delivered'})
+
+    assert subscription.get(timeout=0).data == {'status': 'Delivered'}
+    assert subscription.get(timeout=0) is None
+
+def test_a_full_queue_marks_the_channel_for_resync(broker):
+    subscription = broker.subscribe([events.user_channel(1)])
+    subscription.queue.maxsize = 2
+
+    for i in range(3):
+        broker.publish(events.user_channel(1), 'notification', {'id': i})
+
+    assert subscription.take_overflowed() == {events.user_channel(1)}
+    assert subscription.take_overflowed() == set()
+
+def test_events_are_published_on_commit_and_dropped_on_rollback(db, broker):
+    subscription = broker.subscribe([events.user_channel(1)])
+
+    db.connection()
+    events.publish_after_commit(db, events.user_channel(1), 'notification', {'id': 1})
+    db.rollback()
+    events.publish_after_commit(db, events.user_channel(1), 'notification', {'id': 2})
+    db.commit()
+
+    assert subscription.get(timeout=0).data == {'id': 2}
+    assert subscription.get(timeout=0) is None
+
+def test_a_broker_failure_stops_publishing_the_rest_of_the_commit(db, monkeypatch):
+    attempts = []
+    def publish(channel, name, data):
+        attempts.append(channel)
+        raise ConnectionError('redis is down')
+    monkeypatch.setattr(events, 'publish', publish)
+
+    for user_id in (1, 2, 3):
+        events.publish_after_commit(db, events.user_channel(user_id), 'notification', {})
+    db.commit()
+
+    assert attempts == [events.user_channel(1)]
+
+def test_redis_publisher_has_short_timeouts(monkeypatch):
+    redis = pytest.importorskip('redis')
+    clients = []
+    monkeypatch.setattr(redis.Redis, 'from_url', classmethod(lambda cls, url, **kwargs: clients.append(kwargs)))
+
+    events.RedisBroker('redis://localhost:6379/0', timeout=0.25)
+
+    assert clients[0]['socket_timeout'] == 0.25
+    assert clients[0]['socket_connect_timeout'] == 0.25
+    assert 'socket_timeout' not in clients[1]
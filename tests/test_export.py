@@ -0,0 +1,75 @@
+import csv
+import io
+from datetime import datetime
+from types import SimpleNamespace
+import pytest
+from backend.database import SessionLocal
+from backend.models import Order, Shipment, Supplier
+from backend.services.export import ORDER_EXPORT_COLUMNS, _csv_value, iter_csv
+
+@pytest.fixture
+def db(app):
+    db = SessionLocal()
+    yield db
+    db.close()
+
+def read_csv(response):
+    text = response.get_data().decode('utf-8')
+    assert text.startswith('\ufeff')
+    return list(csv.reader(io.StringIO(text[1:])))
+
+@pytest.mark.parametrize('value, expected', [
+    (None, ''),
+    ('=HYPERLINK("x")', '\'=HYPERLINK("x")'),
+    ('@SUM(A1)', "'@SUM(A1)"),
+    ('-2+3', "'-2+3"),
+    (-5, -5),
+    (datetime(2030, 1, 2, 3, 4), '2030-01-02 03:04:00'),
+    ('Plain text', 'Plain text'),
+])
+def test_csv_values(value, expected):
+    assert _csv_value(value) == expected
+
+def test_csv_is_written_in_chunks():
+    rows = [SimpleNamespace(name=f'row {i}') for i in range(5)]
+
+    chunks = list(iter_csv(rows, [('Name', 'name')], batch_size=2))
+
+    assert len(chunks) == 3
+    assert b''.join(chunks).decode('utf-8').count('\n') == 6
+
+@pytest.mark.parametrize('path, model', [('/orders/export', Order), ('/shipments/export', Shipment),
+                                         ('/suppliers/export', Supplier)])
+def test_exports_have_every_row(client, db, path, model):
+    response = client.get(path)
+
+    assert response.status_code == 200
+    assert 'attachment' in response.headers['Content-Disposition']
+    assert len(read_csv(response)) == db.query(model).count() + 1
+
+def test_order_export_applies_the_list_filters(client, db):
+    project_id = db.query(Order.project_id).filter(Order.order_number == 'ORD-000001').scalar()
+
+    rows = read_csv(client.get(f'/orders/export?project={project_id}'))
+
+    assert rows[0] == [header for header, _ in ORDER_EXPORT_COLUMNS]
+    assert len(rows) - 1 == db.query(Order).filter(Order.project_id == project_id).count()
+
+def test_audit_log_export(client):
+    response = client.get('/users/logs/export?entity_type=Order')
+
+    assert response.status_code == 200
+    assert read_csv(response)[0][0] == 'Timestamp'
+
+def test_xlsx_export(client, db):
+    openpyxl = pytest.importorskip('openpyxl')
+
+    response = client.get('/suppliers/export?format=xlsx')
+
+    sheet = openpyxl.load_workbook(io.BytesIO(response.get_data())).active
+    assert sheet.max_row == db.query(Supplier).count() + 1
+
+@pytest.mark.parametrize('path', ['/orders/export?format=pdf', '/users/logs/export?format=pdf',
+                                  '/users/logs/export?start=never'])
+def test_bad_export_requests_redirect(client, path):
+    assert client.get(path).status_code == 302
@@ -0,0 +1,26 @@
+import pytest
+import sqlalchemy as sa
+from backend.create_database import migrate_add_hot_path_indexes
+from backend.database import engine
+from backend.models import Shipment
+
+@pytest.fixture
+def index(app):
+    return sorted(Shipment.__table__.indexes, key=lambda ix: ix.name)[0]
+
+def index_names(table_name):
+    return {index['name'] for index in sa.inspect(engine).get_indexes(table_name)}
+
+def test_missing_indexes_are_created(index):
+    index.drop(bind=engine)
+    assert index.name not in index_names('shipments')
+
+    created = migrate_add_hot_path_indexes(engine)
+
+    assert created == [index.name]
+    assert index.name in index_names('shipments')
+
+def test_migration_is_idempotent(app):
+    migrate_add_hot_path_indexes(engine)
+
+    assert migrate_add_hot_path_indexes(engine) == []
@@ -0,0 +1,59 @@
+import pytest
+from backend.database import SessionLocal
+from backend.models import Notification, Project, User
+from backend.services import jobs
+
+@pytest.fixture
+def db(app):
+    db = SessionLocal()
+    yield db
+    db.rollback()
+    db.close()
+
+def test_start_job_runs_it_and_reports_status(client):
+    response = client.post('/api/jobs/suppliers.recalculate_metrics', json={'supplier_ids': [1]})
+
+    assert response.status_code == 202
+    status = client.get(response.headers['Location']).get_json()['data']
+    assert status['status'] == 'succeeded'
+    assert status['result'] == {'suppliers_updated': 1}
+
+def test_idempotency_key_returns_the_first_job(client):
+    first = client.post('/api/jobs/suppliers.recalculate_metrics', json={}, headers={'Idempotency-Key': 'k1'})
+    second = client.post('/api/jobs/suppliers.recalculate_metrics', json={}, headers={'Idempotency-Key': 'k1'})
+
+    assert first.get_json()['data']['id'] == second.get_json()['data']['id']
+
+@pytest.mark.parametrize('name, body, status', [
+    ('no.such_job', {}, 404),
+    ('notifications.notify', {}, 404),  # internal only
+    ('suppliers.recalculate_metrics', {'unknown': 1}, 400),
+    ('suppliers.recalculate_metrics', [1, 2], 400),
+])
+def test_start_job_rejects(client, name, body, status):
+    assert client.post(f'/api/jobs/{name}', json=body).status_code == status
+
+@pytest.mark.parametrize('name', ['database.migrate', 'audit.archive'])
+def test_long_jobs_are_refused_on_the_thread_backend(client, db, monkeypatch, name):
+    monkeypatch.setattr(jobs, 'JOB_BACKEND', 'thread')
+
+    with pytest.raises(jobs.JobBackendError):
+        jobs.enqueue(db, name)
+    response = client.post(f'/api/jobs/{name}', json={})
+    assert response.status_code == 409
+    assert 'JOB_BACKEND=celery' in response.get_json()['message']
+
+def test_assignment_notification_is_sent_through_a_job(client, db, monkeypatch):
+    enqueued = []
+    enqueue = jobs.enqueue
+    monkeypatch.setattr(jobs, 'enqueue', lambda db, name, args=None, **kw: enqueued.append(name) or enqueue(db, name, args, **kw))
+    user = db.query(User).filter(User.username == 'admin').one()
+    project = db.query(Project).filter(Project.project_code == 'PRJ-0002').one()
+
+    response = client.post(f'/users/{user.id}/assign', data={'project_id': project.id})
+
+    assert response.status_code == 302
+    assert enqueued == ['notifications.notify']
+    assert db.query(Notification).filter(
+        Notification.user_id == user.id, Notification.project_id == project.id
+    ).count() == 1
@@ -0,0 +1,94 @@
+import pytest
+from sqlalchemy import update
+from backend.auth import get_password_hash
+from backend.database import SessionLocal
+from backend.models import Notification, User
+from backend.query_counter import QueryCounter
+from backend.services import notifications
+
+@pytest.fixture
+def db(app):
+    db = SessionLocal()
+    yield db
+    db.rollback()
+    db.close()
+
+@pytest.fixture
+def user(db):
+    user = User(username='counted', email='counted@example.com', full_name='Counted', role='field',
+                hashed_password=get_password_hash('pw'), is_active=True)
+    db.add(user)
+    db.commit()
+    yield user
+    db.query(Notification).filter(Notification.user_id == user.id).delete()
+    db.delete(user)
+    db.commit()
+    notifications.invalidate(user.id)
+
+@pytest.fixture
+def user_client(app, user):
+    client = app.test_client()
+    client.post('/login', data={'username': 'counted', 'password': 'pw'})
+    return client
+
+def add(db, user, count=1, **fields):
+    rows = [Notification(user_id=user.id, notification_type='System Alert', title=f'n{i}', message='m', **fields)
+            for i in range(count)]
+    db.add_all(rows)
+    db.commit()
+    return rows
+
+def test_counts_are_cached_until_a_commit_changes_them(db, user):
+    add(db, user, 2)
+    assert notifications.unread_state(db, user.id).count == 2
+
+    with QueryCounter() as counter:
+        assert notifications.unread_state(db, user.id).count == 2
+    assert counter.count == 0
+
+    added = add(db, user)
+    assert notifications.unread_state(db, user.id) == (3, added[0].id)
+
+def test_hidden_notifications_are_not_counted(db, user):
+    add(db, user)
+    add(db, user, is_archived=True)
+    add(db, user, sent_via_app=False)
+    add(db, user, is_read=True)
+
+    assert notifications.unread_state(db, user.id).count == 1
+
+def test_mark_read_only_touches_the_given_ids(db, user):
+    first, second, third = add(db, user, 3)
+    notifications.unread_state(db, user.id)
+
+    assert notifications.mark_read(db, user.id, ids=[first.id, second.id]) == 2
+
+    assert notifications.unread_state(db, user.id) == (1, third.id)
+
+def test_bulk_updates_without_users_drop_every_count(db, user):
+    add(db, user, 2)
+    notifications.unread_state(db, user.id)
+
+    db.execute(update(Notification).where(Notification.user_id == user.id).values(is_read=True),
+               execution_options={'synchronize_session': False})
+    db.commit()
+
+    assert notifications.unread_state(db, user.id).count == 0
+
+def test_unread_items_since_a_watermark(db, user):
+    older, newer = add(db, user, 2)
+
+    items = notifications.unread_notifications(db, user.id, since_id=older.id)
+
+    assert [n.id for n in items] == [newer.id]
+
+def test_counter_routes(db, user, user_client):
+    first, second = add(db, user, 2)
+
+    assert user_client.get('/users/notifications/unread').get_json() == {'unread_count': 2, 'since_id': second.id}
+    assert user_client.post(f'/users/notifications/unread?id={first.id}').status_code == 204
+    assert user_client.get('/users/notifications/unread').get_json()['unread_count'] == 1
+    items = user_client.get(f'/users/notifications/unread/items?since_id={first.id}').get_json()['unread']
+    assert [item['id'] for item in items] == [second.id]
+    assert user_client.post('/users/notifications/unread').status_code == 204
+    assert user_client.get('/users/notifications/unread').get_json()['unread_count'] == 0
@@ -0,0 +1,86 @@
+from datetime import datetime, timedelta
+import pytest
+from backend.database import SessionLocal
+from backend.models import Notification, User
+from backend.query_counter import QueryCounter
+from backend.services import notifications
+
+@pytest.fixture
+def db(app):
+    db = SessionLocal()
+    yield db
+    db.rollback()
+    db.close()
+
+@pytest.fixture
+def users(db):
+    users = [User(username=f'fanout{i}', email=f'fanout{i}@example.com', full_name='Fan-out', role='field',
+                  hashed_password='x', is_active=True) for i in range(3)]
+    db.add_all(users)
+    db.commit()
+    yield [user.id for user in users]
+    ids = [user.id for user in users]
+    db.query(Notification).filter(Notification.user_id.in_(ids)).delete(synchronize_session=False)
+    db.query(User).filter(User.id.in_(ids)).delete(synchronize_session=False)
+    db.commit()
+    notifications.invalidate(*ids)
+
+def visible(db, user_id):
+    return db.query(Notification).filter(Notification.user_id == user_id, *notifications.VISIBLE) \
+        .order_by(Notification.id).all()
+
+def test_one_insert_for_every_recipient(db, users):
+    with QueryCounter() as counter:
+        batch_id = notifications.notify(db, users + [users[0], None], 'Shipment delayed', 'TRK1 is late')
+        db.commit()
+
+    assert sum(statement.lstrip().upper().startswith('INSERT') for statement in counter.statements) == 1
+    assert db.query(Notification).filter(Notification.batch_id == batch_id).count() == 3
+
+def test_no_recipients(db):
+    assert notifications.notify(db, [None], 'Nobody', 'here') is None
+
+def test_burst_in_a_group_becomes_one_digest(db, users, monkeypatch):
+    monkeypatch.setattr(notifications, 'NOTIFICATION_DIGEST_ITEMS', 2)
+    for i in range(4):
+        notifications.notify(db, users[:1], 'Status change', f'Order {i} updated', group='orders',
+                             digest_title='Order updates')
+        db.commit()
+
+    rows = visible(db, users[0])
+
+    assert len(rows) == 1
+    assert rows[0].title == 'Order updates (4)'
+    assert rows[0].message == 'Order 3 updated\nOrder 2 updated\n...and 2 more'
+    assert notifications.unread_state(db, users[0]) == (1, rows[0].id)
+
+def test_read_digests_are_not_extended(db, users):
+    notifications.notify(db, users[:1], 'Status change', 'first', group='orders')
+    db.commit()
+    notifications.mark_read(db, users[0])
+
+    notifications.notify(db, users[:1], 'Status change', 'second', group='orders')
+    db.commit()
+
+    assert [row.message for row in visible(db, users[0])] == ['first', 'second']
+
+def test_scheduled_notifications_are_released_when_due(db, users):
+    send_at = datetime.utcnow() + timedelta(hours=1)
+    notifications.notify(db, users[:2], 'Reminder', 'Later', scheduled_send_time=send_at)
+    db.commit()
+    assert visible(db, users[0]) == []
+
+    released = notifications.release_scheduled(db, now=send_at + timedelta(seconds=1))
+
+    assert released >= 2
+    assert len(visible(db, users[0])) == 1
+    assert notifications.unread_state(db, users[1]).count == 1
+
+def test_expired_notifications_are_archived(db, users):
+    notifications.notify(db, users[:1], 'Flash sale', 'Soon over', expires_at=datetime.utcnow() + timedelta(minutes=5))
+    db.commit()
+
+    archived = notifications.archive_expired(db, now=datetime.utcnow() + timedelta(minutes=10))
+
+    assert archived >= 1
+    assert visible(db, users[0]) == []
@@ -0,0 +1,58 @@
+import pytest
+from backend.create_database import migrate_sync_number_sequences
+from backend.database import SessionLocal, engine
+from backend.models import Supplier
+from backend.services.numbering import NumberAllocator, parse_code
+
+@pytest.fixture
+def db(app):
+    db = SessionLocal()
+    yield db
+    db.rollback()
+    db.close()
+
+def test_processes_hand_out_disjoint_blocks(app):
+    first, second = NumberAllocator(engine, block_size=5), NumberAllocator(engine, block_size=5)
+
+    a = first.allocate('projects', 2)
+    b = second.allocate('projects', 2)
+    c = first.allocate('projects', 1)
+
+    assert len(set(a + b + c)) == 5
+    assert a[1] + 1 == c[0]  # from the first process's block, below the second's numbers
+    assert c[0] < b[0]
+
+def test_large_requests_reserve_exactly_what_they_need(app):
+    allocator = NumberAllocator(engine, block_size=5)
+
+    numbers = allocator.allocate('projects', 12)
+
+    assert numbers == list(range(numbers[0], numbers[0] + 12))
+    assert allocator._blocks['projects'] == []
+
+def test_numbers_are_not_reused_after_a_rollback(db):
+    allocator = NumberAllocator(engine, block_size=1)
+    code = allocator.next_code('suppliers')
+    db.add(Supplier(name='Rolled back', supplier_code=code, country='QA', approval_status='Approved'))
+    db.flush()
+    db.rollback()
+
+    assert allocator.next_code('suppliers') != code
+
+def test_unknown_sequence():
+    with pytest.raises(ValueError):
+        NumberAllocator(engine).allocate('invoices')
+
+@pytest.mark.parametrize('code, number', [('SUP-0042', 42), ('SUP-12345', 12345), ('SUP-12a', None), ('ORD-0001', None), ('', None)])
+def test_parse_code(code, number):
+    assert parse_code('suppliers', code) == number
+
+def test_migration_moves_sequences_past_codes_entered_directly(db):
+    NumberAllocator(engine).allocate('suppliers')
+    db.add(Supplier(name='Entered by hand', supplier_code='SUP-7000', country='QA', approval_status='Approved'))
+    db.commit()
+
+    synced = migrate_sync_number_sequences(engine)
+
+    assert synced['suppliers'] == 7001
+    assert parse_code('suppliers', NumberAllocator(engine).next_code('suppliers')) >= 7001
@@ -0,0 +1,82 @@
+import io
+from datetime import datetime
+import pytest
+from backend.database import SessionLocal
+from backend.models import Order, Project, User
+from backend.services.numbering import get_allocator, parse_code
+from backend.services.order_import import import_orders
+
+HEADER = 'order_number,project_code,supplier_code,description,quantity,unit_price,requested_delivery_date\n'
+
+@pytest.fixture
+def db(app):
+    db = SessionLocal()
+    if not db.query(Project).filter(Project.project_code == 'PRJ-IMPT').first():
+        user = db.query(User).filter(User.username == 'admin').one()
+        db.add(Project(name='Import target', project_code='PRJ-IMPT', client_name='Client', status='Active',
+                       start_date=datetime(2030, 1, 1), planned_completion_date=datetime(2030, 12, 31),
+                       created_by_id=user.id))
+        db.commit()
+    yield db
+    db.rollback()
+    db.close()
+
+def csv_file(*rows):
+    lines = [','.join([number, 'PRJ-IMPT', 'SUP-0001', description, quantity, unit_price, '2030-01-31'])
+             for number, description, quantity, unit_price in rows]
+    return io.BytesIO((HEADER + '\n'.join(lines) + '\n').encode())
+
+def run_import(db, *rows, **kwargs):
+    user_id = db.query(User.id).filter(User.username == 'admin').scalar()
+    return import_orders(db, csv_file(*rows), 'orders.csv', user_id, **kwargs)
+
+def imported(db, description):
+    return db.query(Order).filter(Order.description == description).count()
+
+@pytest.mark.parametrize('quantity, unit_price', [
+    ('Infinity', '1'),
+    ('1', 'NaN'),
+    ('1', '1e30'),
+    ('1e20', '1'),
+    ('-Infinity', '1'),
+])
+def test_non_finite_or_out_of_range_numbers_are_row_errors(db, quantity, unit_price):
+    result = run_import(db, ('', 'bad numbers', quantity, unit_price), ('', 'good numbers', '2', '3.50'))
+
+    assert result.imported == 1
+    assert result.error_count == 1
+    row_number, message = result.errors[0]
+    assert row_number == 2
+    assert 'quantity' in message
+
+def test_duplicate_order_number_within_a_chunk(db):
+    result = run_import(db, ('ORD-910001', 'dup chunk a', '1', '1'), ('ORD-910001', 'dup chunk b', '1', '1'))
+
+    assert result.imported == 1
+    assert result.errors == [(3, "order_number 'ORD-910001' already exists")]
+
+@pytest.mark.parametrize('dry_run', [True, False])
+def test_duplicate_order_number_across_chunks(db, dry_run):
+    number = 'ORD-920001' if dry_run else 'ORD-920002'
+    result = run_import(db, (number, 'dup across a', '1', '1'), (number, 'dup across b', '1', '1'),
+                        chunk_size=1, dry_run=dry_run)
+
+    assert result.imported == 1
+    assert result.errors == [(3, f"order_number '{number}' already exists")]
+
+def test_dry_run_validates_without_inserting(db):
+    rows = [('', 'dry run row', '1', '1'), ('', 'dry run row', 'x', '1')]
+
+    result = run_import(db, *rows, dry_run=True)
+    assert (result.imported, result.error_count, result.dry_run) == (1, 1, True)
+    assert imported(db, 'dry run row') == 0
+
+    result = run_import(db, *rows)
+    assert (result.imported, result.error_count, result.dry_run) == (1, 1, False)
+    assert imported(db, 'dry run row') == 1
+
+def test_generated_numbers_continue_after_explicit_ones(db):
+    result = run_import(db, ('ORD-950000', 'explicit number', '1', '1'), ('', 'generated number', '1', '1'))
+    assert result.imported == 2
+
+    assert parse_code('orders', get_allocator().next_code('orders')) > 950000
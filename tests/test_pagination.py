@@ -0,0 +1,68 @@
+import pytest
+from backend.database import SessionLocal
+from backend.models import Order
+from backend.services.pagination import decode_cursor, encode_cursor, paginate_keyset
+
+@pytest.fixture
+def db(app):
+    db = SessionLocal()
+    yield db
+    db.close()
+
+def walk(db, sort_column, descending, per_page=7):
+    pages = [paginate_keyset(db.query(Order), sort_column, Order.id, per_page=per_page, descending=descending)]
+    while pages[-1].has_next:
+        pages.append(paginate_keyset(db.query(Order), sort_column, Order.id, cursor=pages[-1].next_cursor,
+                                     per_page=per_page, descending=descending))
+    return pages
+
+# total_amount is the same on every seeded order, so ties are broken by id
+@pytest.mark.parametrize('sort_column', [Order.created_at, Order.total_amount, Order.order_number])
+@pytest.mark.parametrize('descending', [True, False])
+def test_pages_cover_every_row_once(db, sort_column, descending):
+    pages = walk(db, sort_column, descending)
+
+    ids = [order.id for page in pages for order in page.items]
+    assert sorted(ids) == sorted(id for (id,) in db.query(Order.id))
+    assert not pages[0].has_prev and pages[0].prev_cursor is None
+    assert pages[-1].next_cursor is None
+
+@pytest.mark.parametrize('sort_column', [Order.created_at, Order.total_amount])
+def test_prev_cursor_returns_the_previous_page(db, sort_column):
+    pages = walk(db, sort_column, True)
+
+    for previous, page in zip(pages, pages[1:]):
+        back = paginate_keyset(db.query(Order), sort_column, Order.id, cursor=page.prev_cursor, per_page=7)
+        assert [o.id for o in back.items] == [o.id for o in previous.items]
+        assert back.has_next
+
+def test_cursor_round_trips_the_sort_value(db):
+    order = db.query(Order).first()
+
+    token = encode_cursor('next', order.created_at, order.id)
+
+    assert decode_cursor(token, Order.created_at) == ('next', order.created_at, order.id)
+
+@pytest.mark.parametrize('token', ['garbage', encode_cursor('sideways', None, 1), encode_cursor('next', 'x', 'y')])
+def test_invalid_cursors_are_rejected_and_restart_from_the_first_page(db, token):
+    with pytest.raises(ValueError):
+        decode_cursor(token, Order.created_at)
+
+    page = paginate_keyset(db.query(Order), Order.created_at, Order.id, cursor=token, per_page=5)
+    assert page.items == paginate_keyset(db.query(Order), Order.created_at, Order.id, per_page=5).items
+    assert not page.has_prev
+
+def test_orders_api_pages(client):
+    first = client.get('/api/orders?per_page=10').get_json()
+    second = client.get(f"/api/orders?per_page=10&cursor={first['pagination']['next_cursor']}").get_json()
+
+    assert second['pagination']['has_prev']
+    assert not {o['id'] for o in first['data']} & {o['id'] for o in second['data']}
+
+@pytest.mark.parametrize('path', ['/orders/?cursor=garbage', '/orders/?sort=unknown', '/shipments/?cursor=garbage',
+                                  '/projects/?cursor=garbage'])
+def test_list_pages_tolerate_bad_cursors_and_sorts(client, path):
+    assert client.get(path).status_code == 200
+
+def test_bad_page_size_is_a_400(client):
+    assert client.get('/api/orders?per_page=ten').status_code == 400
@@ -0,0 +1,17 @@
+"""Statement budgets for list and detail routes; a lazy load per row blows through them"""
+import pytest
+from backend.query_counter import assert_statement_count
+
+@pytest.mark.parametrize('path, max_statements', [
+    # user, page
+    ('/api/orders?per_page=50&count=false', 2),
+    # user, project, version stamp, orders with suppliers
+    ('/api/projects/1/orders', 4),
+    # user, count, page, four filter dropdowns
+    ('/orders/', 7),
+    # user, count, page, two filter dropdowns
+    ('/shipments/', 5),
+])
+def test_route_statement_count(client, path, max_statements):
+    response = assert_statement_count(client, path, max_statements)
+    assert response.status_code == 200
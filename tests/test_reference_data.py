@@ -0,0 +1,68 @@
+import pytest
+from sqlalchemy import update
+from backend.database import SessionLocal
+from backend.models import Project, Supplier
+from backend.query_counter import QueryCounter
+from backend.services import reference_data
+from backend.services.reference_data import get_options
+
+@pytest.fixture
+def db(app):
+    db = SessionLocal()
+    reference_data.invalidate()
+    yield db
+    db.rollback()
+    db.close()
+
+def cached(db, name):
+    with QueryCounter() as counter:
+        value = get_options(db, name)
+    return counter.count == 0, value
+
+def test_lookups_are_cached(db):
+    first = get_options(db, 'suppliers')
+
+    assert cached(db, 'suppliers') == (True, first)
+    assert [option.name for option in first] == sorted(option.name for option in first)
+
+def test_changing_a_tracked_column_reloads_the_table_lookups(db):
+    get_options(db, 'supplier_countries')
+    supplier = db.query(Supplier).filter(Supplier.supplier_code == 'SUP-0005').one()
+
+    supplier.country = 'OM'
+    db.commit()
+
+    hit, countries = cached(db, 'supplier_countries')
+    assert not hit
+    assert 'OM' in countries
+    supplier.country = 'QA'
+    db.commit()
+
+def test_untracked_columns_keep_the_cache(db):
+    get_options(db, 'supplier_countries')
+    supplier = db.query(Supplier).filter(Supplier.supplier_code == 'SUP-0005').one()
+
+    supplier.city = 'Elsewhere'
+    db.commit()
+
+    assert cached(db, 'supplier_countries')[0]
+
+def test_bulk_updates_reload_the_table_lookups(db):
+    get_options(db, 'active_projects')
+    get_options(db, 'suppliers')
+
+    db.execute(update(Project).where(Project.project_code == 'PRJ-0003').values(status='On Hold'),
+               execution_options={'synchronize_session': False})
+    db.commit()
+
+    hit, active = cached(db, 'active_projects')
+    assert not hit
+    assert 'Project 3' not in [option.name for option in active]
+    assert cached(db, 'suppliers')[0]  # other tables stay cached
+    db.execute(update(Project).where(Project.project_code == 'PRJ-0003').values(status='Active'),
+               execution_options={'synchronize_session': False})
+    db.commit()
+
+def test_unknown_lookup(db):
+    with pytest.raises(KeyError):
+        get_options(db, 'colours')
@@ -0,0 +1,39 @@
+import pytest
+from backend.database import SessionLocal, engine
+from backend.models import Order, Shipment
+from backend.services.search import SQLiteSearchBackend, ensure_search_indexes, get_search_backend, search
+
+@pytest.fixture
+def db(app):
+    ensure_search_indexes(engine)
+    db = SessionLocal()
+    yield db
+    db.close()
+
+def test_sqlite_uses_the_fts_backend(db):
+    assert isinstance(get_search_backend(db, Order, 'item'), SQLiteSearchBackend)
+
+@pytest.mark.parametrize('model, fragment, expected', [
+    (Order, '000012', 'ORD-000012'),
+    (Shipment, '000012', 'TRK000012'),
+    (Order, 'd-00001', 'ORD-000012'),
+])
+def test_number_fragments_match_inside_codes(db, model, fragment, expected):
+    codes = {row.order_number if model is Order else row.tracking_number for row, _ in search(db, model, fragment)}
+
+    assert expected in codes
+
+def test_words_match_as_prefixes_and_rank_above_substrings(db):
+    results = search(db, Order, 'ite 11')
+
+    assert results[0][0].description == 'Item 11'
+
+def test_like_wildcards_in_the_search_text_are_literal(db):
+    assert search(db, Order, '%') == []
+    assert search(db, Shipment, 'TRK%9') == []
+
+def test_search_api(client):
+    response = client.get('/api/search/shipments?q=000012')
+
+    assert response.status_code == 200
+    assert [item['title'] for item in response.get_json()['data']] == ['TRK000012']
@@ -0,0 +1,62 @@
+import json
+from datetime import datetime
+from decimal import Decimal
+import pytest
+from backend.database import SessionLocal
+from backend.models import Order, Shipment
+from backend.services.serializers import parse_fields, serialize, serialize_many
+from fusionflow_app.json_provider import FusionJSONProvider
+
+@pytest.fixture
+def db(app):
+    db = SessionLocal()
+    yield db
+    db.close()
+
+@pytest.mark.parametrize('value, expected', [
+    (None, None),
+    ('', None),
+    (' , ,', None),
+    ('id, status,id', ('id', 'status')),
+])
+def test_parse_fields(value, expected):
+    assert parse_fields(value) == expected
+
+def test_fields_select_and_order_the_output(db):
+    order = db.query(Order).first()
+
+    assert list(serialize(order, 'detail', ('status', 'id'))) == ['status', 'id']
+
+@pytest.mark.parametrize('view, fields', [('detail', ('nope',)), ('summary', ('po_number',))])
+def test_fields_outside_the_view_are_rejected(db, view, fields):
+    order = db.query(Order).first()
+
+    with pytest.raises(ValueError, match='Unknown fields'):
+        serialize_many([order], Order, view, fields)
+
+def test_nested_and_related_fields(db):
+    shipment = db.query(Shipment).first()
+
+    data = serialize(shipment, 'tracking', ('order',))
+
+    assert data == {'order': {'id': shipment.order.id, 'order_number': shipment.order.order_number}}
+
+@pytest.mark.parametrize('path', ['/api/orders?fields=id,bogus', '/api/orders/1?fields=bogus',
+                                  '/api/shipments/1/track?fields=bogus', '/api/projects/1/orders?fields=po_number'])
+def test_unknown_fields_are_a_400(client, path):
+    response = client.get(path)
+
+    assert response.status_code == 400
+    assert 'Unknown fields' in response.get_json()['message']
+
+def test_api_returns_only_the_requested_fields(client):
+    data = client.get('/api/orders?per_page=3&fields=order_number,total_amount').get_json()['data']
+
+    assert [list(item) for item in data] == [['order_number', 'total_amount']] * 3
+    assert all(isinstance(item['total_amount'], (int, float)) for item in data)
+
+def test_json_provider_encodes_column_values(app):
+    body = app.json.dumps({'amount': Decimal('12.50'), 'at': datetime(2030, 1, 2, 3, 4), 'pair': (1, 2)})
+
+    assert json.loads(body) == {'amount': 12.5, 'at': '2030-01-02T03:04:00', 'pair': [1, 2]}
+    assert isinstance(app.json, FusionJSONProvider)
@@ -0,0 +1,99 @@
+from datetime import datetime, timedelta
+import pytest
+from backend.database import SessionLocal
+from backend.models import Shipment, ShipmentHistoryArchive, ShipmentStatusHistory
+from backend.services.shipment_history import (
+    archived_history, compact_history, compact_shipment, compaction_candidates, history_page, pack_events,
+    unpack_events
+)
+
+CUTOFF = datetime(2021, 1, 1)
+
+@pytest.fixture
+def db(app):
+    db = SessionLocal()
+    yield db
+    db.rollback()
+    db.close()
+
+@pytest.fixture
+def shipment(db):
+    shipment = db.query(Shipment).filter(Shipment.tracking_number == 'TRK000041').one()
+    db.query(ShipmentStatusHistory).filter(ShipmentStatusHistory.shipment_id == shipment.id).delete()
+    db.query(ShipmentHistoryArchive).filter(ShipmentHistoryArchive.shipment_id == shipment.id).delete()
+    db.commit()
+    return shipment
+
+def add_history(db, shipment, days, start=datetime(2020, 1, 1)):
+    db.add_all([ShipmentStatusHistory(shipment_id=shipment.id, status='In Transit', location=f'Hub {day}',
+                                      timestamp=start + timedelta(days=day), raw_api_data={'day': day})
+                for day in days])
+    db.commit()
+
+def live_days(db, shipment):
+    return sorted(int(location.split()[1]) for (location,) in db.query(ShipmentStatusHistory.location).filter(
+        ShipmentStatusHistory.shipment_id == shipment.id))
+
+def test_pack_round_trip():
+    assert unpack_events(pack_events([{'id': 1, 'status': 'Delivered'}])) == [{'id': 1, 'status': 'Delivered'}]
+    assert unpack_events(None) == []
+
+def test_old_rows_beyond_the_newest_are_compacted(db, shipment):
+    add_history(db, shipment, range(10))
+
+    moved = compact_shipment(db, shipment.id, CUTOFF, keep_latest=3)
+    db.commit()
+
+    assert moved == 7
+    assert live_days(db, shipment) == [7, 8, 9]
+    archived = archived_history(db, shipment.id)
+    assert [event['location'] for event in archived] == [f'Hub {day}' for day in range(7)]
+    assert archived[0]['raw_api_data'] == {'day': 0}
+
+def test_recent_rows_are_never_compacted(db, shipment):
+    add_history(db, shipment, range(5), start=datetime.utcnow() - timedelta(days=10))
+
+    assert compact_shipment(db, shipment.id, datetime.utcnow() - timedelta(days=90), keep_latest=1) == 0
+
+def test_compacting_again_merges_into_the_archive(db, shipment):
+    add_history(db, shipment, range(5))
+    compact_shipment(db, shipment.id, CUTOFF, keep_latest=2)
+    db.commit()
+    add_history(db, shipment, range(5, 10))
+
+    compact_shipment(db, shipment.id, CUTOFF, keep_latest=2)
+    db.commit()
+
+    archive = db.query(ShipmentHistoryArchive).filter(ShipmentHistoryArchive.shipment_id == shipment.id).one()
+    assert archive.event_count == 8
+    assert [event['location'] for event in archived_history(db, shipment.id)] == [f'Hub {day}' for day in range(8)]
+    assert archive.first_timestamp == datetime(2020, 1, 1)
+    assert archive.last_timestamp == datetime(2020, 1, 8)
+
+def test_compact_history_only_touches_candidates(db, shipment):
+    add_history(db, shipment, range(6))
+    now = CUTOFF + timedelta(days=90)
+
+    assert shipment.id in compaction_candidates(db, CUTOFF, keep_latest=4)
+    assert shipment.id not in compaction_candidates(db, CUTOFF, keep_latest=6)
+    assert compact_history(db, keep_latest=4, now=now, dry_run=True)[1] == 0
+    assert compact_history(db, keep_latest=4, now=now) == (1, 2)
+
+def test_history_pages_are_newest_first(db, shipment):
+    add_history(db, shipment, range(5))
+
+    first = history_page(db, shipment.id, per_page=3)
+    second = history_page(db, shipment.id, cursor=first.next_cursor, per_page=3)
+
+    assert [entry.location for entry in first.items + second.items] == [f'Hub {day}' for day in range(4, -1, -1)]
+
+def test_tracking_includes_archived_entries_on_request(client, db, shipment):
+    add_history(db, shipment, range(6))
+    compact_shipment(db, shipment.id, CUTOFF, keep_latest=2)
+    db.commit()
+
+    live = client.get(f'/shipments/{shipment.id}/track').get_json()['data']['status_history']
+    full = client.get(f'/shipments/{shipment.id}/track?archived=1').get_json()['data']['status_history']
+
+    assert [entry['location'] for entry in live] == ['Hub 5', 'Hub 4']
+    assert [entry['location'] for entry in full] == [f'Hub {day}' for day in range(5, -1, -1)]
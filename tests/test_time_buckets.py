@@ -0,0 +1,59 @@
+from datetime import datetime, timedelta
+import pytest
+from sqlalchemy import DateTime, literal, select
+from backend.database import SessionLocal
+from backend.models import Order
+from backend.services.time_buckets import bucket_start, get_trend, time_bucket
+
+@pytest.fixture
+def db(app):
+    db = SessionLocal()
+    yield db
+    db.close()
+
+@pytest.mark.parametrize('unit, periods, expected', [
+    ('day', 3, datetime(2030, 1, 13)),
+    ('week', 2, datetime(2030, 1, 7)),  # Monday of the previous week
+    ('month', 1, datetime(2030, 1, 1)),
+    ('month', 3, datetime(2029, 11, 1)),
+    ('month', 13, datetime(2029, 1, 1)),
+])
+def test_bucket_start(unit, periods, expected):
+    assert bucket_start(unit, periods, now=datetime(2030, 1, 15, 18, 30)) == expected
+
+@pytest.mark.parametrize('unit, value, expected', [
+    ('day', datetime(2030, 1, 15, 18, 30), datetime(2030, 1, 15)),
+    ('week', datetime(2030, 1, 15, 18, 30), datetime(2030, 1, 14)),
+    ('week', datetime(2030, 1, 14, 0, 0), datetime(2030, 1, 14)),  # a Monday stays in its own week
+    ('week', datetime(2030, 1, 20, 23, 59), datetime(2030, 1, 14)),
+    ('month', datetime(2030, 1, 31, 23, 59), datetime(2030, 1, 1)),
+])
+def test_buckets_truncate_in_the_database(db, unit, value, expected):
+    assert db.scalar(select(time_bucket(unit, literal(value, DateTime())))) == expected
+
+def test_unknown_unit():
+    with pytest.raises(ValueError):
+        time_bucket('year', Order.created_at)
+
+def test_trend_counts_rows_per_bucket(db):
+    now = datetime.utcnow()
+    since = bucket_start('day', 4, now=now)
+
+    trend = get_trend(db, Order.created_at, unit='day', periods=4, now=now)
+
+    assert [bucket['period'] for bucket in trend] == sorted(bucket['period'] for bucket in trend)
+    assert sum(bucket['count'] for bucket in trend) == db.query(Order).filter(Order.created_at >= since).count()
+    assert trend[-1]['period'] == now.strftime('%Y-%m-%d')
+
+def test_trend_sums_values(db):
+    trend = get_trend(db, Order.created_at, unit='month', periods=1, value=Order.total_amount,
+                      filters=[Order.created_at >= datetime.utcnow() - timedelta(days=1)])
+
+    assert trend
+    assert all(isinstance(bucket['total'], float) for bucket in trend)
+
+def test_dashboard_stats_monthly_trend(client):
+    data = client.get('/api/dashboard/stats').get_json()['data']
+
+    assert data['monthly_orders'][-1]['month'] == datetime.utcnow().strftime('%Y-%m')
+    assert data['monthly_orders'][-1]['count'] >= 1
@@ -0,0 +1,115 @@
+import asyncio
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+import pytest
+from backend.database import SessionLocal
+from backend.models import Shipment
+from backend.services import tracking_sync
+from backend.services.carriers import CarrierError, FedExAdapter, get_adapters
+from backend.services.tracking_sync import (
+    DEFAULT_POLL_INTERVAL, POLL_INTERVALS, TRACKING_MAX_INTERVAL, apply_results, due_shipments, next_interval
+)
+
+@pytest.fixture
+def db(app):
+    db = SessionLocal()
+    yield db
+    db.rollback()
+    db.close()
+
+@pytest.mark.parametrize('status, current, changed, expected', [
+    ('In Transit', 200, True, 60),  # a change resets to the base interval
+    ('In Transit', None, False, 60),
+    ('In Transit', 60, False, 90),
+    ('In Transit', 300, False, 360),  # capped at the ceiling
+    ('In Transit', 10, False, 60),  # never below the base
+    ('Out for Delivery', 40, False, 60),
+    ('Unknown status', 100, False, 150),
+])
+def test_next_interval(status, current, changed, expected):
+    assert next_interval(status, current, changed) == expected
+
+def test_unchanged_polls_back_off_to_the_ceiling():
+    interval = None
+    for _ in range(20):
+        interval = next_interval('Label Created', interval, False)
+
+    assert interval == POLL_INTERVALS['Label Created'][1]
+
+class FlakyAdapter:
+    name = 'Flaky'
+
+    def __init__(self, errors):
+        self.errors = list(errors)
+        self.calls = 0
+
+    async def fetch(self, client, tracking_numbers):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return {number: 'ok' for number in tracking_numbers}
+
+def fetch_chunk(adapter):
+    limiter = tracking_sync.RateLimiter(1000)
+    return asyncio.run(tracking_sync._fetch_chunk(None, adapter, limiter, asyncio.Semaphore(1), ['A', 'B']))
+
+def test_retryable_errors_are_retried():
+    adapter = FlakyAdapter([CarrierError('busy', retryable=True, retry_after=0, status_code=429)] * 2)
+
+    assert fetch_chunk(adapter) == {'A': 'ok', 'B': 'ok'}
+    assert adapter.calls == 3
+
+def test_permanent_errors_are_returned_per_tracking_number():
+    error = CarrierError('HTTP 400', status_code=400)
+    adapter = FlakyAdapter([error])
+
+    assert fetch_chunk(adapter) == {'A': error, 'B': error}
+    assert adapter.calls == 1
+
+def test_retries_give_up(monkeypatch):
+    monkeypatch.setattr(tracking_sync, 'TRACKING_MAX_RETRIES', 2)
+    adapter = FlakyAdapter([CarrierError('HTTP 503', retryable=True, retry_after=0)] * 5)
+
+    result = fetch_chunk(adapter)
+
+    assert all(isinstance(value, CarrierError) for value in result.values())
+    assert adapter.calls == 3
+
+@pytest.mark.parametrize('frequency, expected', [(30, 60), (None, 60), (TRACKING_MAX_INTERVAL, TRACKING_MAX_INTERVAL)])
+def test_errors_double_the_interval_up_to_the_maximum(db, frequency, expected):
+    shipment = db.query(Shipment).filter(Shipment.tracking_number == 'TRK000050').one()
+    row = SimpleNamespace(id=shipment.id, tracking_number='TRK000050', current_status='In Transit',
+                          api_sync_frequency_minutes=frequency)
+    adapter = get_adapters()['DHL']
+    now = datetime(2030, 1, 1)
+
+    counts = apply_results(db, [(row, adapter)], {('DHL', 'TRK000050'): CarrierError('HTTP 500')}, now)
+    db.commit()
+
+    db.refresh(shipment)
+    assert counts['errors'] == 1
+    assert shipment.api_sync_frequency_minutes == expected
+    assert shipment.next_api_sync_at == now + timedelta(minutes=expected)
+    assert shipment.tracking_api_response['status'] == 'error'
+
+def test_due_shipments(db):
+    db.query(Shipment).filter(Shipment.tracking_number == 'TRK000049').update(
+        {'next_api_sync_at': datetime.utcnow() + timedelta(days=1)})
+    db.query(Shipment).filter(Shipment.tracking_number == 'TRK000048').update({'current_status': 'Delivered'})
+    db.commit()
+
+    due = due_shipments(db)
+
+    numbers = [row.tracking_number for row in due]
+    assert 'TRK000001' in numbers
+    assert 'TRK000049' not in numbers
+    assert 'TRK000048' not in numbers
+    assert [row.id for row in due] == [row.id for row in sorted(due, key=lambda r: (
+        db.get(Shipment, r.id).next_api_sync_at, r.id))]
+
+@pytest.mark.parametrize('adapters', [{}, {'FedEx': FedExAdapter()}])
+def test_due_shipments_only_for_the_given_carriers(db, adapters):
+    assert due_shipments(db, adapters=adapters) == []
+
+def test_default_poll_interval_applies_to_unknown_statuses():
+    assert next_interval('Something new', None, True) == DEFAULT_POLL_INTERVAL[0]
@@ -0,0 +1,98 @@
+import hashlib
+import hmac
+import json
+from datetime import datetime, timedelta
+import pytest
+from sqlalchemy import false
+from backend.database import SessionLocal
+from backend.models import Shipment
+from backend.models.tracking_webhooks import TrackingWebhookEvent
+from backend.services import tracking_webhooks
+
+SECRET = 'test-secret'
+
+@pytest.fixture
+def db(app):
+    db = SessionLocal()
+    yield db
+    db.rollback()
+    db.close()
+
+def event(tracking_number, status='In Transit', hour=0, **fields):
+    return dict(fields, tracking_number=tracking_number, status=status,
+                timestamp=(datetime(2030, 5, 1) + timedelta(hours=hour)).isoformat())
+
+def signature(body, secret=SECRET):
+    return 'sha256=' + hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+
+def pending(db, tracking_number):
+    return db.query(TrackingWebhookEvent).filter(
+        TrackingWebhookEvent.tracking_number == tracking_number, TrackingWebhookEvent.processed_at.is_(None)
+    ).count()
+
+@pytest.mark.parametrize('secret, header, valid', [
+    (SECRET, signature(b'[]'), True),
+    (SECRET, signature(b'[ ]'), False),
+    (SECRET, None, False),
+    ('', signature(b'[]', ''), False),
+])
+def test_verify_signature(secret, header, valid):
+    assert tracking_webhooks.verify_signature(b'[]', header, secret) is valid
+
+def test_repeated_events_are_duplicates(db):
+    events = [event('DUP-1'), event('DUP-1'), event('DUP-2'), {'status': 'Delivered'}]
+
+    first = tracking_webhooks.ingest(db, 'DHL', events)
+    second = tracking_webhooks.ingest(db, 'DHL', {'events': events})
+
+    assert first == (2, 1, 1, 0)
+    assert second == (0, 3, 1, 0)
+
+def test_rows_stored_by_a_concurrent_delivery_are_not_accepted(db, monkeypatch):
+    tracking_webhooks.ingest(db, 'DHL', [event('RACE-1')])
+    # Both deliveries pass the existence check before either inserts
+    select = tracking_webhooks.select
+    monkeypatch.setattr(tracking_webhooks, 'select', lambda *columns: select(*columns).where(false()))
+
+    result = tracking_webhooks.ingest(db, 'DHL', [event('RACE-1'), event('RACE-2')])
+
+    assert result == (1, 1, 0, 0)
+
+def test_long_and_structured_descriptions_are_stored_as_text():
+    row = tracking_webhooks.normalize_event(event('DESC-1', description={'text': 'x' * 5000}), 'DHL')
+
+    assert isinstance(row['description'], str)
+    assert len(row['description']) == tracking_webhooks.WEBHOOK_DESCRIPTION_MAX
+
+def test_events_are_applied_and_unmatched_ones_wait(db):
+    tracking_webhooks.ingest(db, 'DHL', [event('TRK000059', 'Customs Clearance', 1), event('TRK000059', 'At Hub', 0),
+                                         event('NO-SHIPMENT-YET')])
+
+    tracking_webhooks.process_pending(db)
+
+    shipment = db.query(Shipment).filter(Shipment.tracking_number == 'TRK000059').one()
+    assert shipment.current_status == 'Customs Clearance'
+    assert pending(db, 'TRK000059') == 0
+    assert pending(db, 'NO-SHIPMENT-YET') == 1
+
+def test_unmatched_events_expire(db):
+    tracking_webhooks.ingest(db, 'DHL', [event('NEVER-SHIPPED')])
+
+    expired = tracking_webhooks.expire_unmatched(db, now=datetime.utcnow() + timedelta(days=30))
+
+    assert expired >= 1
+    assert pending(db, 'NEVER-SHIPPED') == 0
+
+@pytest.mark.parametrize('body, header, status', [
+    (b'[]', 'sha256=bad', 401),
+    (b'not json', None, 400),
+    (b'{"events": 1}', None, 400),
+    (json.dumps([event('ENDPOINT-1')]).encode(), None, 202),
+])
+def test_webhook_endpoint(app, monkeypatch, body, header, status):
+    monkeypatch.setattr(tracking_webhooks, 'TRACKING_WEBHOOK_SECRET', SECRET)
+
+    response = app.test_client().post('/api/webhooks/tracking/DHL', data=body, content_type='application/json',
+                                      headers={'X-FusionFlow-Signature': header or signature(body)})
+
+    assert response.status_code == status
@@ -0,0 +1,59 @@
+import pytest
+from backend.auth import get_password_hash
+from backend.database import SessionLocal
+from backend.models import User
+from fusionflow_app import user_cache
+from fusionflow_app.user_cache import CachedUser
+
+@pytest.fixture
+def db(app):
+    db = SessionLocal()
+    yield db
+    db.rollback()
+    db.close()
+
+@pytest.fixture(autouse=True)
+def empty_cache():
+    user_cache.clear()
+    yield
+    user_cache.clear()
+
+def snapshot(user_id, is_active=True, role='field'):
+    return CachedUser(id=user_id, username=f'user{user_id}', is_active=is_active, role=role)
+
+def test_hits_skip_the_recheck_until_it_is_due(monkeypatch):
+    loads, checks = [], []
+    loader = lambda user_id: loads.append(user_id) or snapshot(user_id)
+    checker = lambda user_id: checks.append(user_id) or (True, 'field')
+
+    user_cache.get_user(1, loader, checker)
+    user_cache.get_user(1, loader, checker)
+    assert (loads, checks) == ([1], [])
+
+    monkeypatch.setattr(user_cache, 'USER_CACHE_RECHECK', 0)
+    user_cache.get_user(1, loader, checker)
+    assert (loads, checks) == ([1], [1])
+
+@pytest.mark.parametrize('state', [None, (False, 'field'), (True, 'admin')])
+def test_changed_users_are_reloaded(monkeypatch, state):
+    monkeypatch.setattr(user_cache, 'USER_CACHE_RECHECK', 0)
+    user_cache.get_user(1, snapshot)
+    reloaded = snapshot(1, role='admin') if state and state[0] else None
+
+    assert user_cache.get_user(1, lambda user_id: reloaded, lambda user_id: state) is reloaded
+
+def test_user_deactivated_elsewhere_is_logged_out(app, db, monkeypatch):
+    db.add(User(username='field1', email='field1@example.com', full_name='Field', role='field',
+                hashed_password=get_password_hash('pw'), is_active=True))
+    db.commit()
+    client = app.test_client()
+    client.post('/login', data={'username': 'field1', 'password': 'pw'})
+    assert client.get('/api/orders').status_code == 200
+
+    # Another worker deactivates the user; this process's cache is not invalidated
+    db.query(User).filter(User.username == 'field1').update({'is_active': False})
+    db.commit()
+    assert client.get('/api/orders').status_code == 200
+    monkeypatch.setattr(user_cache, 'USER_CACHE_RECHECK', 0)
+
+    assert client.get('/api/orders').status_code in (302, 401)